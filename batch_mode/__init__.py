@@ -0,0 +1 @@
+# SRS batch mode: FastAPI worker (worker.py) + Streamlit front end (app.py)
@@ -0,0 +1,254 @@
+import base64
+import json
+import time
+from urllib.parse import urlencode
+
+import requests
+import streamlit as st
+
+try:
+    from batch_mode.config import FASTAPI_BASE_URL
+except ImportError:  # run as `streamlit run batch_mode/app.py`
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from batch_mode.config import FASTAPI_BASE_URL
+
+from srs_core.templates import get_registry
+
+# ==================================================
+# SRS BATCH MODE – FRONT END
+# ==================================================
+# Thin client for batch_mode/worker.py: uploads go to POST /generate, the
+# job list follows GET /events. Nothing is generated in this process.
+st.set_page_config(page_title="SRS – Batch Mode", page_icon="logo/2.png", layout="wide")
+st.title("SRS – Batch Mode")
+
+PROMPTS = get_registry()
+REQUEST_TIMEOUT = 30
+st.session_state.setdefault("batch_jobs", [])   # [{"job_id", "sku", "file"}]
+
+
+def api(method, path, **kwargs):
+    return requests.request(method, f"{FASTAPI_BASE_URL}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_result(result_url):
+    # Finished results never change – fetch each image once
+    return api("GET", result_url).content
+
+
+# ==================================================
+# WORKER STATUS
+# ==================================================
+with st.sidebar:
+    try:
+        health = api("GET", "/health").json()
+        st.success(f"Worker online · {FASTAPI_BASE_URL}")
+        st.caption(
+            f"Queue {health['queue_depth']}/{health['queue_limit']} · "
+            f"{health['busy']}/{health['workers']} workers busy"
+        )
+        if not health["api_key"]:
+            st.warning("⚠️ SRS_KEY not set on the worker – jobs will fail")
+    except requests.RequestException:
+        health = None
+        st.error(f"❌ Cannot connect to FastAPI worker at {FASTAPI_BASE_URL}")
+
+    st.divider()
+    dress_type = st.selectbox("Dress Type", PROMPTS.dress_types)
+    background = st.selectbox("Background", PROMPTS.background_options.get(dress_type, ["royal grey"]))
+    pose = st.selectbox("Pose Style", list(PROMPTS.poses))
+    aspect_ratio = st.selectbox("Aspect Ratio", ["1:1", "2:3", "3:4", "4:5", "9:16"], index=2)
+    resolution = st.selectbox("Generation Resolution", ["1K", "2K", "4K"], index=1)
+
+# ==================================================
+# SUBMIT
+# ==================================================
+main_files = st.file_uploader(
+    "Main Images (one job per file)", ["jpg", "jpeg", "png"], accept_multiple_files=True
+)
+choli_file = st.file_uploader("Choli Reference (optional, shared)", ["jpg", "jpeg", "png"])
+lehenga_file = st.file_uploader("Lehenga Reference (optional, shared)", ["jpg", "jpeg", "png"])
+
+if st.button(f"🚀 Queue {len(main_files or [])} jobs", disabled=not (main_files and health)):
+    form = {
+        "dress_type": dress_type,
+        "background": background,
+        "pose": pose,
+        "aspect_ratio": aspect_ratio,
+        "resolution": resolution,
+    }
+    shared = {}
+    if choli_file:
+        shared["choli"] = (choli_file.name, choli_file.getvalue(), choli_file.type)
+    if lehenga_file:
+        shared["lehenga"] = (lehenga_file.name, lehenga_file.getvalue(), lehenga_file.type)
+
+    progress = st.progress(0.0)
+    refused = 0
+    for i, f in enumerate(main_files, start=1):
+        files = dict(shared, main=(f.name, f.getvalue(), f.type))
+        resp = api("POST", "/generate", data=form, files=files)
+        if resp.status_code == 202:
+            job = resp.json()
+            st.session_state.batch_jobs.append({"job_id": job["job_id"], "sku": job["sku"], "file": f.name})
+        elif resp.status_code == 429:
+            refused += 1
+        else:
+            st.error(f"❌ {f.name}: {resp.status_code} {resp.text[:200]}")
+        progress.progress(i / len(main_files))
+    if refused:
+        st.warning(f"⚠️ Worker queue full – {refused} files were not queued, submit them again later")
+
+# ==================================================
+# JOB LIST (live from GET /events)
+# ==================================================
+# Statuses are read once, then kept current from the worker's event stream
+# until every job is finished. The table is redrawn at most every
+# REDRAW_SECONDS. A "lagged" event (this client fell behind) re-reads the
+# statuses; a dropped connection resumes with Last-Event-ID. Jobs the
+# worker can't report on ("missing": purged or from another worker;
+# "unknown": unreachable) are final, so they are never waited for.
+STATUS_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌", "missing": "❔"}
+FINAL_STATES = ("done", "failed", "missing", "unknown")
+REDRAW_SECONDS = 0.5
+MAX_FILTER_IDS = 200       # longer lists subscribe to everything and filter here
+STREAM_TIMEOUT = (5, 40)   # the worker sends a keep-alive every 15 s
+RECONNECTS = 3
+EXPORT_LINK_IDS = 200      # job ids per export link, keeps the URL well under server limits
+
+
+def job_states(jobs):
+    states = {}
+    for job in jobs:
+        try:
+            resp = api("GET", f"/jobs/{job['job_id']}")
+        except requests.RequestException:
+            states[job["job_id"]] = {"status": "unknown"}
+            continue
+        if resp.status_code == 404:
+            states[job["job_id"]] = {"status": "missing", "error": "the worker has no record of this job"}
+        elif resp.ok:
+            states[job["job_id"]] = resp.json()
+        else:
+            states[job["job_id"]] = {"status": "unknown", "error": f"{resp.status_code} {resp.text[:200]}"}
+    return states
+
+
+def sse_events(resp):
+    # (event name, data dict) per server-sent event; ("keep-alive", None) for comments
+    name, data = None, []
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line:
+            if data:
+                yield name, json.loads("\n".join(data))
+            name, data = None, []
+        elif line.startswith(":"):
+            yield "keep-alive", None
+        else:
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+            if field == "event":
+                name = value
+            elif field == "data":
+                data.append(value)
+
+
+def all_final(states):
+    return all(state.get("status") in FINAL_STATES for state in states.values())
+
+
+def draw_jobs(jobs, states, thumbs):
+    rows = [{
+        "SKU": job["sku"],
+        "File": job["file"],
+        "Status": f"{STATUS_ICONS.get(states[job['job_id']].get('status'), '?')} {states[job['job_id']].get('status')}",
+        "Tier": states[job["job_id"]].get("tier"),
+        "Error": states[job["job_id"]].get("error"),
+    } for job in jobs]
+    done = sum(state.get("status") == "done" for state in states.values())
+    st.progress(done / len(jobs), text=f"{done} / {len(jobs)} done")
+    st.dataframe(rows, width="stretch", hide_index=True)
+    if thumbs:
+        cols = st.columns(8)
+        for i, (sku, image) in enumerate(list(thumbs.items())[-8:]):
+            cols[i].image(image, caption=sku, width="stretch")
+
+
+def follow_jobs(jobs, states, placeholder):
+    # Blocks until every job is finished; False if the stream was lost
+    thumbs = {}
+    pending = [job_id for job_id, state in states.items() if state.get("status") not in FINAL_STATES]
+    params = {"job_id": pending} if len(pending) <= MAX_FILTER_IDS else None
+    last_id, drawn = None, 0.0
+    for _ in range(RECONNECTS):
+        headers = {"Last-Event-ID": str(last_id)} if last_id else {}
+        try:
+            with requests.get(
+                f"{FASTAPI_BASE_URL}/events", params=params, headers=headers, stream=True, timeout=STREAM_TIMEOUT
+            ) as resp:
+                resp.raise_for_status()
+                for name, event in sse_events(resp):
+                    last_id = (event or {}).get("id", last_id)
+                    job_id = (event or {}).get("job_id")
+                    if name == "job" and job_id in states:
+                        states[job_id].update({k: event.get(k) for k in ("status", "tier", "error", "attempts")})
+                    elif name == "stage" and job_id in states and event.get("thumbnail"):
+                        thumbs[event["sku"]] = base64.b64decode(event["thumbnail"].partition(",")[2])
+                    elif name == "lagged":
+                        states.update(job_states(jobs))
+                    finished = all_final(states)
+                    if finished or name == "keep-alive" or time.monotonic() - drawn >= REDRAW_SECONDS:
+                        with placeholder.container():
+                            draw_jobs(jobs, states, thumbs)
+                        drawn = time.monotonic()
+                    if finished:
+                        return True
+        except requests.RequestException:
+            continue
+    return False
+
+
+def job_list():
+    jobs = st.session_state.batch_jobs
+    if not jobs:
+        return
+    placeholder = st.empty()
+    states = job_states(jobs)
+    if not all_final(states):
+        with placeholder.container():
+            draw_jobs(jobs, states, {})
+        if not follow_jobs(jobs, states, placeholder):
+            st.warning("⚠️ Lost the worker's event stream – reload the page to resume")
+            return
+        states = job_states(jobs)   # result URLs for the finished jobs
+    with placeholder.container():
+        draw_jobs(jobs, states, {})
+
+    finished = [job for job in jobs if states[job["job_id"]].get("status") == "done"]
+    # Streamed by the worker straight to the browser – never held here.
+    # Only this session's jobs, split over several links for long lists.
+    job_ids = list(dict.fromkeys(job["job_id"] for job in finished))
+    for start in range(0, len(job_ids), EXPORT_LINK_IDS):
+        chunk = job_ids[start:start + EXPORT_LINK_IDS]
+        part = f" ({start + 1}–{start + len(chunk)})" if len(job_ids) > EXPORT_LINK_IDS else ""
+        st.link_button(
+            f"📦 Download {len(chunk)} results{part} (ZIP + manifest.csv)",
+            f"{FASTAPI_BASE_URL}/export?{urlencode({'job_id': chunk, 'layout': 'sku'}, doseq=True)}",
+        )
+    cols = st.columns(4)
+    for i, job in enumerate(finished[-8:]):
+        image = fetch_result(states[job["job_id"]]["result_url"])
+        cols[i % 4].image(image, caption=job["sku"], width="stretch")
+        cols[i % 4].download_button(
+            "⬇️ Download", image, f"{job['sku']}.jpg", "image/jpeg", key=f"dl_{job['job_id']}"
+        )
+
+
+st.subheader("Jobs")
+if st.session_state.batch_jobs and st.button("🧹 Clear job list"):
+    st.session_state.batch_jobs = []
+    st.rerun()
+job_list()
@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+# ==================================================
+# BATCH MODE CONFIG
+# ==================================================
+# Everything can be overridden with environment variables of the same name.
+SRS_KEY = os.environ.get("SRS_KEY")
+
+FASTAPI_HOST = os.environ.get("FASTAPI_HOST", "0.0.0.0")
+FASTAPI_PORT = int(os.environ.get("FASTAPI_PORT", "8000"))
+FASTAPI_BASE_URL = os.environ.get("FASTAPI_BASE_URL", f"http://localhost:{FASTAPI_PORT}")
+
+DATA_DIR = Path(os.environ.get("SRS_DATA_DIR", Path(__file__).resolve().parent / "data"))
+INPUT_DIR = DATA_DIR / "inputs"
+OUTPUT_DIR = DATA_DIR / "outputs"
+# POST /generate/zip may read archives by path only from inside this folder
+ZIP_IMPORT_DIR = Path(os.environ["ZIP_IMPORT_DIR"]).resolve() if os.environ.get("ZIP_IMPORT_DIR") else None
+# SQLite job store (WAL) – queued jobs and results survive restarts
+DB_PATH = Path(os.environ.get("SRS_DB_PATH", DATA_DIR / "jobs.db"))
+
+# Jobs waiting beyond this are refused with 429 instead of piling up
+QUEUE_MAXSIZE = int(os.environ.get("QUEUE_MAXSIZE", "200"))
+# Simultaneous generate_content calls (one async worker each)
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "4"))
+# Processes for decode / compress / QA (default: cores - 1)
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+GENERATION_TIMEOUT = float(os.environ.get("GENERATION_TIMEOUT", "300"))
+UPLOAD_QUALITY = int(os.environ.get("UPLOAD_QUALITY", "85"))
+# Events buffered per /events subscriber before the oldest are dropped
+EVENT_BUFFER = int(os.environ.get("EVENT_BUFFER", "256"))
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "192"))
+# A claimed job whose lease isn't renewed this long goes back to the queue
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS", "60"))
+# Tries per job before it is marked failed (API errors, crashes, timeouts)
+MAX_ATTEMPTS = int(os.environ.get("MAX_ATTEMPTS", "3"))
+
+# Folder watch ingest (off unless WATCH_DIR is set). Finished images are
+# copied to WATCH_OUTPUT_DIR as <sku>.jpg / <sku>.json.
+WATCH_DIR = Path(os.environ["WATCH_DIR"]) if os.environ.get("WATCH_DIR") else None
+WATCH_OUTPUT_DIR = Path(os.environ.get("WATCH_OUTPUT_DIR") or (WATCH_DIR or DATA_DIR) / "generated")
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", "2"))
+# Ticks a file's size/mtime must hold still before it is read
+WATCH_STABLE_CHECKS = int(os.environ.get("WATCH_STABLE_CHECKS", "2"))
+# Seconds after a SKU's last file change before it is submitted
+WATCH_GROUP_WAIT = float(os.environ.get("WATCH_GROUP_WAIT", "10"))
+WATCH_POLLING = os.environ.get("WATCH_POLLING", "") not in ("", "0")
+# Options for watched jobs; unset ones use the engine defaults
+WATCH_OPTIONS = {
+    key: os.environ[f"WATCH_{key.upper()}"]
+    for key in ("dress_type", "background", "pose", "aspect_ratio", "resolution")
+    if os.environ.get(f"WATCH_{key.upper()}")
+}
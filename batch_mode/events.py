@@ -0,0 +1,102 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+
+# ==================================================
+# IN-PROCESS EVENT BUS
+# ==================================================
+# publish() is called from the event loop (job queue, run_job, watcher)
+# and fans each event out to every subscriber's own bounded queue. It
+# never waits. When a subscriber's queue is full, its oldest event is
+# dropped and counted, and the subscriber receives a "lagged" event
+# before the next one. A slow client therefore costs at most `maxsize`
+# events of memory and can never stall the workers; it can always
+# re-sync from GET /jobs/{id}.
+#
+# Every event gets an increasing "id". The last `replay` events are
+# kept, so a client that reconnects with Last-Event-ID picks up where it
+# left off.
+#
+# Events are plain dicts:
+#   {"id", "type": "job", "job_id", "sku", "status", "attempts", "error", ...}
+#   {"id", "type": "stage", "job_id", "sku", "stage", "seconds", ...}
+#   {"id", "type": "watch_*", ...}
+KEEPALIVE_SECONDS = 15.0
+
+
+class Subscription:
+    def __init__(self, job_ids=None, maxsize=256):
+        self.job_ids = set(job_ids) if job_ids else None
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def wants(self, event):
+        return self.job_ids is None or event.get("job_id") in self.job_ids
+
+    def offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(self, maxsize=256, replay=1000):
+        self.maxsize = maxsize
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=replay)
+        self._subscribers = set()
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        event = dict(event, id=next(self._ids))
+        self._recent.append(event)
+        for sub in self._subscribers:
+            if sub.wants(event):
+                sub.offer(event)
+        return event
+
+    def subscribe(self, job_ids=None, last_id=None, backlog=0):
+        # backlog: extra queue room for events the caller offers up front
+        sub = Subscription(job_ids, self.maxsize + backlog)
+        if last_id is not None:
+            for event in self._recent:
+                if event["id"] > last_id and sub.wants(event):
+                    sub.offer(event)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+
+def sse_format(event, name=None):
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {name or event.get('type', 'message')}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(bus, sub):
+    # text/event-stream body for one subscriber; ends when the client
+    # disconnects (the response task is cancelled)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if sub.dropped:
+                yield sse_format({"type": "lagged", "dropped": sub.dropped})
+                sub.dropped = 0
+            yield sse_format(event)
+    finally:
+        bus.unsubscribe(sub)
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+
+from srs_core.archive import sku_from_name
+from srs_core.engine import output_paths
+
+# ==================================================
+# STREAMING ZIP EXPORT
+# ==================================================
+# stream_zip() yields a ZIP of finished jobs chunk by chunk while it reads
+# the outputs from disk, so nothing is ever assembled in memory.
+#   - Entries are STORED: the JPEGs are already compressed, and deflating
+#     them again only costs CPU.
+#   - ZipFile writes into ChunkSink, which it can't seek. It therefore
+#     puts sizes/CRC in data descriptors after each entry instead of
+#     going back to patch the headers.
+#   - manifest.csv is built in a spooled temp file (on disk past 1 MB) and
+#     written last.
+# Layouts: "flat" → <sku>.jpg; "sku" → <sku>/<sku>.jpg + <sku>/<sku>.json.
+CHUNK_SIZE = 256 * 1024
+LAYOUTS = ("flat", "sku")
+MANIFEST_COLUMNS = [
+    "sku", "job_id", "file", "tier", "dress_type", "background", "pose", "aspect_ratio",
+    "resolution", "blouse_color", "lehenga_color", "dupatta_color", "width", "height",
+    "geometry", "color_qa", "template_version", "template_hash", "prompt_hash",
+    "created_at", "finished_at", "seconds",
+]
+
+
+class ChunkSink(io.RawIOBase):
+    # Write-only, unseekable file for ZipFile; take() hands over the bytes
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arcnames(record, layout, taken):
+    # Unique, path-free names; a SKU exported twice gets the job id appended
+    sku = sku_from_name(record["sku"])
+    if sku in taken:
+        sku = f"{sku}-{record['job_id'][:8]}"
+    taken.add(sku)
+    if layout == "sku":
+        return f"{sku}/{sku}.jpg", f"{sku}/{sku}.json"
+    return f"{sku}.jpg", None
+
+
+def manifest_row(record, arcname, meta):
+    spec = meta.get("spec") or record["spec"]
+    colors = spec.get("colors") or {}
+    qa = meta.get("color_qa") or []
+    size = meta.get("size") or [None, None]
+    return {
+        "sku": record["sku"],
+        "job_id": record["job_id"],
+        "file": arcname,
+        "tier": meta.get("tier"),
+        "dress_type": spec.get("dress_type"),
+        "background": spec.get("background"),
+        "pose": spec.get("pose"),
+        "aspect_ratio": spec.get("aspect_ratio"),
+        "resolution": spec.get("resolution"),
+        "blouse_color": colors.get("Blouse"),
+        "lehenga_color": colors.get("Lehenga"),
+        "dupatta_color": colors.get("Dupatta"),
+        "width": size[0],
+        "height": size[1],
+        "geometry": meta.get("geometry"),
+        "color_qa": ";".join(f"{check['slot']}:{check['status']}" for check in qa),
+        "template_version": meta.get("template_version"),
+        "template_hash": meta.get("template_hash"),
+        "prompt_hash": meta.get("prompt_hash"),
+        "created_at": record["created_at"],
+        "finished_at": record["finished_at"],
+        "seconds": round(sum((meta.get("timings") or {}).values()), 3),
+    }
+
+
+def _copy(zf, sink, path, arcname, chunk_size):
+    with open(path, "rb") as src, zf.open(zipfile.ZipInfo.from_file(path, arcname), "w") as dst:
+        while chunk := src.read(chunk_size):
+            dst.write(chunk)
+            yield sink.take()
+
+
+def stream_zip(records, out_dir_of, layout="flat", manifest=True, chunk_size=CHUNK_SIZE):
+    # records: iterable of done job records; out_dir_of(record) → folder
+    # holding <sku>.jpg / <sku>.json. Yields the ZIP as bytes chunks.
+    for chunk in _zip_chunks(records, out_dir_of, layout, manifest, chunk_size):
+        if chunk:
+            yield chunk
+
+
+def _zip_chunks(records, out_dir_of, layout, manifest, chunk_size):
+    sink = ChunkSink()
+    taken = set()
+    rows = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", newline="", encoding="utf-8")
+    writer = csv.DictWriter(rows, fieldnames=MANIFEST_COLUMNS)
+    writer.writeheader()
+    with rows, zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for record in records:
+            image_path, meta_path = output_paths(out_dir_of(record), record["sku"])
+            if not image_path.exists():
+                continue   # output cleaned up since the job finished
+            image_name, meta_name = _arcnames(record, layout, taken)
+            yield from _copy(zf, sink, image_path, image_name, chunk_size)
+            meta = {}
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                if meta_name:
+                    yield from _copy(zf, sink, meta_path, meta_name, chunk_size)
+            writer.writerow(manifest_row(record, image_name, meta))
+        if manifest:
+            rows.seek(0)
+            with zf.open("manifest.csv", "w") as dst:
+                while chunk := rows.read(chunk_size):
+                    dst.write(chunk.encode("utf-8"))
+                    yield sink.take()
+    yield sink.take()   # central directory
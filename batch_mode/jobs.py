@@ -0,0 +1,158 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from batch_mode.store import job_key
+
+# ==================================================
+# BOUNDED, PERSISTENT JOB QUEUE
+# ==================================================
+# Jobs live in a JobStore (batch_mode/store.py), so the queue survives a
+# restart. submit() inserts a queued row. Once `maxsize` jobs are waiting
+# it raises asyncio.QueueFull so the API can answer 429 instead of
+# buffering without limit. `workers` coroutines claim rows under a lease,
+# renew it every lease/3 seconds while run_job(record) runs, then mark
+# the row done or failed. Failed jobs are retried up to the store's
+# max_attempts.
+#
+# If the process dies, its leases simply stop being renewed. The reaper
+# (and start()) put expired rows back in the queue. Done rows are never
+# claimed again.
+#
+# Records are plain dicts (see store.py):
+#   job_id, sku, spec, status (queued/running/done/failed), attempts,
+#   created_at, started_at, finished_at, error, result, output_path
+#
+# Every state change is also passed to on_event as job_event(record):
+#   {"type": "job", "job_id", "sku", "status", "attempts", "error"}
+#   (+ "tier", "timings" once done)
+
+
+def job_event(record, **extra):
+    result = record.get("result") or {}
+    event = {
+        "type": "job",
+        "job_id": record["job_id"],
+        "sku": record["sku"],
+        "status": record["status"],
+        "attempts": record["attempts"],
+        "error": record["error"],
+    }
+    if result:
+        event.update(tier=result.get("tier"), timings=result.get("timings"))
+    event.update(extra)
+    return event
+
+
+class JobQueue:
+    def __init__(self, run_job, store, maxsize=200, workers=4, lease=60.0, poll=1.0, on_event=None):
+        self.run_job = run_job
+        self.store = store
+        self.emit = on_event or (lambda event: None)
+        self.maxsize = maxsize
+        self.workers = workers
+        self.lease = lease
+        self.poll = poll
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.busy = 0
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    def depth(self):
+        return self.store.counts()["queued"]
+
+    def full(self):
+        return self.depth() >= self.maxsize
+
+    def free(self):
+        return max(0, self.maxsize - self.depth())
+
+    def submit(self, spec, job_id=None, input_digest=None):
+        # Returns the record; an identical active job is returned as is
+        # (compare job_id to tell)
+        try:
+            record, created = self.store.add(
+                job_id or uuid.uuid4().hex,
+                job_key(spec, input_digest),
+                spec,
+                input_digest=input_digest,
+                max_queued=self.maxsize,
+            )
+        except OverflowError:
+            raise asyncio.QueueFull
+        if created:
+            self._changed(record)
+            self._wake.set()
+        return record
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _changed(self, record):
+        self.emit(job_event(record))
+
+    def _reload(self, job_id):
+        record = self.store.get(job_id)
+        if record is not None:
+            self._changed(record)
+
+    async def start(self):
+        for job_id, _ in self.store.requeue_expired():
+            self._reload(job_id)
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _heartbeat(self, job_id, owner):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not self.store.renew(job_id, owner, self.lease):
+                return   # lease lost – complete()/fail() will be ignored
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            expired = self.store.requeue_expired()
+            for job_id, _ in expired:
+                self._reload(job_id)
+            if expired:
+                self._wake.set()
+
+    async def _worker(self, n):
+        owner = f"{self.owner}/{n}"
+        while True:
+            # Clear before claiming so a submit in between isn't missed
+            self._wake.clear()
+            record = self.store.claim(owner, self.lease)
+            if record is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id = record["job_id"]
+            self.busy += 1
+            self._changed(record)
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, owner))
+            try:
+                result = await self.run_job(record)
+            except asyncio.CancelledError:
+                if self.store.release(job_id, owner):
+                    self._reload(job_id)
+                raise
+            except Exception as e:
+                if self.store.fail(job_id, owner, f"{type(e).__name__}: {e}"):
+                    self._reload(job_id)
+            else:
+                if self.store.complete(job_id, owner, result):
+                    self._reload(job_id)
+            finally:
+                heartbeat.cancel()
+                self.busy -= 1
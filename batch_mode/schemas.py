@@ -0,0 +1,124 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, field_validator
+
+try:
+    from srs_core.archive import SKU_PATTERN
+    from srs_core.engine import ASPECT_RATIOS, HEX_COLOR
+    from srs_core.templates import get_registry
+except ImportError:  # run as `python batch_mode/worker.py`
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from srs_core.archive import SKU_PATTERN
+    from srs_core.engine import ASPECT_RATIOS, HEX_COLOR
+    from srs_core.templates import get_registry
+
+# ==================================================
+# REQUEST / RESPONSE MODELS
+# ==================================================
+JobState = Literal["queued", "running", "done", "failed"]
+
+
+class GenerateOptions(BaseModel):
+    # Form fields of POST /generate (images come as files next to them)
+    sku: Optional[str] = None
+    dress_type: str = "Normal Mode"
+    background: Optional[str] = None
+    pose: str = "Natural Standing"
+    aspect_ratio: str = "3:4"
+    resolution: Literal["1K", "2K", "4K"] = "2K"
+    blouse_color: Optional[str] = None
+    lehenga_color: Optional[str] = None
+    dupatta_color: Optional[str] = None
+
+    @field_validator("sku")
+    @classmethod
+    def safe_sku(cls, value):
+        # Used as the output file name and the ZIP member name
+        if value in (None, ""):
+            return None
+        if not SKU_PATTERN.match(value):
+            raise ValueError("sku may only use letters, digits, '_', '-' and '.' and can't start with '.'")
+        return value
+
+    @field_validator("dress_type")
+    @classmethod
+    def known_dress_type(cls, value):
+        if value not in get_registry().dress_types:
+            raise ValueError(f"unknown dress_type '{value}'")
+        return value
+
+    @field_validator("pose")
+    @classmethod
+    def known_pose(cls, value):
+        if value not in get_registry().poses:
+            raise ValueError(f"unknown pose '{value}'")
+        return value
+
+    @field_validator("aspect_ratio")
+    @classmethod
+    def known_aspect(cls, value):
+        if value not in ASPECT_RATIOS:
+            raise ValueError(f"aspect_ratio must be one of {', '.join(ASPECT_RATIOS)}")
+        return value
+
+    @field_validator("blouse_color", "lehenga_color", "dupatta_color")
+    @classmethod
+    def hex_color(cls, value):
+        if value in (None, ""):
+            return None
+        if not HEX_COLOR.match(value):
+            raise ValueError("colors must be #RRGGBB")
+        return value.upper()
+
+    def colors(self):
+        # None → auto colors in the engine
+        picked = {
+            "Blouse": self.blouse_color,
+            "Lehenga": self.lehenga_color,
+            "Dupatta": self.dupatta_color,
+        }
+        picked = {slot: value for slot, value in picked.items() if value}
+        return picked or None
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    sku: str
+    status: JobState
+    queue_depth: int
+    duplicate: bool = False
+
+
+class ZipAccepted(BaseModel):
+    archive: str
+    groups: int
+    jobs: list[JobAccepted]
+    refused: list[str] = []   # SKUs not queued because the queue was full
+    queue_depth: int
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    sku: str
+    status: JobState
+    attempts: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    tier: Optional[str] = None
+    timings: Optional[dict] = None
+    result_url: Optional[str] = None
+
+
+class Health(BaseModel):
+    status: str
+    api_key: bool
+    queue_depth: int
+    queue_limit: int
+    workers: int
+    busy: int
+    jobs: dict[str, int] = {}
+    subscribers: int = 0
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from srs_core.archive import IMAGE_SLOTS
+
+# ==================================================
+# PERSISTENT JOB STORE (SQLite, WAL)
+# ==================================================
+# One row per job: spec, input digest, state, attempts, lease, result.
+# Every state change is also appended to job_events.
+#
+#   queued --claim()--> running --complete()--> done
+#                          |  \--fail()-------> queued (attempts left) / failed
+#                          \--lease expires---> queued (attempts left) / failed
+#
+# A claim takes a lease (owner + expiry) that the worker renews while it
+# runs. After a crash nobody renews it, so requeue_expired() hands the
+# job to the next worker. Done rows are never claimed again, and submit
+# finds an existing job with the same job_key (input digest + spec)
+# instead of adding a duplicate.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id        TEXT PRIMARY KEY,
+    job_key       TEXT NOT NULL,
+    sku           TEXT NOT NULL,
+    spec          TEXT NOT NULL,
+    input_digest  TEXT,
+    status        TEXT NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    created_at    REAL NOT NULL,
+    started_at    REAL,
+    finished_at   REAL,
+    error         TEXT,
+    result        TEXT,
+    output_path   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (job_key);
+CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS job_events (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id    TEXT NOT NULL,
+    at        REAL NOT NULL,
+    status    TEXT NOT NULL,
+    detail    TEXT
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);
+"""
+MAX_ATTEMPTS = 3
+ACTIVE = ("queued", "running", "done")
+
+
+def job_key(spec, input_digest):
+    # Same images + same options → same key, wherever the files (or the
+    # ZIP they came in) were saved
+    options = {k: v for k, v in spec.items() if k not in IMAGE_SLOTS and k != "archive"}
+    h = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    h.update((input_digest or "").encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _row(row):
+    if row is None:
+        return None
+    record = dict(row)
+    record["spec"] = json.loads(record["spec"])
+    record["result"] = json.loads(record["result"]) if record["result"] else None
+    return record
+
+
+class JobStore:
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, now=time.time):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.now = now
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+    @contextmanager
+    def _tx(self):
+        # BEGIN IMMEDIATE: take the write lock up front so claim's
+        # select-then-update can't race another process
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _event(self, db, job_id, status, detail=None):
+        db.execute(
+            "INSERT INTO job_events (job_id, at, status, detail) VALUES (?, ?, ?, ?)",
+            (job_id, self.now(), status, detail),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --------------------------------------------------
+    # SUBMIT / READ
+    # --------------------------------------------------
+    def find(self, job_key):
+        # Newest queued/running/done job for this key, if any
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE job_key = ? AND status IN (?, ?, ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (job_key, *ACTIVE),
+            ).fetchone()
+        return _row(row)
+
+    def add(self, job_id, job_key, spec, input_digest=None, max_queued=None):
+        # Returns (record, created). An existing active job with the same
+        # key is returned instead of a duplicate. With max_queued set,
+        # raises OverflowError once that many jobs are waiting.
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE job_key = ? AND status IN (?, ?, ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (job_key, *ACTIVE),
+            ).fetchone()
+            if row is not None:
+                return _row(row), False
+            if max_queued is not None:
+                queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if queued >= max_queued:
+                    raise OverflowError("queue full")
+            db.execute(
+                "INSERT INTO jobs (job_id, job_key, sku, spec, input_digest, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, job_key, spec["sku"], json.dumps(spec), input_digest, self.now()),
+            )
+            self._event(db, job_id, "queued")
+            row = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row(row), True
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row(row)
+
+    def events(self, job_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT at, status, detail FROM job_events WHERE job_id = ? ORDER BY id", (job_id,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def done_jobs(self, since=None, page_size=200):
+        # Finished jobs in completion order, fetched a page at a time so
+        # the lock is never held while the caller works on a row
+        after = (0.0, "")
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = 'done' AND created_at >= ? "
+                    "AND (finished_at, job_id) > (?, ?) ORDER BY finished_at, job_id LIMIT ?",
+                    (since or 0.0, *after, page_size),
+                ).fetchall()
+            for row in rows:
+                yield _row(row)
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["finished_at"], rows[-1]["job_id"])
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+    # --------------------------------------------------
+    # LEASES
+    # --------------------------------------------------
+    def claim(self, owner, lease_seconds):
+        # Oldest queued job → running under `owner`, or None
+        now = self.now()
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, started_at = ?, error = NULL WHERE job_id = ?",
+                (owner, now + lease_seconds, now, row["job_id"]),
+            )
+            self._event(db, row["job_id"], "running", owner)
+            claimed = db.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+        return _row(claimed)
+
+    def renew(self, job_id, owner, lease_seconds):
+        # False when the lease was lost (expired and requeued meanwhile)
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND lease_owner = ? AND status = 'running'",
+                (self.now() + lease_seconds, job_id, owner),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id, owner, result):
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, result = ?, output_path = ?, "
+                "lease_owner = NULL, lease_expires = NULL WHERE job_id = ? AND lease_owner = ?",
+                (self.now(), json.dumps(result, default=str), result.get("path"), job_id, owner),
+            )
+            if cur.rowcount:
+                self._event(db, job_id, "done")
+            return cur.rowcount == 1
+
+    def fail(self, job_id, owner, error):
+        # Back to the queue while attempts remain, else failed for good
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT attempts FROM jobs WHERE job_id = ? AND lease_owner = ?", (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return None
+            status = "queued" if row["attempts"] < self.max_attempts else "failed"
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL WHERE job_id = ?",
+                (status, error, self.now() if status == "failed" else None, job_id),
+            )
+            self._event(db, job_id, status, error)
+            return status
+
+    def release(self, job_id, owner):
+        # Clean shutdown: hand the job back without spending an attempt
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), "
+                "lease_owner = NULL, lease_expires = NULL WHERE job_id = ? AND lease_owner = ? "
+                "AND status = 'running'",
+                (job_id, owner),
+            )
+            if cur.rowcount:
+                self._event(db, job_id, "queued", "released")
+            return cur.rowcount == 1
+
+    def requeue_expired(self):
+        # Running jobs whose lease ran out (worker died) → queued / failed.
+        # Returns [(job_id, new status)].
+        now = self.now()
+        with self._tx() as db:
+            rows = db.execute(
+                "SELECT job_id, attempts FROM jobs WHERE status = 'running' AND lease_expires < ?", (now,)
+            ).fetchall()
+            for row in rows:
+                status = "queued" if row["attempts"] < self.max_attempts else "failed"
+                db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                    "lease_owner = NULL, lease_expires = NULL WHERE job_id = ?",
+                    (status, "lease expired", now if status == "failed" else None, row["job_id"]),
+                )
+                self._event(db, row["job_id"], status, "lease expired")
+        return [(row["job_id"], status) for row in rows]
@@ -0,0 +1,273 @@
+import asyncio
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import shutil
+import struct
+import time
+import uuid
+from pathlib import Path
+
+from PIL import Image
+
+from srs_core.archive import IMAGE_SLOTS, parse_name
+from srs_core.engine import SLOT_LABELS, preprocess_image
+
+# ==================================================
+# FOLDER WATCH INGEST
+# ==================================================
+# Photographers drop shots into WATCH_DIR; every complete garment becomes a
+# job without anyone opening the UI. Files are grouped by name:
+#   <SKU>.jpg or <SKU>_main.jpg    main image (required)
+#   <SKU>_choli.jpg                choli reference (optional)
+#   <SKU>_lehenga.jpg              lehenga reference (optional)
+# ("_", "-" or a space before the slot name; any image suffix.)
+#
+# Change detection uses inotify on Linux. Elsewhere, or when inotify is
+# unavailable, the folder is re-scanned every tick. Either way a file only
+# counts once its size and mtime held still for `stable_checks` ticks, so
+# half-copied files are never read. A group is submitted `group_wait`
+# seconds after its last change, which leaves time for the references to
+# arrive after the main shot.
+#
+# The originals are hashed first. If known(sku, digest) finds a job for
+# those exact files, nothing is staged, so a restart doesn't re-process
+# the whole folder. Otherwise staging runs in the CPU pool: decode,
+# orient, resize and compress each image like auto_process_image does,
+# and write it to the job's input folder. Replacing a file with different
+# content submits a new job.
+def group_digest(sources, chunk_size=1 << 20):
+    # Hash of the original files (same scheme as uploads to POST /generate)
+    digest = hashlib.blake2b(digest_size=16)
+    for slot in IMAGE_SLOTS:
+        if sources.get(slot):
+            digest.update(slot.encode("utf-8"))
+            with open(sources[slot], "rb") as f:
+                while chunk := f.read(chunk_size):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_group(sources, dest_dir, upload_quality=85):
+    # Process-pool stage: originals → preprocessed JPEGs in dest_dir.
+    # Returns {"paths": {slot: path}, "notes"}.
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    paths, notes = {}, []
+    for slot in IMAGE_SLOTS:
+        source = sources.get(slot)
+        if not source:
+            continue
+        with Image.open(source) as raw:
+            raw.load()
+            img, slot_notes = preprocess_image(
+                raw, os.path.getsize(source), upload_quality, label=SLOT_LABELS[slot]
+            )
+        path = dest_dir / f"{slot}.jpg"
+        img.convert("RGB").save(path, format="JPEG", quality=95)
+        paths[slot] = str(path)
+        notes += [message for _, message in slot_notes]
+    return {"paths": paths, "notes": notes}
+
+
+# ==================================================
+# INOTIFY (ctypes, Linux only)
+# ==================================================
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+
+    def read(self):
+        # Names touched since the last call; None means "queue overflowed,
+        # rescan everything"
+        names = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(buf):
+                _, mask, _, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify(folder):
+    try:
+        return Inotify(folder)
+    except (OSError, AttributeError):   # not Linux, or no inotify in libc
+        return None
+
+
+# ==================================================
+# WATCHER
+# ==================================================
+class FolderWatcher:
+    def __init__(
+        self, folder, submit, pool, upload_quality=85, interval=2.0,
+        stable_checks=2, group_wait=10.0, polling=False, capacity=None, known=None, on_event=None,
+    ):
+        # submit(sku, job_id, staged) → job record, raises asyncio.QueueFull.
+        # capacity() → free queue slots; at most that many groups are
+        # staged per tick, the rest wait without touching the CPU pool.
+        # known(sku, digest) → existing job record or None.
+        self.folder = Path(folder)
+        self.submit = submit
+        self.capacity = capacity or (lambda: None)
+        self.known = known or (lambda sku, digest: None)
+        self.pool = pool
+        self.upload_quality = upload_quality
+        self.interval = interval
+        self.stable_checks = stable_checks
+        self.group_wait = group_wait
+        self.emit = on_event or (lambda event: None)
+        self.inotify = None if polling else open_inotify(self.folder)
+        self.files = {}       # name → {"stat": (size, mtime), "stable": n}
+        self.changed = {}     # sku → monotonic time of its last change
+        self.submitted = {}   # sku → group signature at submit time
+        self.failed = {}      # sku → signature that failed to stage
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify else "polling"
+
+    def _stat(self, name):
+        try:
+            st = os.stat(self.folder / name)
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _touch(self, name):
+        # Re-stat one file; a changed stat resets its stability count
+        parsed = parse_name(name)
+        if parsed is None:
+            return
+        stat = self._stat(name)
+        entry = self.files.get(name)
+        if stat is None:
+            if entry is not None:
+                del self.files[name]
+                self.changed[parsed[0]] = time.monotonic()
+            return
+        if entry is None or entry["stat"] != stat:
+            self.files[name] = {"stat": stat, "stable": 0}
+            self.changed[parsed[0]] = time.monotonic()
+        elif stat[0] > 0:
+            entry["stable"] += 1
+
+    def scan(self):
+        # One tick's worth of filesystem work (runs in a thread)
+        if self.inotify is None:
+            names = {e.name for e in os.scandir(self.folder) if e.is_file()} | set(self.files)
+        else:
+            touched = self.inotify.read()
+            if touched is None:
+                touched = {e.name for e in os.scandir(self.folder) if e.is_file()}
+            # Unstable files need re-stating even without new events
+            names = touched | {n for n, e in self.files.items() if e["stable"] < self.stable_checks}
+        for name in names:
+            self._touch(name)
+
+    def ready_groups(self):
+        # {sku: ({slot: path}, signature)} for complete groups not yet submitted
+        groups = {}
+        for name, entry in self.files.items():
+            sku, slot = parse_name(name)
+            groups.setdefault(sku, {})[slot] = (name, entry)
+        now = time.monotonic()
+        ready = {}
+        for sku, slots in groups.items():
+            if "main" not in slots or now - self.changed.get(sku, now) < self.group_wait:
+                continue
+            if any(entry["stable"] < self.stable_checks for _, entry in slots.values()):
+                continue
+            signature = tuple(sorted((slot, entry["stat"]) for slot, (_, entry) in slots.items()))
+            if self.submitted.get(sku) == signature or self.failed.get(sku) == signature:
+                continue
+            ready[sku] = ({slot: str(self.folder / name) for slot, (name, _) in slots.items()}, signature)
+        return ready
+
+    async def stage_and_submit(self, sku, sources, signature, staging_dir):
+        loop = asyncio.get_running_loop()
+        job_id = uuid.uuid4().hex
+        dest_dir = Path(staging_dir) / job_id
+        try:
+            digest = await asyncio.to_thread(group_digest, sources)
+            existing = self.known(sku, digest)
+            if existing is not None:
+                self.submitted[sku] = signature
+                self.emit({"type": "watch_submitted", "sku": sku, "job_id": existing["job_id"], "duplicate": True})
+                return
+            staged = await loop.run_in_executor(
+                self.pool, stage_group, sources, str(dest_dir), self.upload_quality
+            )
+            staged["digest"] = digest
+        except Exception as e:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            self.failed[sku] = signature
+            self.emit({"type": "watch_failed", "sku": sku, "error": f"{type(e).__name__}: {e}"})
+            return
+        try:
+            record = self.submit(sku, job_id, staged)
+        except asyncio.QueueFull:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            return   # retried next tick
+        if record["job_id"] != job_id:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+        self.submitted[sku] = signature
+        self.emit({"type": "watch_submitted", "sku": sku, "job_id": record["job_id"],
+                   "duplicate": record["job_id"] != job_id})
+
+    async def run(self, staging_dir):
+        self.emit({"type": "watch_started", "folder": str(self.folder), "mode": self.mode})
+        if self.inotify is not None:
+            # Files that were already there before the watch started
+            for entry in os.scandir(self.folder):
+                if entry.is_file():
+                    self._touch(entry.name)
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await asyncio.to_thread(self.scan)
+                ready = self.ready_groups()
+                # Oldest groups first, no more than the queue can take; the
+                # rest (and any QueueFull race) retry next tick
+                batch = sorted(ready.items(), key=lambda item: self.changed.get(item[0], 0))[:self.capacity()]
+                if batch:
+                    await asyncio.gather(*(
+                        self.stage_and_submit(sku, sources, signature, staging_dir)
+                        for sku, (sources, signature) in batch
+                    ))
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
@@ -0,0 +1,470 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import shutil
+import time
+import uuid
+import zipfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Annotated, Optional
+
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, UploadFile
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, StreamingResponse
+from PIL import Image
+from pydantic import ValidationError
+
+try:
+    from batch_mode import config
+    from batch_mode.events import EventBus, sse_stream
+    from batch_mode.export import LAYOUTS, stream_zip
+    from batch_mode.jobs import JobQueue, job_event
+    from batch_mode.schemas import GenerateOptions, Health, JobAccepted, JobStatus, ZipAccepted
+    from batch_mode.store import JobStore, job_key
+    from batch_mode.watcher import FolderWatcher
+except ImportError:  # run as `python batch_mode/worker.py`
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from batch_mode import config
+    from batch_mode.events import EventBus, sse_stream
+    from batch_mode.export import LAYOUTS, stream_zip
+    from batch_mode.jobs import JobQueue, job_event
+    from batch_mode.schemas import GenerateOptions, Health, JobAccepted, JobStatus, ZipAccepted
+    from batch_mode.store import JobStore, job_key
+    from batch_mode.watcher import FolderWatcher
+
+from google import genai
+
+from srs_core.archive import archive_digest, sku_from_name, zip_jobs
+from srs_core.engine import cpu_pool, finish_job, generate_job, is_done, job_spec, output_paths, prepare_job
+
+# ==================================================
+# FASTAPI BATCH WORKER
+# ==================================================
+#   POST /generate            multipart: main (+ choli, lehenga) + options
+#                             → 202 {job_id}, or 429 when the queue is full
+#   POST /generate/zip        multipart: archive (or path under
+#                             ZIP_IMPORT_DIR) + options → one job per SKU
+#   GET  /jobs/{id}           status, timings, result_url when done
+#   GET  /jobs/{id}/result    the generated JPEG
+#   GET  /export              streamed ZIP of finished jobs + manifest.csv
+#   GET  /events              server-sent events: job state changes,
+#                             stage timings, thumbnails (batch_mode/events.py)
+#   GET  /health
+#
+# With WATCH_DIR set, a FolderWatcher (batch_mode/watcher.py) also turns
+# files dropped there into jobs.
+#
+# Requests only validate, store the uploads and enqueue. GENERATION_WORKERS
+# async workers run the srs_core.engine stages: CPU work in a process pool,
+# the API call on the event loop. Jobs are kept in the SQLite store at
+# DB_PATH: after a restart queued jobs carry on, and re-submitting the same
+# images + options returns the existing job instead of generating again.
+class Runtime:
+    # Process-wide state created in the lifespan handler
+    client = None
+    pool = None
+    store = None
+    queue = None
+    watcher = None
+    bus = None
+
+
+runtime = Runtime()
+
+
+def finished_result(out_dir, sku):
+    # Output written before a crash but never marked done – reuse it
+    image_path, meta_path = output_paths(out_dir, sku)
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return {"sku": sku, "path": str(image_path), "tier": meta["tier"], "timings": meta["timings"]}
+
+
+def job_output_dir(record):
+    return config.OUTPUT_DIR / record["job_id"]
+
+
+def thumbnail(path, size=config.THUMBNAIL_SIZE):
+    # Small JPEG as a data URL for progress events
+    with Image.open(path) as img:
+        img.thumbnail((size, size))
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, format="JPEG", quality=70)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def stage_event(record, stage, timings, **extra):
+    runtime.bus.publish({
+        "type": "stage", "job_id": record["job_id"], "sku": record["sku"],
+        "stage": stage, "seconds": timings.get(stage), **extra,
+    })
+
+
+async def run_job(record):
+    out_dir = job_output_dir(record)
+    if is_done(out_dir, record["sku"]):
+        if record["spec"].get("deliver_to"):
+            await asyncio.to_thread(deliver, out_dir, record["sku"], record["spec"]["deliver_to"])
+        return finished_result(out_dir, record["sku"])
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(
+        runtime.pool, prepare_job, record["spec"], config.UPLOAD_QUALITY, None
+    )
+    stage_event(record, "prepare", prepared["timings"])
+    if runtime.client is None:
+        raise RuntimeError("SRS_KEY is not set on the worker")
+    result = await asyncio.wait_for(generate_job(runtime.client, prepared), config.GENERATION_TIMEOUT)
+    if not result["output"]:
+        raise RuntimeError("no image in API response")
+    stage_event(record, "generate", result["timings"], tier=result["tier"])
+    saved = await loop.run_in_executor(runtime.pool, finish_job, result, str(out_dir))
+    stage_event(record, "finish", saved["timings"], thumbnail=await asyncio.to_thread(thumbnail, saved["path"]))
+    if record["spec"].get("deliver_to"):
+        await asyncio.to_thread(deliver, out_dir, record["sku"], record["spec"]["deliver_to"])
+    return saved
+
+
+def deliver(out_dir, sku, target_dir):
+    # Copy a finished watch job next to the other deliveries
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for path in output_paths(out_dir, sku):
+        shutil.copy2(path, target_dir / path.name)
+
+
+def watched_spec(sku, paths):
+    return job_spec({"sku": sku, **config.WATCH_OPTIONS, "deliver_to": str(config.WATCH_OUTPUT_DIR), **paths})
+
+
+def submit_watched(sku, job_id, staged):
+    spec = watched_spec(sku, staged["paths"])
+    return runtime.queue.submit(spec, job_id=job_id, input_digest=staged["digest"])
+
+
+def known_watched(sku, digest):
+    # job_key ignores image paths, so any main path gives the same key
+    return runtime.store.find(job_key(watched_spec(sku, {"main": ""}), digest))
+
+
+def log_watch(event):
+    detail = " ".join(f"{k}={v}" for k, v in event.items() if k != "type")
+    print(f"[watch] {event['type']} {detail}", flush=True)
+    runtime.bus.publish(event)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    config.INPUT_DIR.mkdir(parents=True, exist_ok=True)
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    config.DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    runtime.client = genai.Client(api_key=config.SRS_KEY) if config.SRS_KEY else None
+    runtime.pool = cpu_pool(config.CPU_WORKERS)
+    runtime.store = JobStore(config.DB_PATH, max_attempts=config.MAX_ATTEMPTS)
+    runtime.bus = EventBus(maxsize=config.EVENT_BUFFER)
+    runtime.queue = JobQueue(
+        run_job,
+        runtime.store,
+        maxsize=config.QUEUE_MAXSIZE,
+        workers=config.GENERATION_WORKERS,
+        lease=config.LEASE_SECONDS,
+        on_event=runtime.bus.publish,
+    )
+    await runtime.queue.start()
+    watch_task = None
+    if config.WATCH_DIR:
+        config.WATCH_DIR.mkdir(parents=True, exist_ok=True)
+        runtime.watcher = FolderWatcher(
+            config.WATCH_DIR,
+            submit_watched,
+            runtime.pool,
+            upload_quality=config.UPLOAD_QUALITY,
+            interval=config.WATCH_INTERVAL,
+            stable_checks=config.WATCH_STABLE_CHECKS,
+            group_wait=config.WATCH_GROUP_WAIT,
+            polling=config.WATCH_POLLING,
+            capacity=runtime.queue.free,
+            known=known_watched,
+            on_event=log_watch,
+        )
+        watch_task = asyncio.create_task(runtime.watcher.run(config.INPUT_DIR))
+    try:
+        yield
+    finally:
+        if watch_task is not None:
+            watch_task.cancel()
+            await asyncio.gather(watch_task, return_exceptions=True)
+        await runtime.queue.stop()
+        runtime.pool.shutdown(cancel_futures=True)
+        runtime.store.close()
+
+
+app = FastAPI(title="SRS Batch Worker", lifespan=lifespan)
+
+
+def generate_options(
+    sku: Annotated[Optional[str], Form()] = None,
+    dress_type: Annotated[str, Form()] = "Normal Mode",
+    background: Annotated[Optional[str], Form()] = None,
+    pose: Annotated[str, Form()] = "Natural Standing",
+    aspect_ratio: Annotated[str, Form()] = "3:4",
+    resolution: Annotated[str, Form()] = "2K",
+    blouse_color: Annotated[Optional[str], Form()] = None,
+    lehenga_color: Annotated[Optional[str], Form()] = None,
+    dupatta_color: Annotated[Optional[str], Form()] = None,
+):
+    # Multipart form fields → GenerateOptions (validation errors stay 422)
+    try:
+        return GenerateOptions(
+            sku=sku, dress_type=dress_type, background=background, pose=pose,
+            aspect_ratio=aspect_ratio, resolution=resolution, blouse_color=blouse_color,
+            lehenga_color=lehenga_color, dupatta_color=dupatta_color,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+def save_upload(upload, job_dir, slot, digest):
+    # Copy to disk, feeding the bytes into the job's input digest
+    suffix = Path(upload.filename or "").suffix.lower() or ".jpg"
+    path = job_dir / f"{slot}{suffix}"
+    digest.update(slot.encode("utf-8"))
+    with open(path, "wb") as f:
+        while chunk := upload.file.read(1 << 20):
+            digest.update(chunk)
+            f.write(chunk)
+    return str(path)
+
+
+def job_status(record):
+    result = record["result"] or {}
+    return JobStatus(
+        job_id=record["job_id"],
+        sku=record["sku"],
+        status=record["status"],
+        attempts=record["attempts"],
+        created_at=record["created_at"],
+        started_at=record["started_at"],
+        finished_at=record["finished_at"],
+        error=record["error"],
+        tier=result.get("tier"),
+        timings=result.get("timings"),
+        result_url=f"/jobs/{record['job_id']}/result" if record["status"] == "done" else None,
+    )
+
+
+@app.get("/health", response_model=Health)
+async def health():
+    queue = runtime.queue
+    return Health(
+        status="ok",
+        api_key=runtime.client is not None,
+        queue_depth=queue.depth(),
+        queue_limit=queue.maxsize,
+        workers=queue.workers,
+        busy=queue.busy,
+        jobs=runtime.store.counts(),
+        subscribers=runtime.bus.subscribers,
+    )
+
+
+@app.post("/generate", response_model=JobAccepted, status_code=202)
+async def generate(
+    options: Annotated[GenerateOptions, Depends(generate_options)],
+    main: Annotated[UploadFile, File()],
+    choli: Annotated[Optional[UploadFile], File()] = None,
+    lehenga: Annotated[Optional[UploadFile], File()] = None,
+):
+    if not main.filename:
+        raise HTTPException(422, "main image is required")
+    queue = runtime.queue
+    if queue.full():
+        raise HTTPException(429, "queue full, retry later", headers={"Retry-After": "30"})
+
+    job_id = uuid.uuid4().hex
+    job_dir = config.INPUT_DIR / job_id
+    job_dir.mkdir(parents=True)
+    uploads = {"main": main, "choli": choli, "lehenga": lehenga}
+    digest = hashlib.blake2b(digest_size=16)
+    paths = {
+        slot: await asyncio.to_thread(save_upload, upload, job_dir, slot, digest)
+        for slot, upload in uploads.items() if upload is not None and upload.filename
+    }
+
+    spec = job_spec({
+        "sku": options.sku or sku_from_name(Path(main.filename).stem),
+        "dress_type": options.dress_type,
+        "background": options.background,
+        "pose": options.pose,
+        "aspect_ratio": options.aspect_ratio,
+        "resolution": options.resolution,
+        "colors": options.colors(),
+        **paths,
+    })
+    try:
+        record = queue.submit(spec, job_id=job_id, input_digest=digest.hexdigest())
+    except asyncio.QueueFull:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(429, "queue full, retry later", headers={"Retry-After": "30"})
+    if record["job_id"] != job_id:
+        # Same inputs already queued / running / done
+        shutil.rmtree(job_dir, ignore_errors=True)
+    return JobAccepted(
+        job_id=record["job_id"],
+        sku=record["sku"],
+        status=record["status"],
+        queue_depth=queue.depth(),
+        duplicate=record["job_id"] != job_id,
+    )
+
+
+def save_archive(upload, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, 1 << 20)
+
+
+def archive_specs(archive, options):
+    # [(spec, input digest)] – reads the central directory only
+    jobs = list(zip_jobs(archive))
+    with zipfile.ZipFile(archive) as zf:
+        return [
+            (job_spec({**options, **job}), archive_digest(zf, job))
+            for job in jobs
+        ]
+
+
+@app.post("/generate/zip", response_model=ZipAccepted, status_code=202)
+async def generate_zip(
+    options: Annotated[GenerateOptions, Depends(generate_options)],
+    archive: Annotated[Optional[UploadFile], File()] = None,
+    path: Annotated[Optional[str], Form()] = None,
+):
+    # The ZIP is stored (or read in place) as is; workers read members
+    # from it when each job is prepared
+    uploaded = archive is not None and bool(archive.filename)
+    if uploaded:
+        zip_path = config.INPUT_DIR / "archives" / f"{uuid.uuid4().hex}.zip"
+        await asyncio.to_thread(save_archive, archive, zip_path)
+    elif path:
+        zip_path = Path(path).resolve()
+        if config.ZIP_IMPORT_DIR is None or not zip_path.is_relative_to(config.ZIP_IMPORT_DIR):
+            raise HTTPException(403, "path imports are limited to ZIP_IMPORT_DIR")
+        if not zip_path.is_file():
+            raise HTTPException(404, "archive not found")
+    else:
+        raise HTTPException(422, "send an archive file or a path")
+
+    def discard():
+        # A rejected upload is deleted again; path imports are never touched
+        if uploaded:
+            zip_path.unlink(missing_ok=True)
+
+    if not zipfile.is_zipfile(zip_path):
+        discard()
+        raise HTTPException(422, "not a ZIP archive")
+
+    shared = {
+        "dress_type": options.dress_type,
+        "background": options.background,
+        "pose": options.pose,
+        "aspect_ratio": options.aspect_ratio,
+        "resolution": options.resolution,
+        "colors": options.colors(),
+    }
+    specs = await asyncio.to_thread(archive_specs, zip_path, shared)
+    if not specs:
+        discard()
+        raise HTTPException(422, "no images found in the archive")
+
+    queue = runtime.queue
+    accepted, refused = [], []
+    for spec, digest in specs:
+        job_id = uuid.uuid4().hex
+        try:
+            record = queue.submit(spec, job_id=job_id, input_digest=digest)
+        except asyncio.QueueFull:
+            refused.append(spec["sku"])
+            continue
+        accepted.append(JobAccepted(
+            job_id=record["job_id"], sku=record["sku"], status=record["status"],
+            queue_depth=queue.depth(), duplicate=record["job_id"] != job_id,
+        ))
+    if not accepted:
+        discard()
+        raise HTTPException(429, "queue full, retry later", headers={"Retry-After": "30"})
+    return ZipAccepted(
+        archive=str(zip_path), groups=len(specs), jobs=accepted, refused=refused, queue_depth=queue.depth()
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    record = runtime.queue.get(job_id)
+    if record is None:
+        raise HTTPException(404, "unknown job")
+    return job_status(record)
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_result(job_id: str):
+    record = runtime.queue.get(job_id)
+    if record is None:
+        raise HTTPException(404, "unknown job")
+    if record["status"] != "done":
+        raise HTTPException(409, f"job is {record['status']}")
+    path = record["result"]["path"]
+    return FileResponse(path, media_type="image/jpeg", filename=f"{record['sku']}.jpg")
+
+
+@app.get("/export")
+async def export(
+    job_id: Annotated[Optional[list[str]], Query()] = None,
+    since: Optional[float] = None,
+    layout: str = "flat",
+    manifest: bool = True,
+):
+    # Finished jobs as one ZIP, streamed while it is written: either the
+    # listed job_ids, or everything created at/after `since` (epoch s)
+    if layout not in LAYOUTS:
+        raise HTTPException(422, f"layout must be one of {', '.join(LAYOUTS)}")
+    store = runtime.store
+    if job_id:
+        records = (r for r in map(store.get, job_id) if r is not None and r["status"] == "done")
+    else:
+        records = store.done_jobs(since=since)
+    name = f"srs-results-{time.strftime('%Y%m%d-%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_zip(records, job_output_dir, layout=layout, manifest=manifest),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+@app.get("/events")
+async def events(
+    job_id: Annotated[Optional[list[str]], Query()] = None,
+    last_event_id: Annotated[Optional[int], Header()] = None,
+):
+    # SSE stream, optionally limited to some jobs. Filtered streams open
+    # with the current state of each job; Last-Event-ID replays what a
+    # reconnecting client missed.
+    sub = runtime.bus.subscribe(job_id, last_id=last_event_id, backlog=len(job_id or []))
+    for record in map(runtime.store.get, job_id or []):
+        if record is not None:
+            sub.offer(job_event(record, snapshot=True))
+    return StreamingResponse(
+        sse_stream(runtime.bus, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print(f"Starting FastAPI worker on port {config.FASTAPI_PORT}")
+    # Open event streams would otherwise hold shutdown until clients leave
+    uvicorn.run(app, host=config.FASTAPI_HOST, port=config.FASTAPI_PORT, timeout_graceful_shutdown=5)
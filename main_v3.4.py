@@ -1,13 +1,37 @@
 import streamlit as st
-from PIL import Image, ImageOps, UnidentifiedImageError
+from PIL import Image, UnidentifiedImageError
 from io import BytesIO
-import base64
 import traceback
+import zipfile
+from importlib.machinery import ModuleSpec
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from google import genai
 from google.genai import types
 from streamlit_image_coordinates import streamlit_image_coordinates
 
+from srs_core.cache import image_digest
+from srs_core.contact_sheet import build_contact_sheet
+from srs_core.color import PICK_METHODS, PixelSampler, auto_garment_colors, rgb_to_hex
+from srs_core.correction import correct_colors
+from srs_core.engine import MODEL_NAME, color_locks, compress_image, extract_image, generate_with_fallback, preprocess_image
+from srs_core.geometry import classify_aspect, fix_aspect, probe_dimensions
+from srs_core.mask import garment_mask, mask_coverage, mask_overlay
+from srs_core.preservation import REJECT_BELOW, submit_preservation_check
+from srs_core.prompt_cache import PromptPrefixCache, is_cache_error
+from srs_core.qa import verify_color_locks
+from srs_core.ranking import rank_candidates
+from srs_core.templates import get_registry
+from srs_core.tokens import estimate_tokens
+from srs_core.region_fix import composite_patch, context_box, context_thumbnail, crop_tier, region_from_drag
+from srs_core.uploads import UploadCache, inline_part
+from srs_core.upscale import is_below_tier, tier_of, upscale_to_tier
+
+# Streamlit runs this script as __main__ without a module spec, so spawned
+# preservation workers would re-run it from its path. A spec named
+# "__main__" makes them skip that and only import srs_core.
+__spec__ = ModuleSpec("__main__", None)
+
 # ==================================================
 # PAGE CONFIG deployment ready app
 # ==================================================
@@ -32,151 +56,78 @@ GEMINI_API_KEY = st.secrets.get("SRS_KEY")
 if not GEMINI_API_KEY:
     st.error("❌ GOOGLE_API_KEY missing in Streamlit secrets.")
     st.stop()
-MODEL_NAME = "gemini-3.1-flash-image-preview"
+# Upper bound on simultaneous generate_content calls (API rate limit)
+MAX_PARALLEL_GENERATIONS = 3
 # ==================================================
 # SESSION STATE
 # ==================================================
 st.session_state.setdefault("last_generated_image", None)
 st.session_state.setdefault("retry_mode", False)
 st.session_state.setdefault("final_prompt", "")
+st.session_state.setdefault("prompt_dress_type", None)
+st.session_state.setdefault("prompt_dynamic", "")
+st.session_state.setdefault("prompt_template_hash", None)
+st.session_state.setdefault("color_locks", {})
+st.session_state.setdefault("corrected_image", None)
+st.session_state.setdefault("produced_tier", None)
+st.session_state.setdefault("upscaled_image", None)
+st.session_state.setdefault("fix_region", None)
+st.session_state.setdefault("fix_picker_round", 0)
+st.session_state.setdefault("candidates", [])
+st.session_state.setdefault("lookbook", None)
 st.session_state.setdefault("confirm_redirect", False)
 st.session_state.setdefault("main_image", None)
 st.session_state.setdefault("main_file_sig", None)
+st.session_state.setdefault("main_sampler", None)
+st.session_state.setdefault("main_digest", None)
 st.session_state.setdefault("ref1_image", None)
 st.session_state.setdefault("ref1_file_sig", None)
 st.session_state.setdefault("ref2_image", None)
 st.session_state.setdefault("ref2_file_sig", None)
+st.session_state.setdefault("picked_colors", {"Blouse": "#FFFFFF", "Lehenga": "#FFFFFF", "Dupatta": "#FFFFFF"})
 # ==================================================
 # IMAGE UTILS
 # ==================================================
 
+def show_notes(notes):
+    for level, message in notes:
+        getattr(st, level)(message)
+
 def compress_upload_image(img, upload_quality):
-    img= ImageOps.exif_transpose(img)   
-    img = img.convert("RGB")
-
-    MAX_DIM = 2048
-    w, h = img.size
-    if max(w, h) > MAX_DIM:
-        scale = MAX_DIM / max(w, h)
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-
-    quality = upload_quality
-    best_buf = None
-    best_quality = quality
-    best_size = 0
-    target_min = 1 * 1024 * 1024
-    target_max = 2 * 1024 * 1024
-
-    while quality >= 55:
-        buf = BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        buf.seek(0, 2)  # Seek to end
-        size = buf.tell()  # Get actual size
-        
-        # If size is in target range, use it
-        if target_min <= size <= target_max:
-            buf.seek(0)
-            compressed_img = Image.open(buf)
-            size_mb = round(size / (1024 * 1024), 2)
-            st.success(f"✅ Image compressed successfully | Size: {size_mb} MB | Quality: {quality}%")
-            return compressed_img
-        
-        # Keep track of the best match that's >= 1 MB
-        if target_min <= size and size > best_size:
-            best_buf = buf
-            best_quality = quality
-            best_size = size
-        
-        quality -= 2
-
-    # If we couldn't hit target range exactly, use the best match that's >= 1 MB
-    if best_buf and best_size >= target_min:
-        best_buf.seek(0)
-        size_mb = round(best_size / (1024 * 1024), 2)
-        st.warning(f"⚠️ Image size: {size_mb} MB | Quality: {best_quality}% (close to target range)")
-        return Image.open(best_buf)
-    
-    # Fallback: increase quality to get closer to 1 MB
-    quality = 95
-    while quality >= 55:
-        buf = BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        buf.seek(0, 2)
-        size = buf.tell()
-        
-        if size >= target_min:
-            buf.seek(0)
-            size_mb = round(size / (1024 * 1024), 2)
-            st.warning(f"⚠️ Image size: {size_mb} MB | Quality: {quality}% (high quality preserved)")
-            return Image.open(buf)
-        
-        quality += 3
-
-    # Last resort: return at quality 95
-    buf = BytesIO()
-    img.save(buf, format="JPEG", quality=95, optimize=True)
-    buf.seek(0, 2)
-    size = buf.tell()
-    size_mb = round(size / (1024 * 1024), 2)
-    st.warning(f"⚠️ Image size: {size_mb} MB | Quality: 95%")
-    buf.seek(0)
-    return Image.open(buf)
+    img, note = compress_image(img, upload_quality)
+    show_notes([note])
+    return img
 #------------------------------------------------------------------
 #auto compresor based on size and resolution added 11th june
 #------------------------------------------------------------------
-def auto_process_image(img, uploaded_file, upload_quality, label="Image"):
-    img = ImageOps.exif_transpose(img).convert("RGB")
-
-    size_mb = uploaded_file.size / (1024 * 1024)
-    w, h = img.size
-    dpi = img.info.get("dpi", (72,))[0]
-
-    needs_compression = False
-    reasons = []
-
-    if size_mb > 1.5:
-        needs_compression = True
-        reasons.append("file size")
-
-    if max(w, h) > 2048:
-        needs_compression = True
-        reasons.append("high resolution")
-
-    if dpi >= 300 and size_mb < 3:
-        needs_compression = False
-        reasons = ["professional image"]
-
-    if needs_compression:
-        st.info(f"🔧 Auto-compressing {label} ({', '.join(reasons)})")
-        img = compress_upload_image(img, upload_quality)
-    else:
-        st.success(f"✅ {label} kept original quality ({', '.join(reasons)})")
-
+def auto_process_image(img, uploaded_file, upload_quality, label="Image", crop_margin=None):
+    img, notes = preprocess_image(img, uploaded_file.size, upload_quality, label=label, crop_margin=crop_margin)
+    show_notes(notes)
     return img
-# ==================================================
-# PART CONVERSION
-# ==================================================
-def pil_image_to_part(img):
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return types.Part.from_bytes(
-        data=buf.getvalue(),
-        mime_type="image/png"
-    )
+# Upload-once layer: one Files API upload per image digest, reused by
+# every generation / fix until the handle nears expiry
+@st.cache_resource
+def get_upload_cache(api_key):
+    return UploadCache(genai.Client(api_key=api_key).files)
+
+def image_part(img, digest=None):
+    if reuse_uploads:
+        return get_upload_cache(GEMINI_API_KEY).part_for(img, digest)
+    return inline_part(img)
+
+def input_image_parts(main_image, ref1_image, ref2_image):
+    parts = [image_part(main_image, st.session_state.main_digest)]
+    if ref1_image:
+        parts.append(image_part(ref1_image))
+    if ref2_image:
+        parts.append(image_part(ref2_image))
+    return parts
 
 # ==================================================
 # GEMINI SAFETY
 # ==================================================
-def extract_image_safe(resp):
-    for cand in getattr(resp, "candidates", []):
-        if not cand.content:
-            continue
-        for part in cand.content.parts:
-            inline = getattr(part, "inline_data", None)
-            if inline and inline.mime_type.startswith("image/"):
-                data = inline.data
-                return base64.b64decode(data) if isinstance(data, str) else data
-    return None
+# generate_with_fallback / extract_image come from srs_core.engine
+extract_image_safe = extract_image
 
 def safe_open_image(img_bytes):
     try:
@@ -193,157 +144,28 @@ def safe_open_image(img_bytes):
 # ==================================================
 # GARMENT-AWARE PROMPTS
 # ==================================================
-BASE_PROMPT_MAP = {
-    "Normal Mode": "Generate a photorealistic image of a professional Indian fashion model wearing this exact dress outfit. Simply add a human model body to the dress - do NOT modify any aspect of the garment.",
-    "Printed Lehenga": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT PRINTED LEHENGA outfit.",
-    "Heavy Lehenga": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT HEAVY LEHENGA outfit.",
-    "Western Dress": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT WESTERN DRESS outfit.",
-    "Indo-Western": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT INDO-WESTERN outfit.",
-    "Gown": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT GOWN.",
-    "Saree": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT SAREE outfit.",
-    "Plazo-set": "Generate a photorealistic image of a professional Indian fashion model wearing this EXACT PLAZO-SET outfit."
-}
-
-LOCKED_REGION_MAP = {
-    "Normal Mode": """
-LOCKED REGIONS (ABSOLUTE - DO NOT MODIFY):
-- Entire Dress Structure
-- All Seams and Construction
-- Embroidery and Patterns (if any)
-- Fabric Texture and Weave
-- All Geometric Details
-- Border and Hem Details
-- Dupatta (if present)
-- ANY and ALL dress components
-ONLY add human body to the dress without ANY modifications.
-""",
-    "Printed Lehenga": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Baju / Sleeve
-- Blouse Border
-- Upper Waist Seam
-- Lehenga Skirt
-- Embroidery Pattern
-""",
-    "Heavy Lehenga": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Baju / Sleeve
-- Blouse Border
-- Upper Waist Seam
-- Heavy Embroidery Details
-- Skirt Silhouette
-""",
-    "Western Dress": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Sleeve ends
-- Neckline
-- Waist definition
-- Dress hem
-""",
-    "Indo-Western": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Sleeve ends
-- Top-to-bottom transition seam
-- Waist details
-- Bottom silhouette
-""",
-    "Gown": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Bodice seam
-- Waist transition (if present)
-- Gown length and flow
-""",
-    "Saree": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Blouse Back
-- Saree Pleats
-- Saree Pallu
-- Waist definition
-- Border Details
-""",
-    "Plazo-set": """
-LOCKED REGIONS (HIGHEST PRIORITY):
-- Shoulder
-- Kurta Front and Back
-- Neckline
-- Sleeve Details
-- Plazo Length and Fit
-- Border Pattern
-"""
-}
-
-DUPATTA_LOCK_PROMPT = """
-CRITICAL DUPATTA ENFORCEMENT (HIGHEST PRIORITY):
-- Dupatta width MUST remain unchanged
-- Border thickness MUST remain identical
-- Embroidery scale MUST NOT change
-- Motif spacing MUST NOT change
-- Thread density MUST match reference
-FAIL THE IMAGE IF DUPATTA DIFFERS.
-"""
-
-def get_dupatta_prompt(dress_type):
-    if dress_type in ["Printed Lehenga", "Heavy Lehenga", "Saree", "Plazo-set"]:
-        return DUPATTA_LOCK_PROMPT
-    return ""
-
-# ==================================================
-# COLOR EXTRACTION FROM PROMPTS
-# ==================================================
-BACKGROUND_COLOR_OPTIONS = {
-    "Normal Mode": ["royal outdoor","royal grey","royal brown","royal cream","royal outdoor garden" ,"fort outdoor","Butique","royal indian fort "],
-    "Printed Lehenga": ["royal grey", "royal brown", "royal cream"],
-    "Heavy Lehenga": ["royal outdoor", "royal indian fort", "royal palace"],
-    "Western Dress": ["royal grey", "royal brown", "royal cream","butique"],
-    "Indo-Western": ["royal outdoor", "royal indian fort", "royal palace"],
-    "Gown": ["royal outdoor", "royal indian fort", "royal palace"],
-    "Saree": ["royal grey", "royal brown", "royal cream","butique"],
-    "Plazo-set": ["royal grey", "royal brown", "royal cream", "butique"]
-}
-
-# Background descriptions mapping
-BACKGROUND_DESCRIPTIONS_MAP = {
-    "royal outdoor": "BACKGROUND: Royal outdoor background with elegant settings.",
-    "royal grey": "BACKGROUND: Plain simple studio background with royal grey.",
-    "royal brown": "BACKGROUND: Plain simple studio background with royal brown.",
-    "royal cream": "BACKGROUND: Plain simple studio background with royal cream.",
-    "inside butique showroom ": "BACKGROUND: Inside boutique showroom with sophisticated ambiance.",
-    "royal outdoor garden": "BACKGROUND: Royal outdoor garden background with natural elegance.",
-    "fort outdoor": "BACKGROUND: Fort outdoor background with royal heritage settings.",
-    "royal indian fort": "BACKGROUND: Royal outdoor background with Indian fort architecture.",
-    "royal palace": "BACKGROUND: Royal outdoor background with palace settings.",
-    "Butique": "BACKGROUND: High-end fashion boutique interior.\n- Neutral luxury palette (beige / ivory / warm grey)\n- Polished stone or marble flooring\n- Soft warm ambient lighting with diffused ceiling spotlights\n- Minimal gold/brass accents\n- Sparse clothing racks far in background\n- Shallow depth-of-field, background softly blurred\n- No mannequins, mirrors, signage, or logos\n- Background must NOT alter garment colors\n"
-}
-
-# Ornate backgrounds for specific dress types (kept for backward compatibility)
-ORNATE_BACKGROUND_DESCRIPTIONS = {
-    "Heavy Lehenga": "BACKGROUND: Royal outdoor background with ornate settings.",
-    "Indo-Western": "BACKGROUND: Royal outdoor background with contemporary elegance.",
-    "Gown": "BACKGROUND: Elegant outdoor background with sophisticated ambiance."
-}
-
-POSE_PROMPTS = {
-    "Natural Standing": "Natural upright standing pose with a confident yet relaxed posture.",
-    "Soft Fashion": "Soft fashion pose with a slight hip shift and relaxed, elegant arm placement.",
-    "Editorial": "High-fashion editorial pose with dynamic body angles, creating a sophisticated silhouette.",
-    "Walk": "Captured in a mild walking stance, showing natural leg movement and fabric drape.",
-    "Dupatta Flow Pose": "Dynamic pose with a gentle dupatta flow, showing the fabric's movement as if in a soft breeze.",
-    "Front Open Stance": "Front-facing open stance with feet slightly apart, clearly showcasing the entire garment's front details.",
-    "Runway Pause Pose": "Classic runway pause at the end of a walk, with weight shifted to one hip and a poised stance.",
-    "Asymmetrical Arm Pose": "Modern asymmetrical pose with varied arm placements for strong visual interest.",
-    "Soft Motion Pose": "A pose conveying soft motion or a gentle turn, creating rhythmic folds and life in the garment."
-}
+# All prompt text (rules, locked regions, backgrounds, poses) lives in the
+# versioned srs_core/prompt_templates.json, loaded and precompiled once
+# per process.
+PROMPTS = get_registry()
+BACKGROUND_COLOR_OPTIONS = PROMPTS.background_options
+POSE_PROMPTS = PROMPTS.poses
 
 # ==================================================
 # FINAL PROMPT BUILDER
 # ==================================================
-def build_final_prompt(
+# The prompt is split in two:
+#   - a STATIC prefix that only depends on dress_type (model spec,
+#     transfer rules, forbidden actions, locked regions, dupatta rules)
+#     and can be registered once with the model's context cache; rendered
+#     compact (each rule once) unless "Compact Prompt" is switched off
+#   - a small DYNAMIC suffix (pose, motion, color locks, background)
+# build_final_prompt() still returns the full text for inline use.
+def build_static_prompt(dress_type):
+    return PROMPTS.static(dress_type, compact=compact_prompt)
+
+
+def build_dynamic_prompt(
     dress_type,
     blouse_color,
     lehenga_color,
@@ -351,200 +173,23 @@ def build_final_prompt(
     background_color,
     pose_style
 ):
-    pose_description = POSE_PROMPTS.get(pose_style, "Standard runway posture")
-    
-    # Check if pose involves motion
-    is_motion_pose = pose_style in ["Walk", "Dupatta Flow Pose", "Soft Motion Pose"]
-    motion_constraint = "Minimal natural motion allowed to support the requested pose." if is_motion_pose else "No motion, no wind, no fabric lift."
-
-    # --------------------------------------------------
-    # BACKGROUND SELECTION
-    # --------------------------------------------------
-    # First check if there's a specific description for this background color
-    if background_color in BACKGROUND_DESCRIPTIONS_MAP:
-        background_prompt = BACKGROUND_DESCRIPTIONS_MAP[background_color]
-    # Then check if this dress type has ornate background descriptions
-    elif dress_type in ORNATE_BACKGROUND_DESCRIPTIONS:
-        background_prompt = ORNATE_BACKGROUND_DESCRIPTIONS[dress_type]
-    # Default fallback
-    else:
-        background_prompt = f"BACKGROUND: {background_color}."
-
-    # --------------------------------------------------
-    # NORMAL MODE SPECIAL HANDLING
-    # --------------------------------------------------
-    if dress_type == "Normal Mode":
-        return (
-            BASE_PROMPT_MAP[dress_type]
-            + f"""
-MODEL SPECIFICATION (MANDATORY):
-- Adult Indian female fashion model
-- Neutral body proportions
-- strict POSE: {pose_description}
-- EXPRESSION: Add natural expressions smile
-- Studio photoshoot lighting
-- No stylization, no glamour exaggeration
-"""
-
-            + """
-MANNEQUIN-TO-MODEL TRANSFER (ABSOLUTE PRIORITY):
-- Source image shows a MANNEQUIN or dress form, not a human
-- Garment MUST be transferred onto a REAL HUMAN MODEL
-This is a garment-to-body projection task with strict visual preservation
-- Preserve EVERY SINGLE detail:
-  * All stitches and seams
-  * All embroidery and embellishments
-  * All geometric curves and drape
-  * All patterns and prints
-  * All colors and textures
-  * All borders and hems
-  * The entire silhouette exactly as is
-- Minor geometric adjustment is allowed ONLY where physically unavoidable to fit a human body
-- Adjustments must NOT be noticeable to a human observer
-
-- Adjust ONLY for natural human anatomy and gravity fitting
-- This is a BODY ADDITION task, not a design modification task
-""" 
-+ """DUPATTA POSITION & LENGTH LOCK (CRITICAL):
-- If a dupatta is visible in the reference image, it MUST be preserved exactly
-- Preserve the SAME dupatta length relative to the garment
-- Preserve the SAME visible coverage (front / side / back)
-- If the dupatta is:
-  * Half visible → keep it half visible
-  * Only at the back → keep it only at the back
-  * Folded or draped asymmetrically → preserve the asymmetry
-- Do NOT extend, shorten, reposition, or re-drape the dupatta
-- Do NOT bring the dupatta to the front if it is not visible in front
-- Do NOT “complete” or “beautify” missing sections
-- Treat the dupatta as a fixed spatial object, not a styling element
-"""
-
-            + """
-CRITICAL - ABSOLUTELY FORBIDDEN (VIOLATION = FAIL):
-- Do NOT redesign any part of the dress
-- Do NOT beautify or enhance anything
-- Do NOT correct any asymmetry
-- Do NOT modify embroidery or patterns
-- Do NOT hallucinate missing details
-- Do NOT add or remove any garment component
-- Do NOT change any colors
-- Do NOT alter fabric texture or weight
-- Do NOT change the silhouette or fit
-- Do NOT modify seams, hems, or borders
-- This is a body-projection task with minimal unavoidable physical fitting only
-
-"""
-
-            + f"""
-ABSOLUTE CONSTRAINTS:
-- Visual identity replication (viewer must perceive the same product)
-- Background must NOT affect garment colors
-- Lighting must NOT wash out embroidery
-- {motion_constraint}
-"""
-            + LOCKED_REGION_MAP[dress_type]
-            + "\n"
-            + background_prompt
-        )
-
-    # --------------------------------------------------
-    # STANDARD MODE (Original logic for other dress types)
-    # --------------------------------------------------
-    return (
-        # ===============================
-        # CORE GENERATION INTENT
-        # ===============================
-        BASE_PROMPT_MAP[dress_type]
-        + f"""
-MODEL SPECIFICATION (MANDATORY):
-- Adult Indian female fashion model
-- Neutral body proportions
-- strict POSE: {pose_description}
-- EXPRESSION: Add natural expressions smile
-- Studio photoshoot lighting
-- No stylization, no glamour exaggeration
-"""
-
-        # ===============================
-        # MANNEQUIN → MODEL TRANSFER
-        # ===============================
-        + """
-MANNEQUIN-TO-MODEL TRANSFER (CRITICAL):
-- Source image shows a MANNEQUIN, not a human
-- Garment MUST be transferred onto a REAL HUMAN MODEL
-- Preserve original garment geometry and proportions
-- Adjust ONLY for natural human anatomy and gravity
-- Do NOT alter cut, seams, flare, or embroidery layout
-- Blouse fit must follow mannequin reference exactly
-- Lehenga flare, fall, and volume must remain unchanged
-"""
-
-        # ===============================
-        # FORBIDDEN ACTIONS
-        # ===============================
-        + """
-FORBIDDEN ACTIONS (ABSOLUTE):
-- Do NOT redesign
-- Do NOT beautify
-- Do NOT correct symmetry
-- Do NOT enhance embroidery
-- Do NOT hallucinate missing details
-- Do NOT add accessories or jewelry
-- Do NOT remove any visible garment component
-"""
-
-        # ===============================
-        # LOCKED REGIONS
-        # ===============================
-        + LOCKED_REGION_MAP[dress_type]
-
-        # ===============================
-        # DUPATTA ENFORCEMENT
-        # ===============================
-        + get_dupatta_prompt(dress_type)
-        + """
-DUPATTA PRESENCE RULE:
-- IF dupatta is visible in the reference image, it MUST be present in the output
-- Dupatta drape must match reference placement and length
-"""
-
-        # ===============================
-        # GARMENT CLASS SAFETY
-        # ===============================
-        + """
-GARMENT CLASS LOCK (ABSOLUTE):
-- DO NOT reinterpret lehengas as gowns or dresses
-- DO NOT reinterpret gowns or indo-western outfits as lehengas
-- DO NOT add a dupatta if it does NOT exist in reference
-"""
-
-        # ===============================
-        # COLOR LOCKS
-        # ===============================
-        + f"""
-HIGH-PRIORITY COLOR LOCK (HEX):
-- Blouse: {blouse_color}
-- Lehenga: {lehenga_color}
-- Dupatta: {dupatta_color}
-"""
+    return PROMPTS.dynamic(
+        dress_type, blouse_color, lehenga_color, dupatta_color, background_color, pose_style
+    )
 
-        # ===============================
-        # PHYSICAL & PIXEL CONSTRAINTS
-        # ===============================
-        + """
-ABSOLUTE CONSTRAINTS:
-- Visual identity replication (viewer must perceive the same product)
-- Background must NOT affect garment colors
-- Lighting must NOT wash out embroidery
-- {motion_constraint}
-"""
 
-        # ===============================
-        # BACKGROUND
-        # ===============================
-        + "\n"
-        + background_prompt
-    )
+def build_final_prompt(
+    dress_type,
+    blouse_color,
+    lehenga_color,
+    dupatta_color,
+    background_color,
+    pose_style
+):
+    return PROMPTS.render(
+        dress_type, blouse_color, lehenga_color, dupatta_color, background_color, pose_style,
+        compact=compact_prompt
+    )["text"]
 
 # ==================================================
 # UI
@@ -556,18 +201,31 @@ with st.sidebar:
    # disable_compression = st.toggle("🚫 Disable Image Compression", value=False) 11 january   
     generation_resolution = st.selectbox("Generation Resolution", ["1K", "2K", "4K"], index=1)
     aspect_ratio = st.selectbox("Aspect Ratio", ["1:1", "2:3", "3:4", "4:5", "9:16"], index=2)
-    dress_type = st.selectbox("Dress Type", [
-        "Normal Mode",
-        "Printed Lehenga",
-        "Heavy Lehenga",
-        "Western Dress",
-        "Indo-Western",
-        "Gown",
-        "Saree",
-        "Plazo-set"
-    ])
+    dress_type = st.selectbox("Dress Type", PROMPTS.dress_types)
     pose_style = st.selectbox("Pose Style", list(POSE_PROMPTS.keys()))
     color_mode = st.selectbox("Color Mode", ["Automatic", "Manual (Dropper)"])
+    compact_prompt = st.toggle(
+        "🗜️ Compact Prompt", value=True,
+        help="Send each constraint once, grouped by topic, instead of the original overlapping blocks"
+    )
+    st.caption(f"Static prompt ≈ {estimate_tokens(build_static_prompt(dress_type))} tokens")
+    use_context_cache = st.toggle(
+        "🧠 Cache Static Prompt Prefix", value=True,
+        help="Register the per-dress-type prompt prefix with the model's context cache (falls back to inline text)"
+    )
+    reuse_uploads = st.toggle(
+        "☁️ Reuse Uploads (Files API)", value=True,
+        help="Upload each image once and reference it in later calls instead of re-sending bytes"
+    )
+    num_candidates = st.number_input(
+        "Candidates", 1, 4, 1,
+        help="Generate several outputs in parallel and rank them automatically"
+    )
+    preservation_reject_below = st.slider(
+        "Auto-reject below preservation score", 0.0, 1.0, REJECT_BELOW, 0.05
+    )
+    auto_crop = st.toggle("✂️ Auto-crop Main Image to Garment", value=False)
+    crop_margin = st.slider("Crop Margin (%)", 0, 20, 6, disabled=not auto_crop) / 100
 
 # ==================================================
 # IMAGE INPUTS
@@ -582,7 +240,8 @@ if main_file:
     sig = (
     main_file.name,
     main_file.size,
-    hash(main_file.getbuffer().tobytes())
+    hash(main_file.getbuffer().tobytes()),
+    crop_margin if auto_crop else None
 )
 
 
@@ -593,11 +252,18 @@ if main_file:
         img,
         main_file,
         upload_quality,
-        label="Main Image"
+        label="Main Image",
+        crop_margin=crop_margin if auto_crop else None
         )
 
         st.session_state.main_image = img
         st.session_state.main_file_sig = sig
+        # Cached NumPy/LAB view for the color picker, built once per upload
+        st.session_state.main_sampler = PixelSampler(img)
+        # Pixel digest – cache key for the mask / color stages
+        st.session_state.main_digest = image_digest(img)
+        # New garment → previously picked colors no longer apply
+        st.session_state.picked_colors = {"Blouse": "#FFFFFF", "Lehenga": "#FFFFFF", "Dupatta": "#FFFFFF"}
 
 
     main_image = st.session_state.main_image
@@ -605,10 +271,17 @@ else:
     main_image = None
     st.session_state.main_file_sig = None
     st.session_state.main_image = None
+    st.session_state.main_sampler = None
+    st.session_state.main_digest = None
 
 if main_image:
     st.image(main_image, width="stretch")
 
+    if st.toggle("🧵 Show garment mask", value=False):
+        main_mask = garment_mask(main_image, st.session_state.main_digest)
+        st.image(mask_overlay(main_image, main_mask), width="stretch")
+        st.caption(f"Garment covers {mask_coverage(main_mask):.0%} of the frame")
+
 st.subheader("📚 Reference Images")
 ref1_file = st.file_uploader(
     "Upload Choli Reference",
@@ -685,11 +358,21 @@ background_color = background_color_selected  # Store for prompt
 # ==================================================
 # COLOR PICKER (PIXEL-ACCURATE)
 # ==================================================
-blouse_color = lehenga_color = dupatta_color = "#FFFFFF"
-if color_mode == "Manual (Dropper)" and main_image is not None:
+# Runs as a fragment: clicks, magnifier and target changes only rerun this
+# block, not the uploads / prompt / generation sections above and below.
+# Picked colors live in session_state so the full script sees them on the
+# next full rerun (e.g. when Generate is pressed).
+@st.fragment
+def manual_color_picker(main_image):
     st.subheader("🎯 Manual Color Picker")
     st.info("💡 Enable the picker and click on the image to pick a color")
 
+    brush_radius = st.slider(
+        "Brush radius (px)", 0, 25, 6,
+        help="Pick a representative color over a neighbourhood instead of a single noisy pixel"
+    )
+    pick_method = st.selectbox("Pick statistic", PICK_METHODS, key="pick_method")
+
     # 🔒 Gate picker to prevent rerun/loader issues
     if st.checkbox("🎯 Enable Color Picker"):
         coords = streamlit_image_coordinates(main_image, key="picker")
@@ -708,8 +391,8 @@ if color_mode == "Manual (Dropper)" and main_image is not None:
         real_x = max(0, min(real_x, orig_w - 1))
         real_y = max(0, min(real_y, orig_h - 1))
 
-        r, g, b = main_image.getpixel((real_x, real_y))
-        picked_hex = f"#{r:02X}{g:02X}{b:02X}"
+        r, g, b = st.session_state.main_sampler.sample(real_x, real_y, brush_radius, pick_method)
+        picked_hex = rgb_to_hex((r, g, b))
 
         # ==================================================
         # 🔍 MAGNIFIER & PIXEL VIEW
@@ -740,6 +423,7 @@ if color_mode == "Manual (Dropper)" and main_image is not None:
             - **HEX:** `{picked_hex}`
             - **RGB:** `({r}, {g}, {b})`
             - **Position:** `({real_x}, {real_y})`
+            - **Brush:** `{brush_radius}px {pick_method}`
             """
         )
 
@@ -754,12 +438,37 @@ if color_mode == "Manual (Dropper)" and main_image is not None:
             key="color_apply_target"
         )
 
-        if target == "Blouse":
-            blouse_color = picked_hex
-        elif target == "Lehenga":
-            lehenga_color = picked_hex
-        else:
-            dupatta_color = picked_hex
+        st.session_state.picked_colors[target] = picked_hex
+
+    picked = st.session_state.picked_colors
+    st.caption(
+        f"Blouse: `{picked['Blouse']}` | Lehenga: `{picked['Lehenga']}` | Dupatta: `{picked['Dupatta']}`"
+    )
+
+
+blouse_color = lehenga_color = dupatta_color = "#FFFFFF"
+if color_mode == "Manual (Dropper)" and main_image is not None:
+    manual_color_picker(main_image)
+
+    blouse_color = st.session_state.picked_colors["Blouse"]
+    lehenga_color = st.session_state.picked_colors["Lehenga"]
+    dupatta_color = st.session_state.picked_colors["Dupatta"]
+
+# ==================================================
+# AUTOMATIC COLOR EXTRACTION
+# ==================================================
+elif color_mode == "Automatic" and main_image is not None:
+    auto_colors = auto_garment_colors(main_image, ref1_image, ref2_image)
+    blouse_color = auto_colors["Blouse"]
+    lehenga_color = auto_colors["Lehenga"]
+    dupatta_color = auto_colors["Dupatta"]
+
+    st.subheader("🎨 Auto-detected Colors")
+    swatch_cols = st.columns(3)
+    for col, (slot, hex_value) in zip(swatch_cols, auto_colors.items()):
+        with col:
+            st.image(Image.new("RGB", (80, 80), hex_value), width=80)
+            st.markdown(f"**{slot}:** `{hex_value}`")
 
 # 🔗 External Redirect Button
 if st.sidebar.button("🔗 FEEDBACK HERE"):
@@ -787,54 +496,216 @@ if st.session_state.confirm_redirect:
         st.session_state.confirm_redirect = False
 
 # ==================================================
-# FALLBACK GENERATION
+# OUTPUT GEOMETRY CHECK
+# ==================================================
+# Header-only dimension probe right after extraction; near-matches are
+# cropped / padded locally so marketplace uploads don't bounce.
+def check_output_geometry(img_bytes, aspect_ratio):
+    size, _ = probe_dimensions(img_bytes)
+    verdict, deviation = classify_aspect(size, aspect_ratio)
+    if verdict == "mismatch":
+        st.warning(f"⚠️ Output is {size[0]}×{size[1]}, {deviation:.0%} off the requested {aspect_ratio} aspect ratio. Consider regenerating.")
+    return verdict
+
+def fix_output_geometry(out_img, verdict, aspect_ratio):
+    if verdict != "near":
+        return out_img
+    before = out_img.size
+    fixed, action = fix_aspect(out_img, aspect_ratio)
+    st.info(f"📐 Output {before[0]}×{before[1]} adjusted to {aspect_ratio} by {action} → {fixed.size[0]}×{fixed.size[1]}")
+    return fixed
+
+# ==================================================
+# COLOR LOCK QA
+# ==================================================
+QA_STATUS_ICONS = {"pass": "✅", "warn": "⚠️", "fail": "❌"}
+
+def show_color_qa(out_img, locks):
+    if not locks:
+        return
+    checks = verify_color_locks(out_img, locks)
+    st.markdown("**🎨 Color Lock Check (ΔE2000)**")
+    for check in checks:
+        st.markdown(
+            f"{QA_STATUS_ICONS[check['status']]} **{check['slot']}** – locked `{check['locked']}` "
+            f"→ output `{check['observed']}` | ΔE `{check['delta_e']}` | "
+            f"{check['match_share']:.0%} of region within tolerance"
+        )
+    if any(check["status"] == "fail" for check in checks):
+        st.error("❌ Output violates a locked color – describe the drift below and use Fix & Regenerate.")
+
+# ==================================================
+# GARMENT PRESERVATION CHECK (PROCESS POOL)
 # ==================================================
-def generate_with_fallback(client, parts, aspect_ratio, resolution):
-    order = [resolution]
-    if resolution == "4K":
-        order += ["2K", "1K"]
-    elif resolution == "2K":
-        order += ["1K"]
+# Scoring runs in a worker process. The panel is a parallel fragment, so
+# the rest of the page renders while it waits on the future, and it is
+# done once the result is shown – no polling.
+def start_preservation_check(main_image, out_img):
+    preservation_panel(submit_preservation_check(main_image, out_img, preservation_reject_below))
+
+@st.fragment(parallel=True)
+def preservation_panel(future):
+    try:
+        with st.spinner("🧪 Scoring garment preservation..."):
+            report = future.result()
+    except Exception as e:
+        st.warning(f"⚠️ Preservation check failed: {str(e)}")
+        return
+
+    st.markdown("**🧪 Garment Preservation**")
+    if report["rejected"]:
+        st.error(f"❌ Auto-rejected: preservation score {report['score']} is below {report['reject_below']}. Regenerate before reviewing.")
+    else:
+        st.success(f"✅ Preservation score: {report['score']}")
+    st.caption(
+        f"SSIM `{report['ssim']}` | Edge correlation `{report['edge_correlation']}` | "
+        f"Texture ratio `{report['texture_ratio']}`"
+    )
+    with st.expander("🔥 Structural difference heatmap"):
+        st.image(report["heatmap"], width="stretch")
 
-    for res in order:
+def clear_fix_region():
+    # A new output invalidates the marked fix region. The picker gets a
+    # fresh key too, otherwise its last drag would mark the same box again.
+    st.session_state.fix_region = None
+    st.session_state.fix_picker_round += 1
+
+# ==================================================
+# PROMPT CONTEXT CACHE
+# ==================================================
+@st.cache_resource
+def get_prompt_cache(api_key):
+    return PromptPrefixCache(genai.Client(api_key=api_key), MODEL_NAME)
+
+def prepare_prompt(dress_type, dynamic_text):
+    # Resolved on the script thread, then safe to hand to worker threads
+    static_text = build_static_prompt(dress_type)
+    cache = get_prompt_cache(GEMINI_API_KEY) if use_context_cache else None
+    return {
+        "static": static_text,
+        "dynamic": dynamic_text,
+        "cache": cache,
+        "cached_content": cache.get(static_text) if cache else None,
+    }
+
+def generate_prompted(client, prompt, image_parts, aspect_ratio, resolution):
+    # Dynamic suffix + cached prefix when available; full inline text otherwise
+    if prompt["cached_content"]:
+        parts = [types.Part.from_text(text=prompt["dynamic"])] + image_parts
         try:
-            return client.models.generate_content(
-                model=MODEL_NAME,
-                contents=[types.Content(role="user", parts=parts)],
-                config=types.GenerateContentConfig(
-                    response_modalities=["IMAGE"],
-                    image_config=types.ImageConfig(
-                        aspect_ratio=aspect_ratio,
-                        image_size=res
-                    )
-                )
+            return generate_with_fallback(
+                client, parts, aspect_ratio, resolution, cached_content=prompt["cached_content"]
             )
         except Exception:
-            continue
-    return None
+            # Only cache errors get here (prefix expired or deleted);
+            # other failures already went through the tier ladder once
+            prompt["cache"].invalidate(prompt["static"])
+
+    parts = [types.Part.from_text(text=prompt["static"] + prompt["dynamic"])] + image_parts
+    return generate_with_fallback(client, parts, aspect_ratio, resolution)
+
+def set_prompt_state(dress_type, dynamic_text):
+    st.session_state.prompt_dress_type = dress_type
+    st.session_state.prompt_dynamic = dynamic_text
+    st.session_state.final_prompt = build_static_prompt(dress_type) + dynamic_text
+
+# ==================================================
+# MULTI-CANDIDATE GENERATION
+# ==================================================
+# Runs in worker threads: no st.* calls in here.
+def generate_candidate(client, prompt, image_parts, aspect_ratio, resolution):
+    response, tier = generate_prompted(client, prompt, image_parts, aspect_ratio, resolution)
+    img_bytes = extract_image_safe(response) if response else None
+    if not img_bytes:
+        return None
+
+    verdict, _ = classify_aspect(probe_dimensions(img_bytes)[0], aspect_ratio)
+    img = Image.open(BytesIO(img_bytes))
+    img.load()
+    if verdict == "near":
+        img, _ = fix_aspect(img, aspect_ratio)
+    return {"image": img, "tier": tier, "geometry": verdict}
+
+def generate_candidates(prompt, image_parts, n, aspect_ratio, resolution):
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    with ThreadPoolExecutor(max_workers=min(n, MAX_PARALLEL_GENERATIONS)) as pool:
+        futures = [
+            pool.submit(generate_candidate, client, prompt, image_parts, aspect_ratio, resolution)
+            for _ in range(n)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception:
+                results.append(None)
+    return [r for r in results if r]
+
+def use_candidate(candidate):
+    st.session_state.last_generated_image = candidate["image"]
+    st.session_state.produced_tier = candidate["tier"]
+    st.session_state.corrected_image = None
+    st.session_state.upscaled_image = None
+    st.session_state.retry_mode = True
+    clear_fix_region()
 
 # ==================================================
 # GENERATE
 # ==================================================
-if st.button("🎨 Generate Image") and main_image:
+generate_clicked = st.button("🎨 Generate Image")
+
+if generate_clicked and main_image and num_candidates > 1:
+    with st.spinner(f"Generating {num_candidates} candidates in parallel..."):
+        try:
+            set_prompt_state(dress_type, build_dynamic_prompt(
+                dress_type, blouse_color, lehenga_color, dupatta_color, background_color, pose_style
+            ))
+            st.session_state.prompt_template_hash = PROMPTS.template_hash(
+                dress_type, background_color, pose_style, compact_prompt
+            )
+            st.session_state.color_locks = color_locks(
+                dress_type, {"Blouse": blouse_color, "Lehenga": lehenga_color, "Dupatta": dupatta_color}
+            )
+
+            prompt = prepare_prompt(dress_type, st.session_state.prompt_dynamic)
+            image_parts = input_image_parts(main_image, ref1_image, ref2_image)
+
+            candidates = generate_candidates(prompt, image_parts, num_candidates, aspect_ratio, generation_resolution)
+            if not candidates:
+                st.error("❌ No candidate returned an image. Try adjusting resolution or trying again.")
+                st.stop()
+
+            st.session_state.candidates = rank_candidates(
+                main_image, candidates, st.session_state.color_locks, aspect_ratio, generation_resolution
+            )
+            # Best candidate becomes the working output for fixes / corrections
+            use_candidate(st.session_state.candidates[0])
+
+        except Exception:
+            st.error("❌ Generation failed.")
+            st.text(traceback.format_exc())
+
+elif generate_clicked and main_image:
     with st.spinner("Generating image..."):
         try:
-            st.session_state.final_prompt = build_final_prompt(
+            clear_fix_region()
+            set_prompt_state(dress_type, build_dynamic_prompt(
                 dress_type, blouse_color, lehenga_color, dupatta_color, background_color, pose_style
+            ))
+            st.session_state.prompt_template_hash = PROMPTS.template_hash(
+                dress_type, background_color, pose_style, compact_prompt
+            )
+            st.session_state.color_locks = color_locks(
+                dress_type, {"Blouse": blouse_color, "Lehenga": lehenga_color, "Dupatta": dupatta_color}
             )
 
-            parts = [
-                types.Part.from_text(text=st.session_state.final_prompt),
-                pil_image_to_part(main_image)
-            ]
-            if ref1_image:
-                parts.append(pil_image_to_part(ref1_image))
-            if ref2_image:
-                parts.append(pil_image_to_part(ref2_image))
+            prompt = prepare_prompt(dress_type, st.session_state.prompt_dynamic)
+            image_parts = input_image_parts(main_image, ref1_image, ref2_image)
 
-            response = generate_with_fallback(
+            response, produced_tier = generate_prompted(
                 genai.Client(api_key=GEMINI_API_KEY),
-                parts,
+                prompt,
+                image_parts,
                 aspect_ratio,
                 generation_resolution
             )
@@ -847,12 +718,17 @@ if st.button("🎨 Generate Image") and main_image:
             if not img_bytes:
                 st.error("❌ No image data in API response. The model may have failed to generate the image.")
                 st.stop()
+            geometry = check_output_geometry(img_bytes, aspect_ratio)
 
             out_img = safe_open_image(img_bytes)
             if not out_img:
                 st.stop()
+            out_img = fix_output_geometry(out_img, geometry, aspect_ratio)
 
             st.image(out_img, width="stretch")
+            st.caption(f"Prompt template v{PROMPTS.version} · {st.session_state.prompt_template_hash}")
+            show_color_qa(out_img, st.session_state.color_locks)
+            start_preservation_check(main_image, out_img)
 
             # ✅ DOWNLOAD BUTTON (FIRST GENERATION)
             buf = BytesIO()
@@ -865,38 +741,299 @@ if st.button("🎨 Generate Image") and main_image:
             )
 
             st.session_state.last_generated_image = out_img
+            st.session_state.corrected_image = None
+            st.session_state.produced_tier = produced_tier
+            st.session_state.upscaled_image = None
+            st.session_state.candidates = []
             st.session_state.retry_mode = True
 
         except Exception:
             st.error("❌ Generation failed.")
             st.text(traceback.format_exc())
 
+# ==================================================
+# LOOKBOOK MATRIX (BACKGROUND × POSE)
+# ==================================================
+# Input image parts are encoded once and shared by every cell; only the
+# text part differs. Cells run concurrently and show up as they finish.
+with st.expander("📚 Lookbook Matrix (all backgrounds × poses)"):
+    lookbook_backgrounds = st.multiselect(
+        "Backgrounds", available_bg_colors, default=available_bg_colors, key="lookbook_backgrounds"
+    )
+    lookbook_poses = st.multiselect(
+        "Poses", list(POSE_PROMPTS.keys()), default=[pose_style], key="lookbook_poses"
+    )
+    lookbook_total = len(lookbook_backgrounds) * len(lookbook_poses)
+    st.caption(f"{lookbook_total} shots, up to {MAX_PARALLEL_GENERATIONS} in parallel")
+
+    if st.button("📚 Generate Lookbook", disabled=not (main_image and lookbook_total)):
+        image_parts = input_image_parts(main_image, ref1_image, ref2_image)
+
+        cells = [(bg, pose) for bg in lookbook_backgrounds for pose in lookbook_poses]
+        results = {cell: None for cell in cells}
+        progress = st.progress(0.0, text=f"0 / {len(cells)} shots")
+        partial = st.empty()
+
+        client = genai.Client(api_key=GEMINI_API_KEY)
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_GENERATIONS) as pool:
+            futures = {}
+            for bg, pose in cells:
+                # Every cell shares the dress type's static (cached) prefix
+                prompt = prepare_prompt(dress_type, build_dynamic_prompt(
+                    dress_type, blouse_color, lehenga_color, dupatta_color, bg, pose
+                ))
+                futures[pool.submit(generate_candidate, client, prompt, image_parts, aspect_ratio, generation_resolution)] = (bg, pose)
+
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception:
+                    results[futures[future]] = None
+                progress.progress(done / len(cells), text=f"{done} / {len(cells)} shots")
+                with partial.container():
+                    finished = [(cell, r) for cell, r in results.items() if r]
+                    partial_cols = st.columns(4)
+                    for i, ((bg, pose), r) in enumerate(finished):
+                        partial_cols[i % 4].image(r["image"], caption=f"{bg} · {pose}", width="stretch")
+
+        # Sheet and ZIP are built once per run, laid out with this run's poses
+        shots = [(bg, pose, r["image"] if r else None) for (bg, pose), r in results.items()]
+        ok = [(bg, pose, img) for bg, pose, img in shots if img is not None]
+        sheet = build_contact_sheet(
+            [(img, f"{bg} · {pose}") for bg, pose, img in shots],
+            columns=len(lookbook_poses)
+        )
+        sheet_buf = BytesIO()
+        sheet.save(sheet_buf, format="JPEG", quality=90)
+
+        zip_buf = BytesIO()
+        with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_STORED) as zf:
+            for bg, pose, img in ok:
+                shot_buf = BytesIO()
+                img.save(shot_buf, format="JPEG", quality=95)
+                name = f"{bg}_{pose}".strip().replace(" ", "_").lower()
+                zf.writestr(f"srs_lookbook_{name}.jpg", shot_buf.getvalue())
+
+        st.session_state.lookbook = {
+            "generated": len(ok),
+            "total": len(shots),
+            "sheet": sheet_buf.getvalue(),
+            "zip": zip_buf.getvalue(),
+        }
+
+    lookbook = st.session_state.lookbook
+    if lookbook:
+        st.success(f"✅ {lookbook['generated']} / {lookbook['total']} lookbook shots generated")
+        st.image(lookbook["sheet"], width="stretch")
+        st.download_button("⬇️ Download Contact Sheet", lookbook["sheet"], "srs_lookbook_contact_sheet.jpg", "image/jpeg")
+        st.download_button("⬇️ Download All Shots (ZIP)", lookbook["zip"], "srs_lookbook.zip", "application/zip")
+
+# ==================================================
+# CANDIDATE GRID (RANKED)
+# ==================================================
+if st.session_state.candidates:
+    st.subheader("🏆 Ranked Candidates")
+    st.caption("Score = garment preservation + color lock distance + resolution achieved")
+    grid = st.columns(len(st.session_state.candidates))
+    for rank, (col, candidate) in enumerate(zip(grid, st.session_state.candidates), start=1):
+        with col:
+            metrics = candidate["metrics"]
+            current = candidate["image"] is st.session_state.last_generated_image
+            st.image(candidate["image"], width="stretch")
+            st.markdown(f"**#{rank}** – score `{candidate['score']}`" + (" ✅" if current else ""))
+            st.caption(
+                f"Preservation `{metrics['preservation']}` | "
+                f"Color `{metrics['color'] if metrics['color'] is not None else 'n/a'}` | "
+                f"Resolution `{metrics['resolution']}` ({candidate['tier']})"
+            )
+            buf = BytesIO()
+            candidate["image"].save(buf, format="JPEG", quality=95)
+            st.download_button(
+                "⬇️ Download",
+                buf.getvalue(),
+                f"srs_output_candidate_{rank}.jpg",
+                "image/jpeg",
+                key=f"candidate_download_{rank}"
+            )
+            if not current and st.button("Use this candidate", key=f"candidate_use_{rank}"):
+                use_candidate(candidate)
+                st.rerun()
+
+# ==================================================
+# LOCAL COLOR CORRECTION
+# ==================================================
+# Small hue / lightness drift is fixed locally (LAB shift through a 3D
+# LUT) instead of another model call. Fragment: slider, toggle and
+# buttons here only rerun this panel.
+@st.fragment
+def color_correction_panel():
+    out_img = st.session_state.last_generated_image
+    checks = verify_color_locks(out_img, st.session_state.color_locks)
+    drifted = [check for check in checks if check["status"] != "pass"]
+    if not drifted and st.session_state.corrected_image is None:
+        return
+
+    st.divider()
+    st.subheader("🪄 Local Color Correction")
+    if drifted:
+        st.caption(" | ".join(
+            f"{check['slot']}: `{check['observed']}` → `{check['locked']}` (ΔE {check['delta_e']})"
+            for check in drifted
+        ))
+
+    strength = st.slider("Correction strength", 0.0, 1.0, 1.0, 0.1, key="correction_strength")
+    if drifted and st.button("🪄 Apply Local Color Correction"):
+        corrected, slots = correct_colors(out_img, checks, strength=strength)
+        st.session_state.corrected_image = corrected
+        st.success(f"✅ Corrected: {', '.join(slots)}")
+
+    corrected = st.session_state.corrected_image
+    if corrected is None:
+        return
+
+    show_after = st.toggle("Show corrected (after)", value=True, key="correction_before_after")
+    st.image(corrected if show_after else out_img, width="stretch")
+
+    buf = BytesIO()
+    corrected.save(buf, format="JPEG", quality=95)
+    st.download_button(
+        "⬇️ Download Corrected Output",
+        buf.getvalue(),
+        "srs_output_color_corrected.jpg",
+        "image/jpeg"
+    )
+
+    if st.button("✅ Use Corrected Image as Current Output"):
+        st.session_state.last_generated_image = corrected
+        st.session_state.corrected_image = None
+        st.rerun()
+
+if st.session_state.retry_mode and st.session_state.last_generated_image and st.session_state.color_locks:
+    color_correction_panel()
+
+# ==================================================
+# RESOLUTION CHECK & LOCAL UPSCALE
+# ==================================================
+# generate_with_fallback may drop from 4K to 2K/1K. Report which tier
+# produced the pixels and offer a CPU upscale instead of another call.
+@st.fragment
+def resolution_panel():
+    out_img = st.session_state.last_generated_image
+    if not is_below_tier(out_img.size, aspect_ratio, generation_resolution):
+        return
+
+    st.divider()
+    st.subheader("📐 Resolution Check")
+    w, h = out_img.size
+    st.warning(
+        f"⚠️ Requested {generation_resolution}, got {w}×{h} "
+        f"(produced by the {st.session_state.produced_tier or 'unknown'} tier, ≈ {tier_of(out_img.size)} pixels)."
+    )
+
+    if st.button(f"🔍 Upscale Locally to {generation_resolution}"):
+        with st.spinner("Upscaling on CPU..."):
+            st.session_state.upscaled_image = upscale_to_tier(out_img, aspect_ratio, generation_resolution)
+
+    upscaled = st.session_state.upscaled_image
+    if upscaled is None:
+        return
+
+    st.image(upscaled, width="stretch")
+    st.caption(
+        f"Pixels: {st.session_state.produced_tier or tier_of(out_img.size)} model output → "
+        f"{upscaled.size[0]}×{upscaled.size[1]} local upscale (Lanczos + edge sharpening)"
+    )
+    buf = BytesIO()
+    upscaled.save(buf, format="JPEG", quality=95)
+    st.download_button(
+        "⬇️ Download Upscaled Output",
+        buf.getvalue(),
+        f"srs_output_upscaled_{generation_resolution}.jpg",
+        "image/jpeg"
+    )
+
+if st.session_state.retry_mode and st.session_state.last_generated_image:
+    resolution_panel()
+
 # ==================================================
 # DELTA FIX
 # ==================================================
+REGION_FIX_PROMPT = """
+REGION FIX (LOCAL EDIT):
+- The FIRST image is a crop of a finished catalog photo
+- The SECOND image is the original garment (mannequin) for reference only
+- Fix ONLY the problem described below inside the crop
+- Return the SAME crop: same framing, same scale, same lighting, same background
+- Everything not named in the fix MUST stay pixel-identical
+- Do NOT redesign, beautify or recolor the garment
+"""
+
+# Full-frame regions are not worth a local edit
+REGION_FIX_MAX_SHARE = 0.6
+
 if st.session_state.retry_mode and st.session_state.last_generated_image and main_image:
     st.divider()
     delta = st.text_area("Describe ONLY what is wrong")
 
+    last_image = st.session_state.last_generated_image
+    region_mode = st.toggle("🎯 Limit fix to a marked region", value=False)
+    fix_region = None
+    if region_mode:
+        st.caption("Click and drag a box around the problem area on the output.")
+        drag = streamlit_image_coordinates(last_image, key=f"fix_region_picker_{st.session_state.fix_picker_round}", click_and_drag=True)
+        if drag and "x1" in drag:
+            st.session_state.fix_region = region_from_drag(drag, last_image.size)
+        fix_region = st.session_state.fix_region
+
+        if fix_region:
+            fix_crop, fix_crop_aspect = context_box(fix_region, last_image.size)
+            share = ((fix_crop[2] - fix_crop[0]) * (fix_crop[3] - fix_crop[1])) / float(last_image.size[0] * last_image.size[1])
+            if share > REGION_FIX_MAX_SHARE:
+                st.info("ℹ️ Marked region covers most of the image – a full fix will be used.")
+                fix_region = None
+            else:
+                st.image(last_image.crop(fix_crop), width=300)
+                st.caption(f"Sending {fix_crop[2] - fix_crop[0]}×{fix_crop[3] - fix_crop[1]} crop ({share:.0%} of frame, {fix_crop_aspect}, {crop_tier(fix_crop)})")
+
     if st.button("♻️ Fix & Regenerate"):
         with st.spinner("Re-generating image..."):
             try:
-                parts = [
-                    types.Part.from_text(text=st.session_state.final_prompt + f"\nONLY FIX:\n{delta}"),
-                    pil_image_to_part(main_image),
-                    pil_image_to_part(st.session_state.last_generated_image)
-                ]
-                if ref1_image:
-                    parts.append(pil_image_to_part(ref1_image))
-                if ref2_image:
-                    parts.append(pil_image_to_part(ref2_image))
-
-                response = generate_with_fallback(
-                    genai.Client(api_key=GEMINI_API_KEY),
-                    parts,
-                    aspect_ratio,
-                    generation_resolution
-                )
+                if fix_region:
+                    # Only the padded region + a small garment thumbnail go out
+                    parts = [
+                        types.Part.from_text(text=REGION_FIX_PROMPT + f"\nONLY FIX:\n{delta}"),
+                        inline_part(last_image.crop(fix_crop)),
+                        inline_part(context_thumbnail(main_image))
+                    ]
+                    response, produced_tier = generate_with_fallback(
+                        genai.Client(api_key=GEMINI_API_KEY),
+                        parts,
+                        fix_crop_aspect,
+                        crop_tier(fix_crop)
+                    )
+                    # Composited back into the full-res output, whose tier is unchanged
+                    produced_tier = st.session_state.produced_tier
+                else:
+                    prompt = prepare_prompt(
+                        st.session_state.prompt_dress_type,
+                        st.session_state.prompt_dynamic + f"\nONLY FIX:\n{delta}"
+                    )
+                    image_parts = [
+                        image_part(main_image, st.session_state.main_digest),
+                        image_part(last_image)
+                    ]
+                    if ref1_image:
+                        image_parts.append(image_part(ref1_image))
+                    if ref2_image:
+                        image_parts.append(image_part(ref2_image))
+
+                    response, produced_tier = generate_prompted(
+                        genai.Client(api_key=GEMINI_API_KEY),
+                        prompt,
+                        image_parts,
+                        aspect_ratio,
+                        generation_resolution
+                    )
 
                 if not response:
                     st.error("❌ API did not return a valid response. Try again.")
@@ -906,12 +1043,22 @@ if st.session_state.retry_mode and st.session_state.last_generated_image and mai
                 if not img_bytes:
                     st.error("❌ No image data in API response.")
                     st.stop()
+                # Region patches are resized onto their crop, so only full fixes are checked
+                geometry = None if fix_region else check_output_geometry(img_bytes, aspect_ratio)
 
                 out_img = safe_open_image(img_bytes)
                 if not out_img:
                     st.stop()
-                
+
+                if fix_region:
+                    out_img = composite_patch(last_image, out_img, fix_crop, fix_region)
+                else:
+                    out_img = fix_output_geometry(out_img, geometry, aspect_ratio)
+                clear_fix_region()
+
                 st.image(out_img, width="stretch")
+                show_color_qa(out_img, st.session_state.color_locks)
+                start_preservation_check(main_image, out_img)
 
                 # ✅ DOWNLOAD BUTTON (SECOND GENERATION)
                 buf = BytesIO()
@@ -924,6 +1071,9 @@ if st.session_state.retry_mode and st.session_state.last_generated_image and mai
                 )
 
                 st.session_state.last_generated_image = out_img
+                st.session_state.corrected_image = None
+                st.session_state.produced_tier = produced_tier
+                st.session_state.upscaled_image = None
 
             except Exception:
                 st.error("❌ Regeneration failed.")
@@ -0,0 +1,5 @@
+# ==================================================
+# SRS CORE – Streamlit-free image / color stages
+# ==================================================
+# Helpers shared by the Streamlit apps (main_*.py) and batch tooling.
+# Nothing in this package may import streamlit.
@@ -0,0 +1,162 @@
+import hashlib
+import re
+import zipfile
+from pathlib import PurePosixPath
+
+# ==================================================
+# ZIP ARCHIVES AS JOB INPUT
+# ==================================================
+# Vendor ZIPs are never extracted. zip_jobs() groups members using only
+# the central directory. A job then carries "archive" (the .zip path) and
+# member names in its main/choli/lehenga slots. prepare_job() reads each
+# member straight from the archive in the process pool, one member at a
+# time and at most MAX_MEMBER_BYTES each. So memory per worker is bounded
+# by the largest photo, not the archive.
+#
+# Grouping (after dropping a wrapper folder common to every member):
+#   SKU12/…            members in a folder form one SKU: main.* (else the
+#                      first image), *choli*.* and *lehenga*.* references
+#   SKU12.jpg          top-level members go by name: SKU[_main], SKU_choli,
+#   SKU12_choli.jpg    SKU_lehenga ("_", "-" or a space before the slot)
+#   shoot/SKU12.jpg    so do members of a folder whose names spell out
+#   shoot/SKU13.jpg    more than one SKU
+# Folder SKUs are named by the folder; two folders with the same name
+# (a/X/, b/X/) are named by their whole path instead (a_X, b_X).
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+IMAGE_SLOTS = ("main", "choli", "lehenga")
+SLOT_NAME = re.compile(r"^(?P<sku>.+?)(?:[ _-](?P<slot>main|choli|lehenga))?$", re.IGNORECASE)
+MAX_MEMBER_BYTES = 64 * 1024 * 1024
+# SKUs become file names (<sku>.jpg, ZIP members), so no separators and no
+# leading dot
+SKU_PATTERN = re.compile(r"^\w[\w.-]*$")
+
+
+def check_sku(sku):
+    if not isinstance(sku, str) or not SKU_PATTERN.match(sku):
+        raise ValueError(f"invalid sku '{sku}': use letters, digits, '_', '-' and '.'")
+    return sku
+
+
+def sku_from_name(name):
+    # File or folder name → valid SKU ("SKU 12 (1)" → "SKU_12_1_")
+    return re.sub(r"[^\w.-]+", "_", name).lstrip(".-") or "sku"
+
+
+def is_image_name(name):
+    path = PurePosixPath(name)
+    return not path.name.startswith((".", "~")) and path.suffix.lower() in IMAGE_SUFFIXES
+
+
+def parse_name(name):
+    # "SKU12_choli.jpg" → ("SKU12", "choli"); None for non-images / temp files
+    if not is_image_name(name):
+        return None
+    match = SLOT_NAME.match(PurePosixPath(name).stem)
+    return sku_from_name(match["sku"]), (match["slot"] or "main").lower()
+
+
+def _image_members(zf):
+    for info in zf.infolist():
+        if info.is_dir() or info.filename.startswith("__MACOSX/") or not is_image_name(info.filename):
+            continue
+        yield info
+
+
+def _strip_common_root(paths):
+    # Drop wrapper folders ("shoot/" from Finder/Explorer "Compress") while
+    # every member sits under the same one and it holds subfolders
+    while paths and all(len(p.parts) > 1 for p in paths) and len({p.parts[0] for p in paths}) == 1:
+        if not any(len(p.parts) > 2 for p in paths):
+            break   # a single flat folder: handled per folder below
+        paths = [PurePosixPath(*p.parts[1:]) for p in paths]
+    return paths
+
+
+def _by_convention(names):
+    # {sku: {slot: name}} by the SKU[_slot] naming convention. Bare slot
+    # names (main.jpg, choli.jpg) don't name a SKU; groups need a main.
+    groups = {}
+    for name in names:
+        sku, slot = parse_name(name)
+        groups.setdefault(sku, {}).setdefault(slot, name)
+    return {
+        sku: {slot: slots.get(slot) for slot in IMAGE_SLOTS}
+        for sku, slots in groups.items() if "main" in slots and sku.lower() not in IMAGE_SLOTS
+    }
+
+
+def _by_folder(names):
+    # One SKU folder: main.* (else the first image), *choli* / *lehenga* references
+    stems = {name: PurePosixPath(name).stem.lower() for name in names}
+    choli = next((n for n in names if "choli" in stems[n]), None)
+    lehenga = next((n for n in names if "lehenga" in stems[n]), None)
+    rest = [n for n in names if n not in (choli, lehenga)]
+    main = next((n for n in rest if stems[n] == "main"), rest[0] if rest else None)
+    return {"main": main, "choli": choli, "lehenga": lehenga} if main else None
+
+
+def zip_groups(zf):
+    # {sku: {slot: member name}} in archive order
+    names = [info.filename for info in _image_members(zf)]
+    folders = {}   # parent path (after the common root) → member names
+    for name, path in zip(names, _strip_common_root([PurePosixPath(n) for n in names])):
+        folders.setdefault(path.parent, []).append(name)
+
+    # Folders with more than one SKU by name, and the top level, use the
+    # naming convention; any other folder is one SKU named after it
+    named, sku_folders = {}, {}
+    for parent, members in folders.items():
+        groups = _by_convention(members)
+        if parent == PurePosixPath(".") or len(groups) > 1:
+            for sku, slots in groups.items():
+                named.setdefault(sku, slots)
+        elif (slots := _by_folder(members)) is not None:
+            sku_folders[parent] = slots
+
+    # Same folder name under different parents: name each by its full path
+    counts = {}
+    for parent in sku_folders:
+        counts[parent.name] = counts.get(parent.name, 0) + 1
+    result = {}
+    for parent, slots in sku_folders.items():
+        result[sku_from_name(parent.name if counts[parent.name] == 1 else "_".join(parent.parts))] = slots
+    for sku, slots in named.items():
+        result.setdefault(sku, slots)
+    return result
+
+
+def zip_jobs(path):
+    # One job per SKU in the archive; slots hold member names
+    with zipfile.ZipFile(path) as zf:
+        groups = zip_groups(zf)
+    archive = str(path)
+    for sku, slots in groups.items():
+        yield {"sku": sku, "archive": archive, **{k: v for k, v in slots.items() if v}}
+
+
+def read_member(archive, name, limit=MAX_MEMBER_BYTES):
+    # Bytes of one member, refusing anything (declared or actual) over limit
+    with zipfile.ZipFile(archive) as zf:
+        info = zf.getinfo(name)
+        if info.file_size > limit:
+            raise ValueError(f"{name}: {info.file_size} bytes exceeds the {limit} byte limit")
+        with zf.open(info) as f:
+            data = f.read(limit + 1)
+    if len(data) > limit:
+        raise ValueError(f"{name}: exceeds the {limit} byte limit")
+    return data
+
+
+def archive_digest(archive, job):
+    # Input digest from the central directory (CRC-32 + size per slot),
+    # so submitting doesn't have to read the photos. `archive` is a path
+    # or an open ZipFile.
+    if not isinstance(archive, zipfile.ZipFile):
+        with zipfile.ZipFile(archive) as zf:
+            return archive_digest(zf, job)
+    h = hashlib.blake2b(digest_size=16)
+    for slot in IMAGE_SLOTS:
+        if job.get(slot):
+            info = archive.getinfo(job[slot])
+            h.update(f"{slot}:{info.CRC:08x}:{info.file_size}".encode("utf-8"))
+    return h.hexdigest()
@@ -0,0 +1,63 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ==================================================
+# IMAGE DIGEST
+# ==================================================
+# Content hash of the decoded pixels (not the upload bytes), so the same
+# garment re-encoded by compress_upload_image still gets a stable key per
+# decoded result.
+def image_digest(img):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    # Hash of the raw file bytes, read in chunks
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ==================================================
+# SMALL LRU KEYED BY DIGEST
+# ==================================================
+class DigestCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from .archive import IMAGE_SUFFIXES, sku_from_name, zip_jobs
+from .engine import JOB_DEFAULTS, is_done, run_batch
+from .manifest import Checkpoint, content_key, is_manifest, manifest_jobs, validate_manifest
+from .templates import get_registry
+
+# ==================================================
+# srs-generate
+# ==================================================
+#   srs-generate ./garments --out ./outputs
+#   srs-generate shoot.csv --out ./outputs --resolution 4K --concurrency 6
+#   srs-generate vendor.zip --out ./outputs
+#
+# INPUT is a folder, a .csv / .jsonl manifest or a .zip.
+#   folder:   every sub-folder is one SKU (main.*, optional *choli*.* and
+#             *lehenga*.*); loose images in the top level are single-image
+#             SKUs named after the file.
+#   manifest: one row per SKU, see srs_core/manifest.py. The whole file
+#             is validated before the first API call. Blank cells fall
+#             back to the CLI options.
+#   zip:      read in place, never extracted – see srs_core/archive.py.
+#
+# Every finished SKU is checkpointed in --out/.srs-checkpoint.jsonl with a
+# hash of its images + options. A rerun skips SKUs whose key still matches
+# and regenerates the ones whose photos or row changed.
+def _is_image(path):
+    return path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES and not path.name.startswith(".")
+
+
+def folder_jobs(folder):
+    folder = Path(folder)
+    for entry in sorted(folder.iterdir()):
+        if _is_image(entry):
+            yield {"sku": sku_from_name(entry.stem), "main": str(entry)}
+        elif entry.is_dir():
+            images = [p for p in sorted(entry.iterdir()) if _is_image(p)]
+            choli = next((p for p in images if "choli" in p.stem.lower()), None)
+            lehenga = next((p for p in images if "lehenga" in p.stem.lower()), None)
+            rest = [p for p in images if p not in (choli, lehenga)]
+            main = next((p for p in rest if p.stem.lower() == "main"), rest[0] if rest else None)
+            if main is None:
+                continue
+            yield {
+                "sku": sku_from_name(entry.name),
+                "main": str(main),
+                "choli": str(choli) if choli else None,
+                "lehenga": str(lehenga) if lehenga else None,
+            }
+
+
+def count_jobs(source):
+    source = Path(source)
+    if source.is_dir():
+        return sum(1 for _ in folder_jobs(source))
+    if source.suffix.lower() == ".zip":
+        return sum(1 for _ in zip_jobs(source))
+    with open(source, encoding="utf-8") as f:
+        lines = sum(1 for line in f if line.strip())
+    return lines - 1 if source.suffix.lower() == ".csv" else lines
+
+
+def apply_defaults(jobs, defaults):
+    for job in jobs:
+        yield {**defaults, **{k: v for k, v in job.items() if v is not None}}
+
+
+# ==================================================
+# CHECKPOINTED RUN
+# ==================================================
+class CheckpointedRun:
+    # Filters the job stream against the checkpoint and records each
+    # finished SKU as run_batch reports it. Outputs from before
+    # checkpoints existed (no entry for the SKU) count as done.
+    def __init__(self, out_dir, overwrite=False, on_event=None):
+        self.out_dir = out_dir
+        self.overwrite = overwrite
+        self.emit = on_event or (lambda event: None)
+        self.checkpoint = Checkpoint(out_dir)
+        self.pending = {}   # sku → key, only for jobs in flight
+        self.skipped = 0
+
+    def jobs(self, jobs):
+        for job in jobs:
+            sku = job.get("sku") or sku_from_name(Path(job["main"]).stem)
+            key = content_key(job)
+            current = self.checkpoint.is_done(sku, key) or not self.checkpoint.has_entry(sku)
+            if not self.overwrite and is_done(self.out_dir, sku) and current:
+                self.skipped += 1
+                self.emit({"type": "skipped", "sku": sku})
+                continue
+            self.pending[sku] = key
+            yield job
+
+    def on_event(self, event):
+        if event["type"] in ("done", "failed"):
+            key = self.pending.pop(event["sku"], None)
+            if key is not None:
+                self.checkpoint.record(event["sku"], key, event["type"], error=event.get("error"))
+        self.emit(event)
+
+    def close(self):
+        self.checkpoint.close()
+
+
+def print_validation(report, stream=sys.stderr):
+    for line, message in report["errors"]:
+        stream.write(f"{'line ' + str(line) if line else 'manifest'}: {message}\n")
+    hidden = report["error_count"] - len(report["errors"])
+    if hidden > 0:
+        stream.write(f"… and {hidden} more\n")
+    if report["ignored_columns"]:
+        stream.write(f"ignored columns: {', '.join(report['ignored_columns'])}\n")
+
+
+# ==================================================
+# TERMINAL PROGRESS
+# ==================================================
+class Progress:
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.counts = {"done": 0, "failed": 0, "skipped": 0}
+        self.started = time.monotonic()
+
+    def __call__(self, event):
+        kind = event["type"]
+        if kind in self.counts:
+            self.counts[kind] += 1
+        if kind == "failed":
+            self._line(f"✗ {event['sku']}: {event['error']}", keep=True)
+        elif kind == "done" or (kind == "skipped" and not self.tty):
+            self._line(self.status(event))
+
+    def status(self, event):
+        finished = sum(self.counts.values())
+        elapsed = time.monotonic() - self.started
+        rate = self.counts["done"] / elapsed * 60 if elapsed > 0 else 0.0
+        return (
+            f"[{finished}/{self.total}] done {self.counts['done']} · failed {self.counts['failed']} · "
+            f"skipped {self.counts['skipped']} · {rate:.1f}/min · last {event['sku']}"
+        )
+
+    def _line(self, text, keep=False):
+        if self.tty and not keep:
+            self.stream.write("\r\033[K" + text)
+        else:
+            self.stream.write(("\r\033[K" if self.tty else "") + text + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self.tty:
+            self.stream.write("\n")
+
+
+def main(argv=None):
+    registry = get_registry()
+    parser = argparse.ArgumentParser(prog="srs-generate", description="Bulk try-on generation without the UI")
+    parser.add_argument("input", help="garment folder or .csv / .jsonl manifest")
+    parser.add_argument("--out", required=True, help="output folder")
+    parser.add_argument("--dress-type", default=JOB_DEFAULTS["dress_type"], choices=registry.dress_types)
+    parser.add_argument("--background", default=None, help="default: first option for the dress type")
+    parser.add_argument("--pose", default=JOB_DEFAULTS["pose"], choices=list(registry.poses))
+    parser.add_argument("--aspect-ratio", default=JOB_DEFAULTS["aspect_ratio"])
+    parser.add_argument("--resolution", default=JOB_DEFAULTS["resolution"], choices=["1K", "2K", "4K"])
+    parser.add_argument("--quality", type=int, default=85, help="upload JPEG quality (60-95)")
+    parser.add_argument("--crop-margin", type=float, default=None, help="auto-crop main image, margin as a fraction")
+    parser.add_argument("--workers", type=int, default=None, help="CPU processes (default: cores - 1)")
+    parser.add_argument("--concurrency", type=int, default=4, help="simultaneous API calls")
+    parser.add_argument("--overwrite", action="store_true", help="regenerate SKUs that already have outputs")
+    parser.add_argument("--validate-only", action="store_true", help="check the manifest and exit")
+    args = parser.parse_args(argv)
+
+    source = Path(args.input)
+    is_zip = source.suffix.lower() == ".zip"
+    if not source.is_dir() and not is_manifest(source) and not is_zip:
+        parser.error("input must be a folder, .csv, .jsonl or .zip")
+
+    defaults = {
+        "dress_type": args.dress_type,
+        "background": args.background,
+        "pose": args.pose,
+        "aspect_ratio": args.aspect_ratio,
+        "resolution": args.resolution,
+    }
+    if is_manifest(source):
+        report = validate_manifest(source, defaults)
+        print_validation(report)
+        if report["error_count"]:
+            print(f"{source}: {report['error_count']} errors in {report['rows']} rows – nothing generated")
+            return 2
+        if args.validate_only:
+            print(f"{source}: {report['rows']} rows OK")
+            return 0
+        jobs, total = manifest_jobs(source), report["rows"]
+    elif is_zip:
+        jobs, total = zip_jobs(source), count_jobs(source)
+    else:
+        jobs, total = folder_jobs(source), count_jobs(source)
+
+    api_key = os.environ.get("SRS_KEY")
+    if not api_key:
+        parser.error("set the SRS_KEY environment variable")
+
+    progress = Progress(total)
+    run = CheckpointedRun(args.out, overwrite=args.overwrite, on_event=progress)
+    try:
+        summary = asyncio.run(run_batch(
+            run.jobs(apply_defaults(jobs, defaults)),
+            args.out,
+            api_key=api_key,
+            workers=args.workers,
+            concurrency=args.concurrency,
+            upload_quality=args.quality,
+            crop_margin=args.crop_margin,
+            overwrite=True,   # skipping is decided by the checkpoint
+            on_event=run.on_event,
+        ))
+    finally:
+        run.close()
+    summary["skipped"] += run.skipped
+    progress.close()
+    print(f"done {summary['done']} · failed {summary['failed']} · skipped {summary['skipped']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
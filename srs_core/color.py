@@ -0,0 +1,284 @@
+import math
+
+import numpy as np
+from PIL import Image
+from skimage.color import lab2rgb, rgb2lab
+
+from .cache import DigestCache, image_digest
+
+# ==================================================
+# HEX / RGB / LAB HELPERS
+# ==================================================
+def rgb_to_hex(rgb):
+    r, g, b = (int(round(c)) for c in rgb)
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+def hex_to_rgb(hex_color):
+    value = hex_color.lstrip("#")
+    if len(value) != 6:
+        raise ValueError(f"Invalid hex color: {hex_color!r}")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def image_to_lab(img):
+    # float32 LAB view of a PIL image, shape (h, w, 3)
+    rgb = np.asarray(img.convert("RGB"), dtype=np.uint8)
+    return rgb2lab(rgb).astype(np.float32)
+
+
+def lab_to_rgb_tuple(lab):
+    rgb = lab2rgb(np.asarray(lab, dtype=np.float64).reshape(1, 1, 3))[0, 0]
+    return tuple(int(round(c * 255)) for c in np.clip(rgb, 0.0, 1.0))
+
+
+# ==================================================
+# NEIGHBOURHOOD PIXEL SAMPLER
+# ==================================================
+# A single getpixel() on embroidered fabric lands on a thread highlight or a
+# shadow. The sampler looks at a (2r+1)² brush around the click instead.
+#
+# Cost per pick does not depend on the radius:
+#   - "mean" reads the box sum from a summed-area table (4 lookups)
+#   - "median" / "trimmed" work on a strided grid of at most
+#     MAX_GRID_SIDE² pixels inside the brush
+#
+# The LAB view and the table are built on the first pick, not on upload,
+# so Automatic mode never pays for them. The table holds LAB in fixed
+# point (1/SAT_SCALE units) as uint32: sums wrap around, but a box sum is
+# exact as long as the box itself fits, which any brush does.
+PICK_METHODS = ["median", "trimmed", "mean"]
+MAX_GRID_SIDE = 15
+TRIM_FRACTION = 0.2
+SAT_SCALE = 16
+SAT_OFFSET = 128.0   # a/b go down to -128
+
+
+class PixelSampler:
+    def __init__(self, img):
+        self.img = img
+        self.width, self.height = img.size
+        self._lab = None
+        self._sat = None
+
+    @property
+    def lab(self):
+        if self._lab is None:
+            self._lab = image_to_lab(self.img)
+        return self._lab
+
+    @property
+    def sat(self):
+        # Summed-area table with a zero row/column in front so that
+        # box sums need no edge special-casing
+        if self._sat is None:
+            fixed = np.rint((self.lab + SAT_OFFSET) * SAT_SCALE).astype(np.uint32)
+            sat = np.zeros((self.height + 1, self.width + 1, 3), dtype=np.uint32)
+            np.cumsum(np.cumsum(fixed, axis=0, dtype=np.uint32), axis=1, dtype=np.uint32, out=sat[1:, 1:])
+            self._sat = sat
+        return self._sat
+
+    def _box(self, x, y, radius):
+        x0 = max(0, x - radius)
+        y0 = max(0, y - radius)
+        x1 = min(self.width, x + radius + 1)
+        y1 = min(self.height, y + radius + 1)
+        return x0, y0, x1, y1
+
+    def box_mean(self, x, y, radius):
+        x0, y0, x1, y1 = self._box(x, y, radius)
+        s = self.sat
+        total = s[y1, x1] - s[y0, x1] - s[y1, x0] + s[y0, x0]   # uint32, wraps back exactly
+        return total.astype(np.float64) / ((x1 - x0) * (y1 - y0) * SAT_SCALE) - SAT_OFFSET
+
+    def _grid(self, x, y, radius):
+        x0, y0, x1, y1 = self._box(x, y, radius)
+        step = max(1, math.ceil(max(x1 - x0, y1 - y0) / MAX_GRID_SIDE))
+        return self.lab[y0:y1:step, x0:x1:step].reshape(-1, 3)
+
+    def sample_lab(self, x, y, radius=0, method="median"):
+        x = max(0, min(int(x), self.width - 1))
+        y = max(0, min(int(y), self.height - 1))
+        radius = max(0, int(radius))
+
+        if radius == 0:
+            return self.lab[y, x].astype(np.float64)
+
+        if method == "mean":
+            return self.box_mean(x, y, radius)
+
+        pixels = self._grid(x, y, radius)
+        median = np.median(pixels, axis=0)
+        if method == "median":
+            return median
+        if method == "trimmed":
+            # Drop the pixels furthest from the median (highlights, shadows,
+            # thread gaps) and average the rest
+            dist = np.linalg.norm(pixels - median, axis=1)
+            keep = max(1, int(len(pixels) * (1 - TRIM_FRACTION)))
+            closest = np.argpartition(dist, keep - 1)[:keep]
+            return pixels[closest].mean(axis=0)
+
+        raise ValueError(f"Unknown pick method: {method!r}")
+
+    def sample(self, x, y, radius=0, method="median"):
+        # Returns an (r, g, b) tuple of ints
+        return lab_to_rgb_tuple(self.sample_lab(x, y, radius, method))
+
+
+# ==================================================
+# DOMINANT COLORS (K-MEANS IN LAB)
+# ==================================================
+# Runs on a downsampled copy (<= ANALYSIS_DIM px) so a full 2048px upload
+# costs a few milliseconds. Clusters whose center sits close to the border
+# color are treated as studio backdrop and ignored.
+ANALYSIS_DIM = 128
+KMEANS_CLUSTERS = 6
+KMEANS_ITERATIONS = 12
+BACKGROUND_DELTA = 12.0
+DUPATTA_MIN_SHARE = 0.08
+
+_dominant_cache = DigestCache(maxsize=64)
+
+
+def downsample_lab(img, max_dim=ANALYSIS_DIM):
+    small = img.convert("RGB")
+    if max(small.size) > max_dim:
+        small = small.copy()
+        small.thumbnail((max_dim, max_dim), Image.BILINEAR)
+    return image_to_lab(small)
+
+
+def border_lab(lab, width=2):
+    border = np.concatenate([
+        lab[:width].reshape(-1, 3),
+        lab[-width:].reshape(-1, 3),
+        lab[:, :width].reshape(-1, 3),
+        lab[:, -width:].reshape(-1, 3),
+    ])
+    return np.median(border, axis=0)
+
+
+def kmeans_lab(pixels, k=KMEANS_CLUSTERS, iterations=KMEANS_ITERATIONS, seed=0):
+    # Plain vectorized Lloyd iterations with k-means++ seeding.
+    # Returns (centers, labels), centers sorted by cluster size (largest first).
+    rng = np.random.default_rng(seed)
+    k = min(k, len(pixels))
+
+    centers = np.empty((k, 3), dtype=np.float32)
+    centers[0] = pixels[rng.integers(len(pixels))]
+    closest = np.sum((pixels - centers[0]) ** 2, axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centers[i:] = centers[0]
+            break
+        centers[i] = pixels[rng.choice(len(pixels), p=closest / total)]
+        closest = np.minimum(closest, np.sum((pixels - centers[i]) ** 2, axis=1))
+
+    labels = np.zeros(len(pixels), dtype=np.intp)
+    for step in range(iterations):
+        dist = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = dist.argmin(axis=1)
+        if step > 0 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack(
+            [np.bincount(labels, weights=pixels[:, c], minlength=k) for c in range(3)],
+            axis=1
+        )
+        filled = counts > 0
+        centers[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+
+    counts = np.bincount(labels, minlength=k)
+    order = np.argsort(-counts)
+    remap = np.empty(k, dtype=np.intp)
+    remap[order] = np.arange(k)
+    return centers[order], remap[labels]
+
+
+def _analyse(img):
+    lab = downsample_lab(img)
+    h, w = lab.shape[:2]
+    centers, labels = kmeans_lab(lab.reshape(-1, 3))
+    background = np.linalg.norm(centers - border_lab(lab), axis=1) < BACKGROUND_DELTA
+    # Never throw every cluster away (e.g. a close-up with no backdrop)
+    if background.all():
+        background[:] = False
+    return {
+        "centers": centers,
+        "labels": labels.reshape(h, w),
+        "background": background,
+    }
+
+
+def analyse_colors(img, digest=None):
+    # Cached per image digest: {"centers", "labels", "background"}
+    key = digest or image_digest(img)
+    return _dominant_cache.get_or_compute(key, lambda: _analyse(img))
+
+
+def _dominant_in(labels, background, rows=None):
+    region = labels if rows is None else labels[rows]
+    region = region[~background[region]]
+    if region.size == 0:
+        return None, 0
+    counts = np.bincount(region, minlength=len(background))
+    return int(counts.argmax()), counts
+
+
+def dominant_color(img, digest=None):
+    # Hex of the largest non-background cluster
+    result = analyse_colors(img, digest)
+    cluster, _ = _dominant_in(result["labels"], result["background"])
+    if cluster is None:
+        cluster = 0
+    return rgb_to_hex(lab_to_rgb_tuple(result["centers"][cluster]))
+
+
+def auto_garment_colors(main_image, ref1_image=None, ref2_image=None):
+    # Maps dominant clusters onto the prompt's color-lock slots:
+    #   Blouse  – choli reference if given, else upper band of the main garment
+    #   Lehenga – lehenga reference if given, else lower band of the main garment
+    #   Dupatta – a remaining sizeable main-image cluster, else the lehenga color
+    result = analyse_colors(main_image)
+    centers, labels, background = result["centers"], result["labels"], result["background"]
+
+    fg_rows = np.flatnonzero((~background[labels]).any(axis=1))
+    if fg_rows.size:
+        top, bottom = fg_rows[0], fg_rows[-1] + 1
+    else:
+        top, bottom = 0, labels.shape[0]
+    extent = bottom - top
+    upper = slice(top, top + max(1, int(extent * 0.35)))
+    lower = slice(top + int(extent * 0.45), bottom)
+
+    blouse_cluster, _ = _dominant_in(labels, background, upper)
+    lehenga_cluster, _ = _dominant_in(labels, background, lower)
+    _, all_counts = _dominant_in(labels, background)
+
+    def hex_of(cluster):
+        return rgb_to_hex(lab_to_rgb_tuple(centers[cluster]))
+
+    if ref1_image is not None:
+        blouse = dominant_color(ref1_image)
+    else:
+        blouse = hex_of(blouse_cluster if blouse_cluster is not None else 0)
+
+    if ref2_image is not None:
+        lehenga = dominant_color(ref2_image)
+    else:
+        lehenga = hex_of(lehenga_cluster if lehenga_cluster is not None else 0)
+
+    dupatta = lehenga
+    if isinstance(all_counts, np.ndarray) and all_counts.sum():
+        share = all_counts / all_counts.sum()
+        for cluster in np.argsort(-all_counts):
+            if cluster in (blouse_cluster, lehenga_cluster):
+                continue
+            if share[cluster] >= DUPATTA_MIN_SHARE:
+                dupatta = hex_of(cluster)
+            break
+
+    return {"Blouse": blouse, "Lehenga": lehenga, "Dupatta": dupatta}
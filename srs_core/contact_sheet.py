@@ -0,0 +1,42 @@
+import math
+
+from PIL import Image, ImageDraw, ImageOps
+
+# ==================================================
+# CONTACT SHEET
+# ==================================================
+# One overview image for a lookbook run: fixed-size cells (aspect kept,
+# letterboxed) with a caption strip under each shot.
+CELL_SIZE = (360, 480)
+CAPTION_HEIGHT = 28
+GUTTER = 12
+SHEET_BACKGROUND = (245, 243, 238)
+MISSING_FILL = (220, 215, 210)
+
+
+def build_contact_sheet(items, columns=4, cell_size=CELL_SIZE):
+    # items: [(PIL.Image or None, caption)]; None renders a "failed" cell
+    columns = max(1, min(columns, len(items)))
+    rows = math.ceil(len(items) / columns)
+    cell_w, cell_h = cell_size
+    width = columns * cell_w + (columns + 1) * GUTTER
+    height = rows * (cell_h + CAPTION_HEIGHT) + (rows + 1) * GUTTER
+
+    sheet = Image.new("RGB", (width, height), SHEET_BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+
+    for index, (img, caption) in enumerate(items):
+        row, col = divmod(index, columns)
+        x = GUTTER + col * (cell_w + GUTTER)
+        y = GUTTER + row * (cell_h + CAPTION_HEIGHT + GUTTER)
+
+        if img is None:
+            draw.rectangle((x, y, x + cell_w - 1, y + cell_h - 1), fill=MISSING_FILL)
+            draw.text((x + 10, y + cell_h // 2), "generation failed", fill=(120, 0, 0))
+        else:
+            thumb = ImageOps.pad(img.convert("RGB"), cell_size, Image.LANCZOS, color=SHEET_BACKGROUND)
+            sheet.paste(thumb, (x, y))
+
+        draw.text((x + 4, y + cell_h + 8), caption[:60], fill=(40, 40, 40))
+
+    return sheet
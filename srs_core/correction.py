@@ -0,0 +1,98 @@
+import numpy as np
+from PIL import Image, ImageFilter
+from skimage.color import lab2rgb, rgb2lab
+
+from .mask import MASK_WORK_DIM, garment_mask, mask_bbox
+from .qa import SLOT_BANDS, hex_to_lab
+
+# ==================================================
+# LOCAL COLOR CORRECTION (LAB SHIFT)
+# ==================================================
+# Fixes small hue / lightness drift without another model call.
+#
+# The shift is a constant LAB offset (observed → locked), so local texture
+# (embroidery, folds, prints) is kept. It is applied through a 3D LUT
+# (PIL Color3DLUT, C code) and blended in with a feathered band of the
+# garment mask, so a 4K output is corrected in well under a second:
+#   - colors near the drifted cluster get the full offset
+#   - colors far from it (embroidery, skin, backdrop) are left alone
+LUT_SIZE = 33
+COLOR_SIGMA = 18.0      # ΔE76 falloff around the drifted color
+LIGHTNESS_SCALE = 0.8   # keep a little of the original shading
+FEATHER_RATIO = 0.01    # mask blur radius as a fraction of the longer side
+
+
+def _lut_grid():
+    # PIL's LUT table order: red changes fastest, then green, then blue
+    axis = np.linspace(0.0, 1.0, LUT_SIZE)
+    b, g, r = np.meshgrid(axis, axis, axis, indexing="ij")
+    return np.stack([r, g, b], axis=-1).reshape(-1, 3)
+
+
+def build_shift_lut(observed_hex, target_hex, strength=1.0):
+    observed = hex_to_lab(observed_hex)
+    target = hex_to_lab(target_hex)
+    shift = (target - observed) * strength
+    shift[0] *= LIGHTNESS_SCALE
+
+    grid = _lut_grid()
+    lab = rgb2lab(grid.reshape(1, -1, 3))[0]
+    dist = np.linalg.norm(lab - observed, axis=1)
+    weight = np.exp(-0.5 * (dist / COLOR_SIGMA) ** 2)
+
+    corrected = lab2rgb((lab + weight[:, None] * shift).reshape(1, -1, 3))[0]
+    return ImageFilter.Color3DLUT(LUT_SIZE, np.clip(corrected, 0.0, 1.0).ravel().tolist())
+
+
+def _band_mask(mask, band):
+    # Feathered L-mode mask of one slot's band, at mask resolution
+    box = mask_bbox(mask)
+    region = np.zeros_like(mask)
+    if box is not None:
+        _, top, _, bottom = box
+        extent = bottom - top
+        start = top + int(extent * band[0])
+        end = top + max(1, int(extent * band[1]))
+        region[start:end] = mask[start:end]
+
+    band_img = Image.fromarray(region.astype(np.uint8) * 255)
+    radius = max(1, int(max(band_img.size) * FEATHER_RATIO))
+    return band_img.filter(ImageFilter.GaussianBlur(radius))
+
+
+def correct_colors(img, checks, mask=None, strength=1.0):
+    # checks: verify_color_locks() results. Every slot that did not pass
+    # is pulled toward its locked color. Returns (image, corrected_slots).
+    #
+    # Masks are built and feathered on a MASK_WORK_DIM copy; the LUT and
+    # composite only touch the full-resolution box around each band.
+    out = img.convert("RGB")
+    if mask is None:
+        work = out.copy()
+        work.thumbnail((MASK_WORK_DIM, MASK_WORK_DIM), Image.BILINEAR)
+        mask = garment_mask(work)
+
+    sx = out.size[0] / mask.shape[1]
+    sy = out.size[1] / mask.shape[0]
+
+    corrected = []
+    for check in checks:
+        if check["status"] == "pass":
+            continue
+        region = _band_mask(mask, SLOT_BANDS.get(check["slot"], (0.0, 1.0)))
+        box = region.getbbox()
+        if box is None:
+            continue
+
+        full_box = (
+            int(box[0] * sx),
+            int(box[1] * sy),
+            min(out.size[0], int(np.ceil(box[2] * sx))),
+            min(out.size[1], int(np.ceil(box[3] * sy))),
+        )
+        crop = out.crop(full_box)
+        crop_mask = region.crop(box).resize(crop.size, Image.BILINEAR)
+        lut = build_shift_lut(check["observed"], check["locked"], strength)
+        out.paste(crop.filter(lut), full_box[:2], crop_mask)
+        corrected.append(check["slot"])
+    return out, corrected
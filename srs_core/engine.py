@@ -0,0 +1,432 @@
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from google import genai
+from google.genai import types
+from PIL import Image, ImageOps
+
+from .archive import IMAGE_SLOTS, check_sku, read_member, sku_from_name
+from .cache import image_digest
+from .color import auto_garment_colors
+from .geometry import classify_aspect, fix_aspect, probe_dimensions
+from .mask import crop_to_garment
+from .prompt_cache import is_cache_error
+from .qa import verify_color_locks
+from .templates import get_registry
+
+# ==================================================
+# HEADLESS GENERATION ENGINE
+# ==================================================
+# The Streamlit app and the bulk tools (srs-generate, batch_mode) share
+# these helpers. Nothing in here touches st.*: anything the UI used to
+# st.info/st.warning comes back as (level, message) notes instead.
+#
+# Batch pipeline, per garment:
+#   prepare_job   (process pool)  decode, orient, crop, compress, auto colors
+#   generate_job  (asyncio)       prompt + client.aio call with tier fallback
+#   finish_job    (process pool)  aspect fix, color QA, write <sku>.jpg/.json
+MODEL_NAME = "gemini-3.1-flash-image-preview"
+MAX_DIM = 2048
+TARGET_MIN = 1 * 1024 * 1024
+TARGET_MAX = 2 * 1024 * 1024
+OUTPUT_QUALITY = 95
+ASPECT_RATIOS = ("1:1", "2:3", "3:4", "4:5", "9:16")
+RESOLUTIONS = ("1K", "2K", "4K")
+HEX_COLOR = re.compile(r"^#[0-9A-Fa-f]{6}$")
+SLOT_LABELS = {"main": "Main Image", "choli": "Choli Reference", "lehenga": "Lehenga Reference"}
+
+JOB_DEFAULTS = {
+    "dress_type": "Normal Mode",
+    "background": None,          # None → first option for the dress type
+    "pose": "Natural Standing",
+    "colors": None,              # None → auto_garment_colors()
+    "aspect_ratio": "3:4",
+    "resolution": "2K",
+    "choli": None,
+    "lehenga": None,
+}
+
+
+# ==================================================
+# IMAGE PREPROCESSING
+# ==================================================
+def _jpeg(img, quality):
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf
+
+
+def compress_image(img, upload_quality):
+    # Returns (image, (level, message)). Aims for a 1–2 MB JPEG, stepping
+    # quality down from upload_quality, then up from 95 if every step
+    # landed below 1 MB.
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+
+    w, h = img.size
+    if max(w, h) > MAX_DIM:
+        scale = MAX_DIM / max(w, h)
+        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+
+    quality = upload_quality
+    best_buf = None
+    best_quality = quality
+    best_size = 0
+
+    while quality >= 55:
+        buf = _jpeg(img, quality)
+        size = buf.tell()
+        if TARGET_MIN <= size <= TARGET_MAX:
+            buf.seek(0)
+            size_mb = round(size / (1024 * 1024), 2)
+            return Image.open(buf), ("success", f"✅ Image compressed successfully | Size: {size_mb} MB | Quality: {quality}%")
+        # Keep track of the best match that's >= 1 MB
+        if TARGET_MIN <= size and size > best_size:
+            best_buf, best_quality, best_size = buf, quality, size
+        quality -= 2
+
+    if best_buf and best_size >= TARGET_MIN:
+        best_buf.seek(0)
+        size_mb = round(best_size / (1024 * 1024), 2)
+        return Image.open(best_buf), ("warning", f"⚠️ Image size: {size_mb} MB | Quality: {best_quality}% (close to target range)")
+
+    # Every step was under 1 MB: walk quality back up (the old UI loop
+    # had no upper bound and spun forever on small or flat images)
+    quality = 95
+    while quality <= 100:
+        buf = _jpeg(img, quality)
+        size = buf.tell()
+        if size >= TARGET_MIN:
+            buf.seek(0)
+            size_mb = round(size / (1024 * 1024), 2)
+            return Image.open(buf), ("warning", f"⚠️ Image size: {size_mb} MB | Quality: {quality}% (high quality preserved)")
+        quality += 3
+
+    buf = _jpeg(img, 95)
+    size_mb = round(buf.tell() / (1024 * 1024), 2)
+    buf.seek(0)
+    return Image.open(buf), ("warning", f"⚠️ Image size: {size_mb} MB | Quality: 95%")
+
+
+def preprocess_image(img, file_size, upload_quality, label="Image", crop_margin=None):
+    # Returns (image, notes). Same decisions as the app's upload path:
+    # optional garment crop, then compress when the file is large or the
+    # resolution is above MAX_DIM (300 dpi files under 3 MB are kept).
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    notes = []
+
+    if crop_margin is not None:
+        orig_w, orig_h = img.size
+        img, box = crop_to_garment(img, crop_margin)
+        if box:
+            kept = (img.size[0] * img.size[1]) / (orig_w * orig_h)
+            notes.append(("info", f"✂️ {label} cropped to garment ({orig_w}×{orig_h} → {img.size[0]}×{img.size[1]}, {kept:.0%} of frame kept)"))
+
+    size_mb = file_size / (1024 * 1024)
+    w, h = img.size
+    dpi = img.info.get("dpi", (72,))[0]
+
+    needs_compression = False
+    reasons = []
+    if size_mb > 1.5:
+        needs_compression = True
+        reasons.append("file size")
+    if max(w, h) > MAX_DIM:
+        needs_compression = True
+        reasons.append("high resolution")
+    if dpi >= 300 and size_mb < 3:
+        needs_compression = False
+        reasons = ["professional image"]
+
+    if needs_compression:
+        notes.append(("info", f"🔧 Auto-compressing {label} ({', '.join(reasons)})"))
+        img, note = compress_image(img, upload_quality)
+        notes.append(note)
+    else:
+        notes.append(("success", f"✅ {label} kept original quality ({', '.join(reasons)})"))
+    return img, notes
+
+
+# ==================================================
+# GEMINI CALLS
+# ==================================================
+def png_bytes(img):
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def extract_image(resp):
+    for cand in getattr(resp, "candidates", None) or []:
+        if not cand.content:
+            continue
+        for part in cand.content.parts:
+            inline = getattr(part, "inline_data", None)
+            if inline and inline.mime_type.startswith("image/"):
+                data = inline.data
+                return base64.b64decode(data) if isinstance(data, str) else data
+    return None
+
+
+def resolution_order(resolution):
+    # Requested tier first, then the smaller ones
+    return {"4K": ["4K", "2K", "1K"], "2K": ["2K", "1K"]}.get(resolution, [resolution])
+
+
+def generation_config(aspect_ratio, res, cached_content=None):
+    return types.GenerateContentConfig(
+        response_modalities=["IMAGE"],
+        cached_content=cached_content,
+        image_config=types.ImageConfig(aspect_ratio=aspect_ratio, image_size=res),
+    )
+
+
+def generate_with_fallback(client, parts, aspect_ratio, resolution, cached_content=None, model=MODEL_NAME):
+    # (response, tier) or (None, None)
+    for res in resolution_order(resolution):
+        try:
+            response = client.models.generate_content(
+                model=model,
+                contents=[types.Content(role="user", parts=parts)],
+                config=generation_config(aspect_ratio, res, cached_content),
+            )
+            return response, res
+        except Exception as e:
+            # A rejected cached prefix fails every tier alike; the caller goes inline
+            if cached_content and is_cache_error(e):
+                raise
+            continue
+    return None, None
+
+
+async def generate_with_fallback_async(client, parts, aspect_ratio, resolution, cached_content=None, model=MODEL_NAME):
+    for res in resolution_order(resolution):
+        try:
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=[types.Content(role="user", parts=parts)],
+                config=generation_config(aspect_ratio, res, cached_content),
+            )
+            return response, res
+        except Exception as e:
+            # A rejected cached prefix fails every tier alike; the caller goes inline
+            if cached_content and is_cache_error(e):
+                raise
+            continue
+    return None, None
+
+
+# ==================================================
+# BATCH STAGES
+# ==================================================
+def job_spec(job):
+    # Fill defaults; sku defaults to the main image's file stem. Raises
+    # ValueError for a SKU that isn't a safe file name.
+    spec = dict(JOB_DEFAULTS)
+    spec.update({k: v for k, v in job.items() if v is not None})
+    if "sku" not in spec:
+        spec["sku"] = sku_from_name(Path(spec["main"]).stem)
+    check_sku(spec["sku"])
+    if not spec["background"]:
+        options = get_registry().background_options.get(spec["dress_type"], ["royal grey"])
+        spec["background"] = options[0]
+    return spec
+
+
+def color_locks(dress_type, colors):
+    # Normal Mode sends no HEX lock; #FFFFFF is the "not picked" placeholder
+    if dress_type == "Normal Mode" or not colors:
+        return {}
+    return {slot: value for slot, value in colors.items() if value.upper() != "#FFFFFF"}
+
+
+def prepare_job(job, upload_quality=85, crop_margin=None):
+    # Process-pool stage. Returns the spec plus PNG bytes per input image.
+    # With spec["archive"] set, the slots name members of that ZIP.
+    started = time.perf_counter()
+    spec = job_spec(job)
+    notes = []
+    images = {}
+    for slot in IMAGE_SLOTS:
+        path = spec.get(slot)
+        if not path:
+            continue
+        if spec.get("archive"):
+            data = read_member(spec["archive"], path)
+            source, file_size = BytesIO(data), len(data)
+        else:
+            source, file_size = path, os.path.getsize(path)
+        with Image.open(source) as raw:
+            raw.load()
+            img, slot_notes = preprocess_image(
+                raw, file_size, upload_quality, label=SLOT_LABELS[slot],
+                crop_margin=crop_margin if slot == "main" else None,
+            )
+        images[slot] = img
+        notes += slot_notes
+
+    if spec["colors"] is None:
+        spec["colors"] = auto_garment_colors(images["main"], images.get("choli"), images.get("lehenga"))
+
+    return {
+        "spec": spec,
+        "digest": image_digest(images["main"]),
+        "images": {slot: png_bytes(img) for slot, img in images.items()},
+        "notes": notes,
+        "timings": {"prepare": round(time.perf_counter() - started, 3)},
+    }
+
+
+async def generate_job(client, prepared, compact=True, model=MODEL_NAME):
+    # API stage; adds the raw image bytes and prompt hashes to `prepared`
+    started = time.perf_counter()
+    spec = prepared["spec"]
+    colors = spec["colors"]
+    prompt = get_registry().render(
+        spec["dress_type"], colors.get("Blouse", "#FFFFFF"), colors.get("Lehenga", "#FFFFFF"),
+        colors.get("Dupatta", "#FFFFFF"), spec["background"], spec["pose"], compact=compact,
+    )
+    parts = [types.Part.from_text(text=prompt["text"])] + [
+        types.Part.from_bytes(data=data, mime_type="image/png")
+        for data in prepared["images"].values()
+    ]
+    response, tier = await generate_with_fallback_async(
+        client, parts, spec["aspect_ratio"], spec["resolution"], model=model
+    )
+    result = dict(prepared, images=None)
+    result.update({
+        "output": extract_image(response) if response else None,
+        "tier": tier,
+        "template_hash": prompt["template_hash"],
+        "prompt_hash": prompt["prompt_hash"],
+        "template_version": prompt["version"],
+    })
+    result["timings"] = dict(prepared["timings"], generate=round(time.perf_counter() - started, 3))
+    return result
+
+
+def output_paths(out_dir, sku):
+    out_dir = Path(out_dir)
+    return out_dir / f"{sku}.jpg", out_dir / f"{sku}.json"
+
+
+def finish_job(result, out_dir):
+    # Process-pool stage: aspect fix, color QA, write image + metadata
+    started = time.perf_counter()
+    spec = result["spec"]
+    verdict, _ = classify_aspect(probe_dimensions(result["output"])[0], spec["aspect_ratio"])
+    img = Image.open(BytesIO(result["output"])).convert("RGB")
+    geometry_fix = None
+    if verdict == "near":
+        img, geometry_fix = fix_aspect(img, spec["aspect_ratio"])
+
+    locks = color_locks(spec["dress_type"], spec["colors"])
+    qa = verify_color_locks(img, locks) if locks else []
+
+    image_path, meta_path = output_paths(out_dir, spec["sku"])
+    image_path.parent.mkdir(parents=True, exist_ok=True)
+    img.save(image_path, format="JPEG", quality=OUTPUT_QUALITY)
+
+    timings = dict(result["timings"], finish=round(time.perf_counter() - started, 3))
+    meta = {
+        "sku": spec["sku"],
+        "spec": spec,
+        "input_digest": result["digest"],
+        "tier": result["tier"],
+        "size": list(img.size),
+        "geometry": verdict,
+        "geometry_fix": geometry_fix,
+        "color_qa": [{k: v for k, v in check.items()} for check in qa],
+        "template_version": result["template_version"],
+        "template_hash": result["template_hash"],
+        "prompt_hash": result["prompt_hash"],
+        "timings": timings,
+        "notes": [message for _, message in result["notes"]],
+    }
+    # Metadata last: its presence marks the SKU as done
+    meta_path.write_text(json.dumps(meta, indent=2, default=str), encoding="utf-8")
+    return {"sku": spec["sku"], "path": str(image_path), "tier": result["tier"], "timings": timings}
+
+
+def is_done(out_dir, sku):
+    image_path, meta_path = output_paths(out_dir, sku)
+    return image_path.exists() and meta_path.exists()
+
+
+# ==================================================
+# BATCH RUNNER
+# ==================================================
+def cpu_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def run_batch(
+    jobs,
+    out_dir,
+    client=None,
+    api_key=None,
+    workers=None,
+    concurrency=4,
+    upload_quality=85,
+    crop_margin=None,
+    overwrite=False,
+    on_event=None,
+):
+    # jobs: iterable of job dicts (consumed lazily). on_event(event) gets
+    # {"type": "skipped" | "started" | "done" | "failed", "sku", ...}.
+    # At most concurrency API calls and 2 * concurrency jobs in flight, so
+    # memory stays flat however long the job list is.
+    client = client or genai.Client(api_key=api_key)
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    loop = asyncio.get_running_loop()
+    emit = on_event or (lambda event: None)
+    api_slots = asyncio.Semaphore(concurrency)
+    inflight = asyncio.Semaphore(concurrency * 2)
+    summary = {"done": 0, "failed": 0, "skipped": 0}
+    tasks = set()
+
+    async def process(job, sku, pool):
+        try:
+            emit({"type": "started", "sku": sku})
+            prepared = await loop.run_in_executor(pool, prepare_job, job, upload_quality, crop_margin)
+            async with api_slots:
+                result = await generate_job(client, prepared)
+            if not result["output"]:
+                raise RuntimeError("no image in API response")
+            saved = await loop.run_in_executor(pool, finish_job, result, out_dir)
+            summary["done"] += 1
+            emit(dict(saved, type="done"))
+        except Exception as e:
+            summary["failed"] += 1
+            emit({"type": "failed", "sku": sku, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            inflight.release()
+
+    with cpu_pool(workers) as pool:
+        for job in jobs:
+            try:
+                sku = job_spec(job)["sku"]
+            except ValueError as e:
+                # Unsafe SKU: nothing may be written under that name
+                summary["failed"] += 1
+                emit({"type": "failed", "sku": str(job.get("sku")), "error": f"{type(e).__name__}: {e}"})
+                continue
+            if not overwrite and is_done(out_dir, sku):
+                summary["skipped"] += 1
+                emit({"type": "skipped", "sku": sku})
+                continue
+            await inflight.acquire()
+            task = asyncio.create_task(process(job, sku, pool))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    return summary
@@ -0,0 +1,61 @@
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+# ==================================================
+# OFFLINE FAKE OF THE FILES ENDPOINT
+# ==================================================
+# Mirrors the parts of client.files that UploadCache uses (upload / get /
+# delete / list) so upload reuse can be exercised without network or an
+# API key:
+#   cache = UploadCache(FakeFilesAPI())
+# `ttl` and `clock` let expiry be simulated.
+class FakeFilesAPI:
+    def __init__(self, ttl=timedelta(hours=48), clock=None, fail_uploads=False):
+        self.ttl = ttl
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.fail_uploads = fail_uploads
+        self.files = {}
+        self.upload_calls = 0
+        self.bytes_received = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, *, file, config=None):
+        if self.fail_uploads:
+            raise ConnectionError("fake files endpoint: upload refused")
+
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        mime_type = getattr(config, "mime_type", None) or "application/octet-stream"
+        display_name = getattr(config, "display_name", None)
+
+        with self._lock:
+            self.upload_calls += 1
+            self.bytes_received += len(data)
+            name = f"files/fake-{next(self._ids)}"
+            now = self.clock()
+            record = types.File(
+                name=name,
+                display_name=display_name,
+                mime_type=mime_type,
+                size_bytes=len(data),
+                create_time=now,
+                expiration_time=now + self.ttl,
+                uri=f"https://fake.files.local/v1beta/{name}",
+                state=types.FileState.ACTIVE,
+            )
+            self.files[name] = record
+        return record
+
+    def get(self, *, name, config=None):
+        if name not in self.files:
+            raise KeyError(name)
+        return self.files[name]
+
+    def delete(self, *, name, config=None):
+        self.files.pop(name, None)
+
+    def list(self, *, config=None):
+        return list(self.files.values())
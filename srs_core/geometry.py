@@ -0,0 +1,86 @@
+import math
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from .mask import garment_mask, mask_bbox
+from .upscale import parse_aspect
+
+# ==================================================
+# OUTPUT GEOMETRY VALIDATION
+# ==================================================
+# The model's native sizes are not exact ratios (3:4 at 1K is 896×1200),
+# so "exact" allows a small tolerance. Near-matches are fixed locally by
+# a crop that keeps the garment, or by a pad when a crop would cut it.
+EXACT_TOLERANCE = 0.01
+NEAR_TOLERANCE = 0.08
+PAD_BLUR = 12
+
+
+def probe_dimensions(img_bytes):
+    # Header-only read: PIL parses the header on open and decodes lazily
+    with Image.open(BytesIO(img_bytes)) as probe:
+        return probe.size, probe.format
+
+
+def aspect_deviation(size, aspect_ratio):
+    aw, ah = parse_aspect(aspect_ratio)
+    return abs(math.log((size[0] / float(size[1])) / (aw / float(ah))))
+
+
+def classify_aspect(size, aspect_ratio):
+    # ("exact" | "near" | "mismatch", relative deviation)
+    deviation = aspect_deviation(size, aspect_ratio)
+    if deviation <= EXACT_TOLERANCE:
+        return "exact", deviation
+    if deviation <= NEAR_TOLERANCE:
+        return "near", deviation
+    return "mismatch", deviation
+
+
+def _place(length, keep_start, keep_end, total):
+    # Offset of a window of `length` inside `total` that covers
+    # [keep_start, keep_end) centred as far as the frame allows
+    centre = (keep_start + keep_end) / 2.0
+    return int(round(min(max(0, centre - length / 2.0), total - length)))
+
+
+def _pad(img, size, offset):
+    # Edge-replicate into the new canvas, then blur only the padding so
+    # it reads as out-of-focus backdrop rather than smeared stripes
+    src = np.asarray(img)
+    pad_x = (offset[0], size[0] - img.size[0] - offset[0])
+    pad_y = (offset[1], size[1] - img.size[1] - offset[1])
+    padded = Image.fromarray(np.pad(src, (pad_y, pad_x, (0, 0)), mode="edge"))
+
+    blurred = padded.filter(ImageFilter.GaussianBlur(PAD_BLUR))
+    blurred.paste(img, offset)
+    return blurred
+
+
+def fix_aspect(img, aspect_ratio):
+    # Returns (image, action) with action "crop" or "pad"
+    img = img.convert("RGB")
+    w, h = img.size
+    aw, ah = parse_aspect(aspect_ratio)
+    target = aw / float(ah)
+
+    box = mask_bbox(garment_mask(img)) or (0, 0, w, h)
+
+    if w / float(h) > target:
+        # Too wide: crop width, or pad height
+        new_w = int(round(h * target))
+        if box[2] - box[0] <= new_w:
+            left = _place(new_w, box[0], box[2], w)
+            return img.crop((left, 0, left + new_w, h)), "crop"
+        new_h = int(round(w / target))
+        return _pad(img, (w, new_h), (0, (new_h - h) // 2)), "pad"
+
+    # Too tall: crop height, or pad width
+    new_h = int(round(w / target))
+    if box[3] - box[1] <= new_h:
+        top = _place(new_h, box[1], box[3], h)
+        return img.crop((0, top, w, top + new_h)), "crop"
+    new_w = int(round(h * target))
+    return _pad(img, (new_w, h), ((new_w - w) // 2, 0)), "pad"
@@ -0,0 +1,207 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from .archive import IMAGE_SLOTS, SKU_PATTERN, archive_digest, sku_from_name
+from .cache import file_digest
+from .engine import ASPECT_RATIOS, HEX_COLOR, RESOLUTIONS
+from .templates import get_registry
+
+# ==================================================
+# CATALOG MANIFESTS (CSV / JSONL)
+# ==================================================
+# One row per SKU:
+#   sku, main, choli, lehenga, dress_type, background, pose,
+#   blouse_color, lehenga_color, dupatta_color, aspect_ratio, resolution
+# Image paths are relative to the manifest. Blank cells fall back to the
+# run's defaults. Columns outside this list are ignored.
+#
+# Rows are streamed twice: validate_manifest() checks every row before
+# anything is generated, manifest_jobs() then yields one job dict per row.
+# Neither holds the manifest in memory (only the set of SKUs seen).
+OPTION_COLUMNS = ("sku", "dress_type", "background", "pose", "aspect_ratio", "resolution")
+COLOR_COLUMNS = {"blouse_color": "Blouse", "lehenga_color": "Lehenga", "dupatta_color": "Dupatta"}
+MANIFEST_COLUMNS = OPTION_COLUMNS + IMAGE_SLOTS + tuple(COLOR_COLUMNS)
+MAX_REPORTED_ERRORS = 50
+
+
+def is_manifest(path):
+    return Path(path).suffix.lower() in (".csv", ".jsonl")
+
+
+def read_rows(path):
+    # Yields (line number, row dict) with keys and values stripped
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.suffix.lower() == ".jsonl":
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {line_no}: invalid JSON ({e.msg})") from None
+                if not isinstance(row, dict):
+                    raise ValueError(f"line {line_no}: expected a JSON object")
+                yield line_no, _clean(row)
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, _clean(row)
+
+
+def _clean(row):
+    return {
+        k.strip(): (v.strip() if isinstance(v, str) else v)
+        for k, v in row.items() if isinstance(k, str) and k.strip()
+    }
+
+
+def row_job(row, base):
+    # Manifest row → engine job dict (job_spec() fills the rest)
+    job = {k: row.get(k) or None for k in OPTION_COLUMNS}
+    for slot in IMAGE_SLOTS:
+        if row.get(slot):
+            job[slot] = str((base / row[slot]).resolve())
+    colors = {slot: row[col].upper() for col, slot in COLOR_COLUMNS.items() if row.get(col)}
+    if colors:
+        job["colors"] = colors
+    return job
+
+
+def manifest_jobs(path):
+    path = Path(path)
+    for _, row in read_rows(path):
+        yield row_job(row, path.parent)
+
+
+# ==================================================
+# UP-FRONT VALIDATION
+# ==================================================
+def row_errors(row, base, defaults, registry):
+    errors = []
+    if row.get("sku") and not SKU_PATTERN.match(row["sku"]):
+        errors.append(f"sku '{row['sku']}' may only use letters, digits, '_', '-' and '.'")
+    if not row.get("main"):
+        errors.append("main image is required")
+    for slot in IMAGE_SLOTS:
+        if row.get(slot) and not (base / row[slot]).is_file():
+            errors.append(f"{slot} image not found: {row[slot]}")
+
+    dress_type = row.get("dress_type") or defaults.get("dress_type")
+    if dress_type not in registry.dress_types:
+        errors.append(f"unknown dress_type '{dress_type}'")
+    pose = row.get("pose") or defaults.get("pose")
+    if pose not in registry.poses:
+        errors.append(f"unknown pose '{pose}'")
+    aspect_ratio = row.get("aspect_ratio") or defaults.get("aspect_ratio")
+    if aspect_ratio not in ASPECT_RATIOS:
+        errors.append(f"aspect_ratio must be one of {', '.join(ASPECT_RATIOS)}")
+    resolution = row.get("resolution") or defaults.get("resolution")
+    if resolution not in RESOLUTIONS:
+        errors.append(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    for col in COLOR_COLUMNS:
+        if row.get(col) and not HEX_COLOR.match(row[col]):
+            errors.append(f"{col} must be #RRGGBB, got '{row[col]}'")
+    return errors
+
+
+def validate_manifest(path, defaults=None):
+    # {"rows", "errors": [(line, message)], "error_count", "ignored_columns"}.
+    # Only the first MAX_REPORTED_ERRORS messages are kept.
+    path = Path(path)
+    defaults = defaults or {}
+    registry = get_registry()
+    report = {"rows": 0, "errors": [], "error_count": 0, "ignored_columns": set()}
+    skus = {}
+
+    def error(line, message):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append((line, message))
+
+    try:
+        for line, row in read_rows(path):
+            report["rows"] += 1
+            report["ignored_columns"].update(k for k in row if k not in MANIFEST_COLUMNS)
+            for message in row_errors(row, path.parent, defaults, registry):
+                error(line, message)
+            sku = row.get("sku") or (sku_from_name(Path(row["main"]).stem) if row.get("main") else None)
+            if sku in skus:
+                error(line, f"duplicate sku '{sku}' (first on line {skus[sku]})")
+            elif sku:
+                skus[sku] = line
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        error(None, str(e))
+    if report["rows"] == 0 and not report["error_count"]:
+        error(None, "manifest has no rows")
+    report["ignored_columns"] = sorted(report["ignored_columns"])
+    return report
+
+
+# ==================================================
+# CONTENT KEYS + CHECKPOINT
+# ==================================================
+# content_key() hashes the image bytes and every generation option, so a
+# SKU is only skipped on rerun when neither its photos nor its row
+# changed. Moving the files doesn't change the key. ZIP members are keyed
+# by their CRC-32 and size instead of being read.
+def content_key(job):
+    options = {k: v for k, v in job.items() if k not in IMAGE_SLOTS and k != "archive"}
+    h = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    if job.get("archive"):
+        h.update(archive_digest(job["archive"], job).encode("utf-8"))
+    else:
+        for slot in IMAGE_SLOTS:
+            if job.get(slot):
+                h.update(f"{slot}:{file_digest(job[slot])}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+class Checkpoint:
+    # Append-only JSONL next to the outputs: {"sku", "key", "status", "at"}
+    # per finished row, flushed and fsynced as it happens. The last line
+    # per SKU wins, so a failed rerun cancels an earlier "done".
+    FILENAME = ".srs-checkpoint.jsonl"
+
+    def __init__(self, out_dir):
+        self.path = Path(out_dir) / self.FILENAME
+        self.last = {}   # sku → (status, key) of its last line
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue   # torn last line after a crash
+                    if entry.get("sku"):
+                        self.last[entry["sku"]] = (entry.get("status"), entry.get("key"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")   # don't append onto a torn line
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def is_done(self, sku, key):
+        return self.last.get(sku) == ("done", key)
+
+    def has_entry(self, sku):
+        return sku in self.last
+
+    def record(self, sku, key, status, **extra):
+        entry = {"sku": sku, "key": key, "status": status, "at": round(time.time(), 3)}
+        entry.update({k: v for k, v in extra.items() if v is not None})
+        self._file.write(json.dumps(entry, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.last[sku] = (status, key)
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,174 @@
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+from skimage.measure import label
+from skimage.morphology import closing, disk, opening
+
+from .cache import DigestCache, image_digest
+from .color import image_to_lab, kmeans_lab
+
+# ==================================================
+# GARMENT / FOREGROUND MASK
+# ==================================================
+# Mannequin shots sit on plain studio backdrops, so the backdrop color is
+# modelled from the border pixels and everything that differs enough from
+# it (in LAB) is garment / mannequin.
+#
+# Work happens on a MASK_WORK_DIM copy; the mask is then scaled back up to
+# the full image size. A 2048px upload takes well under 150 ms.
+MASK_WORK_DIM = 512
+BORDER_FRACTION = 0.03
+BACKGROUND_CLUSTERS = 3
+MIN_THRESHOLD = 10.0       # ΔE76 floor for "differs from backdrop"
+THRESHOLD_MARGIN = 2.5     # × spread of the border pixels around their model
+MIN_COMPONENT_SHARE = 0.02  # drop specks smaller than 2% of the largest blob
+
+_mask_cache = DigestCache(maxsize=32)
+
+
+def _border_pixels(lab):
+    h, w = lab.shape[:2]
+    bw = max(2, int(min(h, w) * BORDER_FRACTION))
+    return np.concatenate([
+        lab[:bw].reshape(-1, 3),
+        lab[-bw:].reshape(-1, 3),
+        lab[bw:-bw, :bw].reshape(-1, 3),
+        lab[bw:-bw, -bw:].reshape(-1, 3),
+    ])
+
+
+def _distance_to_background(lab, centers):
+    flat = lab.reshape(-1, 3)
+    dist = np.full(len(flat), np.inf, dtype=np.float32)
+    for center in centers:
+        np.minimum(dist, np.linalg.norm(flat - center, axis=1), out=dist)
+    return dist.reshape(lab.shape[:2])
+
+
+def _work_copy(img, max_dim):
+    work = img.convert("RGB")
+    if max(work.size) > max_dim:
+        work = work.copy()
+        work.thumbnail((max_dim, max_dim), Image.BILINEAR)
+    return work
+
+
+def _foreground(lab):
+    # Raw backdrop-difference mask on a small LAB array, no cleanup
+    # Backdrop model: a few LAB clusters over the border (handles vignetting
+    # and light gradients on paper backdrops)
+    border = _border_pixels(lab)
+    centers, _ = kmeans_lab(border, k=BACKGROUND_CLUSTERS, iterations=8)
+    border_dist = _distance_to_background(border.reshape(-1, 1, 3), centers).ravel()
+    threshold = max(MIN_THRESHOLD, float(np.percentile(border_dist, 95)) * THRESHOLD_MARGIN)
+
+    return _distance_to_background(lab, centers) > threshold
+
+
+def _estimate(img):
+    full_size = img.size
+    lab = image_to_lab(_work_copy(img, MASK_WORK_DIM))
+    mask = _foreground(lab)
+
+    # Morphological cleanup: drop noise, bridge thin gaps (lace, net
+    # dupattas), fill enclosed holes
+    radius = max(1, int(max(lab.shape[:2]) / 256))
+    mask = opening(mask, disk(radius))
+    mask = closing(mask, disk(radius * 2))
+    mask = ndimage.binary_fill_holes(mask)
+
+    labels = label(mask, connectivity=2)
+    if labels.max() > 0:
+        areas = np.bincount(labels.ravel())
+        areas[0] = 0
+        keep = areas >= areas.max() * MIN_COMPONENT_SHARE
+        mask = keep[labels]
+
+    if mask.shape[::-1] != full_size:
+        mask_img = Image.fromarray(mask.astype(np.uint8) * 255).resize(full_size, Image.BILINEAR)
+        mask = np.asarray(mask_img) >= 128
+
+    mask = np.ascontiguousarray(mask)
+    mask.flags.writeable = False
+    return mask
+
+
+def garment_mask(img, digest=None):
+    # Bool array (h, w), True on garment / mannequin. Read-only and cached by
+    # image digest – copy before modifying.
+    key = digest or image_digest(img)
+    return _mask_cache.get_or_compute(key, lambda: _estimate(img))
+
+
+def mask_coverage(mask):
+    return float(mask.mean()) if mask.size else 0.0
+
+
+def mask_bbox(mask):
+    # (left, top, right, bottom) in PIL crop convention, or None if empty
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def mask_overlay(img, mask, color=(255, 0, 128), alpha=0.45):
+    # Preview helper: tints everything outside the mask
+    base = np.asarray(img.convert("RGB"), dtype=np.float32)
+    tint = np.asarray(color, dtype=np.float32)
+    out = base.copy()
+    out[~mask] = base[~mask] * (1 - alpha) + tint * alpha
+    return Image.fromarray(out.astype(np.uint8))
+
+
+# ==================================================
+# AUTO-CROP TO GARMENT
+# ==================================================
+# Runs on the raw upload (before compress_upload_image) so the 2048px
+# budget is spent on garment pixels, not backdrop. Uses a quick backdrop
+# difference on a CROP_WORK_DIM copy – no digest, no cache, no full-size
+# mask.
+CROP_WORK_DIM = 256
+MIN_CROP_GAIN = 0.05  # skip crops that remove less than 5% of the frame
+
+
+def detect_garment_box(img):
+    work = _work_copy(img, CROP_WORK_DIM)
+    mask = opening(_foreground(image_to_lab(work)), disk(1))
+    box = mask_bbox(mask)
+    if box is None:
+        return None
+
+    sx = img.size[0] / work.size[0]
+    sy = img.size[1] / work.size[1]
+    left, top, right, bottom = box
+    return (
+        int(left * sx),
+        int(top * sy),
+        min(img.size[0], int(np.ceil(right * sx))),
+        min(img.size[1], int(np.ceil(bottom * sy))),
+    )
+
+
+def crop_to_garment(img, margin=0.06):
+    # Returns (image, box). box is None when the image was left untouched.
+    # margin is a fraction of the garment box's longer side.
+    box = detect_garment_box(img)
+    if box is None:
+        return img, None
+
+    w, h = img.size
+    left, top, right, bottom = box
+    pad = int(max(right - left, bottom - top) * margin)
+    box = (
+        max(0, left - pad),
+        max(0, top - pad),
+        min(w, right + pad),
+        min(h, bottom + pad),
+    )
+
+    kept = (box[2] - box[0]) * (box[3] - box[1]) / float(w * h)
+    if kept > 1 - MIN_CROP_GAIN:
+        return img, None
+    return img.crop(box), box
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+from skimage.filters import sobel
+from skimage.metrics import structural_similarity
+from skimage.registration import phase_cross_correlation
+
+from .mask import garment_mask, mask_bbox
+
+# ==================================================
+# GARMENT PRESERVATION SCORE
+# ==================================================
+# "Strict Replication" check: crop the garment out of the main image and
+# the output, bring them to the same size, refine the alignment with phase
+# correlation, then compare structure (SSIM), edges (Sobel correlation)
+# and texture (local contrast ratio) inside the garment.
+#
+# Scoring runs in a process pool so the Streamlit script thread only
+# submits work and polls the future.
+PRESERVATION_WORK_DIM = 512
+REJECT_BELOW = 0.45
+
+WEIGHTS = {"ssim": 0.5, "edges": 0.3, "texture": 0.2}
+
+
+def _garment_crop(rgb):
+    img = Image.fromarray(rgb)
+    mask = garment_mask(img)
+    box = mask_bbox(mask) or (0, 0, img.size[0], img.size[1])
+    return img.crop(box), Image.fromarray(mask[box[1]:box[3], box[0]:box[2]])
+
+
+def _gray(img):
+    return np.asarray(img.convert("L"), dtype=np.float32) / 255.0
+
+
+def _heatmap(ssim_map, mask):
+    # Red where structure was lost, transparent-ish grey elsewhere
+    loss = np.clip(1.0 - ssim_map, 0.0, 1.0)
+    heat = np.zeros(ssim_map.shape + (3,), dtype=np.uint8)
+    heat[..., 0] = (loss * 255).astype(np.uint8)
+    heat[..., 1] = ((1.0 - loss) * 80).astype(np.uint8)
+    heat[..., 2] = ((1.0 - loss) * 80).astype(np.uint8)
+    heat[~mask] = 0
+    return heat
+
+
+def preservation_report(main_rgb, output_rgb, reject_below=REJECT_BELOW):
+    # main_rgb / output_rgb: uint8 arrays (h, w, 3). Runs inside the pool.
+    main_crop, main_mask = _garment_crop(main_rgb)
+    out_crop, _ = _garment_crop(output_rgb)
+
+    main_crop.thumbnail((PRESERVATION_WORK_DIM, PRESERVATION_WORK_DIM), Image.BILINEAR)
+    size = main_crop.size
+    out_crop = out_crop.resize(size, Image.BILINEAR)
+    mask = np.asarray(main_mask.resize(size, Image.NEAREST)) > 0
+
+    ref = _gray(main_crop)
+    out = _gray(out_crop)
+
+    shift, _, _ = phase_cross_correlation(ref, out, upsample_factor=1)
+    out = ndimage.shift(out, shift, order=1, mode="nearest")
+
+    _, ssim_map = structural_similarity(ref, out, data_range=1.0, full=True)
+    ssim_score = float(ssim_map[mask].mean()) if mask.any() else float(ssim_map.mean())
+
+    ref_edges = sobel(ref)[mask]
+    out_edges = sobel(out)[mask]
+    ref_flat = ref_edges.std() < 1e-6
+    out_flat = out_edges.std() < 1e-6
+    if ref_flat or out_flat:
+        # Plain fabric: only "both flat" counts as preserved
+        edge_score = 1.0 if ref_flat and out_flat else 0.0
+    else:
+        edge_score = float(np.corrcoef(ref_edges, out_edges)[0, 1])
+
+    def local_contrast(gray):
+        mean = ndimage.uniform_filter(gray, 7)
+        sq = ndimage.uniform_filter(gray * gray, 7)
+        return np.sqrt(np.clip(sq - mean * mean, 0, None))[mask].mean()
+
+    ref_texture = local_contrast(ref)
+    texture_ratio = float(local_contrast(out) / ref_texture) if ref_texture > 0 else 1.0
+    texture_score = max(0.0, 1.0 - abs(1.0 - texture_ratio))
+
+    score = (
+        WEIGHTS["ssim"] * max(0.0, ssim_score)
+        + WEIGHTS["edges"] * max(0.0, edge_score)
+        + WEIGHTS["texture"] * texture_score
+    )
+    return {
+        "score": round(score, 3),
+        "ssim": round(ssim_score, 3),
+        "edge_correlation": round(edge_score, 3),
+        "texture_ratio": round(texture_ratio, 3),
+        "alignment_shift": [round(float(v), 1) for v in shift],
+        "rejected": score < reject_below,
+        "reject_below": reject_below,
+        "heatmap": _heatmap(ssim_map, mask),
+    }
+
+
+# ==================================================
+# PROCESS POOL
+# ==================================================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # One pool per process, created on first use. "spawn" keeps workers
+    # independent of the Streamlit server's threads.
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, min(2, (os.cpu_count() or 2) - 1)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def submit_preservation_check(main_image, output_image, reject_below=REJECT_BELOW):
+    # Returns a concurrent.futures.Future resolving to preservation_report()
+    global _pool
+    main_rgb = np.asarray(main_image.convert("RGB"))
+    output_rgb = np.asarray(output_image.convert("RGB"))
+    with _pool_lock:
+        try:
+            return get_pool().submit(preservation_report, main_rgb, output_rgb, reject_below)
+        except BrokenProcessPool:
+            _pool = None
+            return get_pool().submit(preservation_report, main_rgb, output_rgb, reject_below)
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+# ==================================================
+# CONTEXT CACHE FOR THE STATIC PROMPT PREFIX
+# ==================================================
+# The static part of the prompt (per dress type) is registered once with
+# client.caches and later requests only send the dynamic suffix plus
+# `cached_content=<name>`.
+#
+# Not every model / prompt qualifies (image models, minimum cached token
+# counts), so a failed create is remembered for RETRY_AFTER and callers
+# fall back to inline text in the meantime.
+CACHE_TTL = timedelta(hours=1)
+REFRESH_MARGIN = timedelta(minutes=5)
+RETRY_AFTER = timedelta(minutes=15)
+
+
+def is_cache_error(exc):
+    # API errors that blame the cached prefix (expired, deleted or not
+    # usable with this model); an inline retry can fix only these
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return "cachedcontent" in message.replace(" ", "").replace("_", "")
+
+
+def prefix_key(model, static_text):
+    return hashlib.sha256(f"{model}\n{static_text}".encode("utf-8")).hexdigest()[:24]
+
+
+class PromptPrefixCache:
+    def __init__(self, client, model, now=None):
+        self.client = client
+        self.model = model
+        self.now = now or (lambda: datetime.now(timezone.utc))
+        self._entries = {}   # key -> {"name", "expires_at"}
+        self._failed = {}    # key -> retry_at
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "creates": 0, "failures": 0}
+
+    def _create(self, key, static_text):
+        cached = self.client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"srs-prefix-{key}",
+                contents=[types.Content(role="user", parts=[types.Part.from_text(text=static_text)])],
+                ttl=f"{int(CACHE_TTL.total_seconds())}s",
+            )
+        )
+        expires_at = cached.expire_time or (self.now() + CACHE_TTL)
+        return {"name": cached.name, "expires_at": expires_at}
+
+    def get(self, static_text):
+        # Cached-content name for this prefix, or None → send inline
+        key = prefix_key(self.model, static_text)
+        now = self.now()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] - REFRESH_MARGIN > now:
+                self.stats["hits"] += 1
+                return entry["name"]
+            retry_at = self._failed.get(key)
+            if retry_at and retry_at > now:
+                return None
+
+            try:
+                entry = self._create(key, static_text)
+            except Exception:
+                self.stats["failures"] += 1
+                self._failed[key] = now + RETRY_AFTER
+                self._entries.pop(key, None)
+                return None
+
+            self.stats["creates"] += 1
+            self._failed.pop(key, None)
+            self._entries[key] = entry
+            return entry["name"]
+
+    def invalidate(self, static_text):
+        with self._lock:
+            self._entries.pop(prefix_key(self.model, static_text), None)
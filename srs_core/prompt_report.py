@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+
+from .engine import MODEL_NAME
+from .prompt_rules import rule_coverage
+from .templates import get_registry
+from .tokens import count_tokens, estimate_tokens
+
+# ==================================================
+# PROMPT TOKEN REGRESSION REPORT
+# ==================================================
+#   python -m srs_core.prompt_report            local estimate only
+#   python -m srs_core.prompt_report --api      + count_tokens (SRS_KEY env)
+#
+# Prints verbose vs compact static-prefix size per dress type and exits
+# with status 1 if the compact render dropped any rule key, or if it is
+# not smaller than the verbose layout.
+
+
+def prompt_report(client=None, model=MODEL_NAME):
+    registry = get_registry()
+    rows = []
+    for dress_type in registry.dress_types:
+        verbose = registry.static(dress_type, compact=False)
+        compact = registry.static(dress_type, compact=True)
+        row = {
+            "dress_type": dress_type,
+            "verbose_chars": len(verbose),
+            "compact_chars": len(compact),
+            "verbose_est": estimate_tokens(verbose),
+            "compact_est": estimate_tokens(compact),
+            "verbose_api": None,
+            "compact_api": None,
+            "missing_rules": rule_coverage(registry.data, dress_type),
+        }
+        if client is not None:
+            row["verbose_api"] = count_tokens(client, model, verbose)
+            row["compact_api"] = count_tokens(client, model, compact)
+        rows.append(row)
+    return rows
+
+
+def _saving(before, after):
+    if not before or after is None:
+        return "-"
+    return f"{100.0 * (before - after) / before:.0f}%"
+
+
+def _fmt(value):
+    return "-" if value is None else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Token savings of the compact static prompt")
+    parser.add_argument("--api", action="store_true", help="also call count_tokens (needs SRS_KEY)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args(argv)
+
+    client = None
+    if args.api:
+        from google import genai
+        api_key = os.environ.get("SRS_KEY")
+        if not api_key:
+            parser.error("--api needs the SRS_KEY environment variable")
+        client = genai.Client(api_key=api_key)
+
+    rows = prompt_report(client, args.model)
+    print(f"prompt templates v{get_registry().version}")
+    header = f"{'dress type':<16} {'chars':>11} {'est tokens':>11} {'saved':>6} {'api tokens':>11} {'saved':>6}"
+    print(header)
+    print("-" * len(header))
+    failed = False
+    for row in rows:
+        print(
+            f"{row['dress_type']:<16} "
+            f"{row['verbose_chars']:>5}→{row['compact_chars']:<5} "
+            f"{row['verbose_est']:>5}→{row['compact_est']:<5} "
+            f"{_saving(row['verbose_est'], row['compact_est']):>6} "
+            f"{_fmt(row['verbose_api']):>5}→{_fmt(row['compact_api']):<5} "
+            f"{_saving(row['verbose_api'], row['compact_api']):>6}"
+        )
+        if row["missing_rules"]:
+            failed = True
+            print(f"  !! compact render dropped: {', '.join(row['missing_rules'])}")
+        if row["compact_est"] >= row["verbose_est"]:
+            failed = True
+            print("  !! compact render is not smaller than the verbose layout")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import re
+
+# ==================================================
+# STRUCTURED PROMPT RULES
+# ==================================================
+# The static prompt prefix used to be hand-written blocks that repeat
+# each other ("Do NOT redesign" in two sections, dupatta rules in up to
+# three). Every constraint is now a rule with a key "<topic>.<name>";
+# rules sharing a key say the same thing.
+#
+#   render_verbose(data, dress_type) -> the original block layout
+#   render_compact(data, dress_type) -> one block per topic, each key
+#       once, list-style topics folded onto a single line
+#
+# `data` is the template document (srs_core/prompt_templates.json, see
+# srs_core.templates). A rule is a dict: key, text, optional items
+# (sub-bullets), optional plain (no bullet) and optional only (dress
+# types it applies to; the verbose layout ignores it, as the old prompt
+# did). Sections may also carry only, or build their rules from a
+# per-dress-type name list with rules_from (keys "<topic>.<slug>").
+
+
+def _slug(name):
+    return re.sub(r"\W+", "_", name.lower()).strip("_")
+
+
+def _rule(r):
+    return {
+        "key": r["key"],
+        "text": r["text"],
+        "items": r.get("items"),
+        "plain": r.get("plain", False),
+        "only": r.get("only"),
+    }
+
+
+def sections_for(data, dress_type):
+    layout = data["layouts"].get(dress_type, data["layouts"]["default"])
+    sections = []
+    for name in layout:
+        sec = data["sections"][name]
+        if "only" in sec and dress_type not in sec["only"]:
+            continue
+        if "rules_from" in sec:
+            rules = [
+                _rule({"key": f"{sec['topic']}.{_slug(text)}", "text": text})
+                for text in data[sec["rules_from"]][dress_type]
+            ]
+        else:
+            rules = [_rule(r) for r in sec["rules"]]
+        footer = _rule(sec["footer"]) if "footer" in sec else None
+        sections.append({"title": sec["title"], "rules": rules, "footer": footer})
+    return sections
+
+
+def topic_of(key):
+    return key.split(".", 1)[0]
+
+
+def applies(r, dress_type):
+    return r["only"] is None or dress_type in r["only"]
+
+
+def _verbose_rule(r):
+    if r["plain"]:
+        return r["text"]
+    lines = ["- " + r["text"]]
+    lines += ["  * " + item for item in r["items"] or []]
+    return "\n".join(lines)
+
+
+def _compact_rule(r):
+    if r["items"]:
+        return r["text"].rstrip(":") + ": " + ", ".join(r["items"])
+    return r["text"]
+
+
+def _strip_do_not(text):
+    return re.sub(r"^do not\s+", "", text, flags=re.IGNORECASE)
+
+
+def ordered_rules(data, dress_type):
+    # Every rule of the verbose layout, footers included, in prompt order
+    for sec in sections_for(data, dress_type):
+        yield from sec["rules"]
+        if sec["footer"]:
+            yield sec["footer"]
+
+
+def compact_rules(data, dress_type):
+    # First occurrence of each key, grouped by topic in order of appearance
+    seen = set()
+    grouped = {}
+    for r in ordered_rules(data, dress_type):
+        if r["key"] in seen or not applies(r, dress_type):
+            continue
+        seen.add(r["key"])
+        grouped.setdefault(topic_of(r["key"]), []).append(r)
+    return grouped
+
+
+def render_verbose(data, dress_type):
+    blocks = [data["base"][dress_type]]
+    for sec in sections_for(data, dress_type):
+        lines = [sec["title"]] + [_verbose_rule(r) for r in sec["rules"]]
+        if sec["footer"]:
+            lines.append(_verbose_rule(sec["footer"]))
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
+
+
+def render_compact(data, dress_type):
+    blocks = [data["base"][dress_type]]
+    for topic, rules in compact_rules(data, dress_type).items():
+        title, style = data["topics"][topic]["title"], data["topics"][topic]["style"]
+        texts = [_compact_rule(r) for r in rules]
+        # "inline" joins with commas, "do_not" drops the shared prefix
+        if style == "inline":
+            blocks.append(f"{title} " + ", ".join(texts))
+        elif style == "do_not":
+            blocks.append(f"{title} " + "; ".join(_strip_do_not(t) for t in texts))
+        else:
+            blocks.append("\n".join([title] + ["- " + t for t in texts]))
+    return "\n".join(blocks) + "\n"
+
+
+def rule_coverage(data, dress_type):
+    # Keys present in the verbose layout but missing from the compact one
+    # (scoped-out rules excluded). Empty list == nothing was lost.
+    compact_keys = {r["key"] for rules in compact_rules(data, dress_type).values() for r in rules}
+    return sorted({
+        r["key"] for r in ordered_rules(data, dress_type)
+        if applies(r, dress_type) and r["key"] not in compact_keys
+    })
@@ -0,0 +1,95 @@
+import numpy as np
+from PIL import Image
+from skimage.color import deltaE_ciede2000, rgb2lab
+
+from .color import hex_to_rgb, image_to_lab, kmeans_lab, lab_to_rgb_tuple, rgb_to_hex
+from .mask import garment_mask, mask_bbox
+
+# ==================================================
+# COLOR LOCK VERIFICATION (CIEDE2000)
+# ==================================================
+# Checks the generated image against the HIGH-PRIORITY COLOR LOCK (HEX)
+# values sent in the prompt. Each slot is read from its band of the
+# garment mask, clustered, and the cluster closest to the locked color is
+# compared with ΔE2000. Runs on a QA_WORK_DIM copy (~50 ms).
+QA_WORK_DIM = 256
+DELTA_E_PASS = 5.0
+DELTA_E_WARN = 10.0
+MIN_CLUSTER_SHARE = 0.10
+
+# (start, end) fractions of the garment's vertical extent
+SLOT_BANDS = {
+    "Blouse": (0.0, 0.35),
+    "Lehenga": (0.45, 1.0),
+    "Dupatta": (0.0, 1.0),
+}
+
+
+def hex_to_lab(hex_color):
+    rgb = np.asarray(hex_to_rgb(hex_color), dtype=np.float64).reshape(1, 1, 3) / 255.0
+    return rgb2lab(rgb)[0, 0]
+
+
+def _status(delta_e):
+    if delta_e <= DELTA_E_PASS:
+        return "pass"
+    if delta_e <= DELTA_E_WARN:
+        return "warn"
+    return "fail"
+
+
+def _slot_pixels(lab, mask, band):
+    box = mask_bbox(mask)
+    if box is None:
+        return lab.reshape(-1, 3)
+    _, top, _, bottom = box
+    extent = bottom - top
+    start = top + int(extent * band[0])
+    end = top + max(1, int(extent * band[1]))
+    return lab[start:end][mask[start:end]]
+
+
+def verify_color_locks(img, locks, mask=None):
+    # locks: {"Blouse": "#RRGGBB", ...}
+    # Returns one dict per slot:
+    #   slot, locked, observed, delta_e, match_share, status
+    work = img.convert("RGB")
+    if max(work.size) > QA_WORK_DIM:
+        work = work.copy()
+        work.thumbnail((QA_WORK_DIM, QA_WORK_DIM), Image.BILINEAR)
+
+    lab = image_to_lab(work)
+    if mask is None:
+        mask = garment_mask(work)
+    elif mask.shape != lab.shape[:2]:
+        mask = np.asarray(
+            Image.fromarray(mask.astype(np.uint8) * 255).resize(work.size, Image.NEAREST)
+        ) > 0
+
+    results = []
+    for slot, locked_hex in locks.items():
+        target = hex_to_lab(locked_hex)
+        pixels = _slot_pixels(lab, mask, SLOT_BANDS.get(slot, (0.0, 1.0)))
+        if len(pixels) == 0:
+            continue
+
+        # ΔE2000 for every sampled garment pixel in one vectorized call
+        per_pixel = deltaE_ciede2000(pixels, np.broadcast_to(target, pixels.shape))
+        match_share = float((per_pixel <= DELTA_E_WARN).mean())
+
+        centers, labels = kmeans_lab(pixels, k=4, iterations=8)
+        share = np.bincount(labels, minlength=len(centers)) / len(labels)
+        candidates = centers[share >= MIN_CLUSTER_SHARE]
+        center_de = deltaE_ciede2000(candidates, np.broadcast_to(target, candidates.shape))
+        best = int(center_de.argmin())
+        delta_e = float(center_de[best])
+
+        results.append({
+            "slot": slot,
+            "locked": locked_hex.upper(),
+            "observed": rgb_to_hex(lab_to_rgb_tuple(candidates[best])),
+            "delta_e": round(delta_e, 2),
+            "match_share": round(match_share, 3),
+            "status": _status(delta_e),
+        })
+    return results
@@ -0,0 +1,55 @@
+from .preservation import submit_preservation_check
+from .qa import DELTA_E_WARN, verify_color_locks
+from .upscale import tier_dimensions
+
+# ==================================================
+# CANDIDATE RANKING
+# ==================================================
+# Cheap local metrics only – no extra model calls:
+#   preservation – garment SSIM/edge/texture score (process pool)
+#   color        – ΔE2000 distance to the locked HEX colors
+#   resolution   – share of the requested tier's pixel area achieved
+RANK_WEIGHTS = {"preservation": 0.45, "color": 0.35, "resolution": 0.2}
+
+
+def color_score(checks):
+    # 1.0 at ΔE 0, 0.0 at 2× the warn threshold and beyond
+    if not checks:
+        return None
+    scores = [max(0.0, 1.0 - check["delta_e"] / (2 * DELTA_E_WARN)) for check in checks]
+    return sum(scores) / len(scores)
+
+
+def resolution_score(size, aspect_ratio, image_size):
+    tw, th = tier_dimensions(aspect_ratio, image_size)
+    return min(1.0, (size[0] * size[1]) / float(tw * th))
+
+
+def rank_candidates(main_image, candidates, locks, aspect_ratio, image_size):
+    # candidates: [{"image": PIL.Image, "tier": str, ...}]
+    # Adds "metrics", "score" and "report" to each and returns them best first.
+    futures = [submit_preservation_check(main_image, c["image"]) for c in candidates]
+
+    for candidate, future in zip(candidates, futures):
+        try:
+            report = future.result()
+            preservation = report["score"]
+        except Exception:
+            report, preservation = None, 0.0
+
+        checks = verify_color_locks(candidate["image"], locks) if locks else []
+        metrics = {
+            "preservation": preservation,
+            "color": color_score(checks),
+            "resolution": resolution_score(candidate["image"].size, aspect_ratio, image_size),
+        }
+
+        # Metrics that don't apply (no color locks) drop out of the weighting
+        used = {k: w for k, w in RANK_WEIGHTS.items() if metrics[k] is not None}
+        total = sum(used.values())
+        candidate["score"] = round(sum(metrics[k] * w for k, w in used.items()) / total, 3)
+        candidate["metrics"] = {k: (round(v, 3) if v is not None else None) for k, v in metrics.items()}
+        candidate["color_checks"] = checks
+        candidate["report"] = report
+
+    return sorted(candidates, key=lambda c: c["score"], reverse=True)
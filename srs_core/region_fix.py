@@ -0,0 +1,119 @@
+import numpy as np
+from PIL import Image, ImageFilter
+
+from .upscale import parse_aspect
+
+# ==================================================
+# REGION-LIMITED DELTA FIX
+# ==================================================
+# Instead of re-sending every full image to fix one sleeve edge, only a
+# padded crop around the marked region goes to the model. The returned
+# patch is resized back onto the crop box and feathered into the
+# full-resolution output locally:
+#   - inside the marked box the patch replaces the output
+#   - in the padding it fades out, so seams blend with the old pixels
+SUPPORTED_ASPECTS = ["1:1", "2:3", "3:2", "3:4", "4:3", "4:5", "5:4", "9:16", "16:9", "21:9"]
+CONTEXT_PAD = 0.35      # padding around the marked box, × its longer side
+MIN_REGION_SIDE = 32    # ignore accidental clicks
+MIN_CROP_SIDE = 384
+CONTEXT_THUMB_DIM = 512  # main-image reference sent alongside the crop
+
+
+def region_from_drag(coords, image_size):
+    # streamlit_image_coordinates(click_and_drag=True) → full-res box
+    # (left, top, right, bottom), or None for a click / tiny drag
+    sx = image_size[0] / float(coords["width"])
+    sy = image_size[1] / float(coords["height"])
+    x1, x2 = sorted((coords["x1"] * sx, coords["x2"] * sx))
+    y1, y2 = sorted((coords["y1"] * sy, coords["y2"] * sy))
+    box = (
+        max(0, int(x1)),
+        max(0, int(y1)),
+        min(image_size[0], int(round(x2))),
+        min(image_size[1], int(round(y2))),
+    )
+    if box[2] - box[0] < MIN_REGION_SIDE or box[3] - box[1] < MIN_REGION_SIDE:
+        return None
+    return box
+
+
+def nearest_aspect(width, height):
+    ratio = width / float(height)
+    return min(
+        SUPPORTED_ASPECTS,
+        key=lambda a: abs(np.log(ratio * parse_aspect(a)[1] / parse_aspect(a)[0]))
+    )
+
+
+def _fit_box(cx, cy, w, h, image_size):
+    # Centre a w×h box on (cx, cy), shifting it to stay inside the image
+    w = min(w, image_size[0])
+    h = min(h, image_size[1])
+    left = int(round(min(max(0, cx - w / 2.0), image_size[0] - w)))
+    top = int(round(min(max(0, cy - h / 2.0), image_size[1] - h)))
+    return left, top, left + int(w), top + int(h)
+
+
+def context_box(region, image_size):
+    # Padded crop around the region, reshaped to the nearest aspect ratio
+    # the model supports so the patch maps back without distortion.
+    # Returns (box, aspect_ratio).
+    left, top, right, bottom = region
+    pad = max(right - left, bottom - top) * CONTEXT_PAD
+    w = max(MIN_CROP_SIDE, right - left + 2 * pad)
+    h = max(MIN_CROP_SIDE, bottom - top + 2 * pad)
+
+    aspect = nearest_aspect(w, h)
+    aw, ah = parse_aspect(aspect)
+    if w / h < aw / ah:
+        w = h * aw / ah
+    else:
+        h = w * ah / aw
+
+    # Too large for the frame at this aspect: shrink uniformly
+    scale = min(1.0, image_size[0] / w, image_size[1] / h)
+    w, h = w * scale, h * scale
+
+    cx = (left + right) / 2.0
+    cy = (top + bottom) / 2.0
+    return _fit_box(cx, cy, w, h, image_size), aspect
+
+
+def crop_tier(box):
+    # Smallest generation tier that covers the crop
+    longest = max(box[2] - box[0], box[3] - box[1])
+    if longest <= 1100:
+        return "1K"
+    if longest <= 2200:
+        return "2K"
+    return "4K"
+
+
+def context_thumbnail(img):
+    thumb = img.convert("RGB").copy()
+    thumb.thumbnail((CONTEXT_THUMB_DIM, CONTEXT_THUMB_DIM), Image.BILINEAR)
+    return thumb
+
+
+def composite_patch(output, patch, crop, region):
+    # Feather the model's patch (for the crop box) back into output
+    crop_w, crop_h = crop[2] - crop[0], crop[3] - crop[1]
+    patch = patch.convert("RGB").resize((crop_w, crop_h), Image.LANCZOS)
+
+    # Opaque on the marked region, fading to 0 over the padding
+    inner = (region[0] - crop[0], region[1] - crop[1], region[2] - crop[0], region[3] - crop[1])
+    feather = max(2, int(min(
+        inner[0], inner[1], crop_w - inner[2], crop_h - inner[3], 0.15 * max(crop_w, crop_h)
+    ) / 2))
+    alpha = Image.new("L", (crop_w, crop_h), 0)
+    alpha.paste(255, (
+        max(0, inner[0] - feather // 2),
+        max(0, inner[1] - feather // 2),
+        min(crop_w, inner[2] + feather // 2),
+        min(crop_h, inner[3] + feather // 2),
+    ))
+    alpha = alpha.filter(ImageFilter.GaussianBlur(feather / 2.0))
+
+    result = output.convert("RGB").copy()
+    result.paste(patch, crop[:2], alpha)
+    return result
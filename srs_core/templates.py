@@ -0,0 +1,190 @@
+import hashlib
+import json
+import string
+import threading
+from pathlib import Path
+
+from .cache import DigestCache
+from .prompt_rules import render_compact, render_verbose, sections_for, topic_of
+
+# ==================================================
+# PROMPT TEMPLATE REGISTRY
+# ==================================================
+# All prompt text (base lines, rule sections, locked regions, backgrounds,
+# poses, dynamic blocks) comes from one versioned data file, loaded once
+# per process by get_registry().
+#
+# On load every static prefix is rendered and every known
+# (dress_type, background, pose) dynamic block is precompiled into a
+# skeleton: literal text with only the three color slots left open.
+# render() fills the slots and memoizes the result keyed by all inputs.
+#
+# template_hash() is stable across processes and releases with the same
+# data file: sha256 of version + static text + skeleton.
+TEMPLATES_PATH = Path(__file__).with_name("prompt_templates.json")
+RENDER_CACHE_SIZE = 1024
+
+
+def load_templates(path=TEMPLATES_PATH):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    validate_templates(data)
+    return data
+
+
+def validate_templates(data):
+    # Fail at load time, not on the first generate click
+    for field in ("version", "dress_types", "base", "layouts", "sections", "topics", "dynamic", "poses"):
+        if field not in data:
+            raise ValueError(f"prompt templates: missing '{field}'")
+    for dress_type in data["dress_types"]:
+        if dress_type not in data["base"]:
+            raise ValueError(f"prompt templates: no base line for '{dress_type}'")
+        layout = data["layouts"].get(dress_type, data["layouts"].get("default"))
+        if layout is None:
+            raise ValueError(f"prompt templates: no layout for '{dress_type}'")
+        for name in layout:
+            if name not in data["sections"]:
+                raise ValueError(f"prompt templates: unknown section '{name}' ({dress_type})")
+        for sec in sections_for(data, dress_type):
+            for r in sec["rules"] + ([sec["footer"]] if sec["footer"] else []):
+                if topic_of(r["key"]) not in data["topics"]:
+                    raise ValueError(f"prompt templates: no topic for rule '{r['key']}'")
+
+
+def _compile(template, fixed):
+    # "... {pose} ... {blouse} ..." -> [literal, slot, literal, ...]
+    # Fields in `fixed` are baked in; the rest stay open as slot names.
+    pieces = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            pieces.append(literal)
+        if field is None:
+            continue
+        if field in fixed:
+            pieces.append(fixed[field])
+        else:
+            pieces.append((field,))
+    merged = []
+    for piece in pieces:
+        if isinstance(piece, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += piece
+        else:
+            merged.append(piece)
+    return tuple(merged)
+
+
+def _fill(skeleton, values):
+    return "".join(p if isinstance(p, str) else values[p[0]] for p in skeleton)
+
+
+def _sha(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+class TemplateRegistry:
+    def __init__(self, data):
+        self.data = data
+        self.version = data["version"]
+        self.dress_types = list(data["dress_types"])
+        self.poses = data["poses"]
+        self.background_options = data["background_options"]
+        self.motion_poses = set(data["motion_poses"])
+
+        self._static = {
+            (dress_type, compact): (render_compact if compact else render_verbose)(data, dress_type)
+            for dress_type in self.dress_types
+            for compact in (True, False)
+        }
+        self._skeletons = {}
+        self._skeleton_lock = threading.Lock()
+        for dress_type in self.dress_types:
+            for background in self.background_options.get(dress_type, []):
+                for pose in self.poses:
+                    self.skeleton(dress_type, background, pose)
+        self._renders = DigestCache(maxsize=RENDER_CACHE_SIZE)
+
+    # --------------------------------------------------
+    # STATIC PREFIX
+    # --------------------------------------------------
+    def static(self, dress_type, compact=True):
+        return self._static[(dress_type, compact)]
+
+    # --------------------------------------------------
+    # DYNAMIC SUFFIX
+    # --------------------------------------------------
+    def background_text(self, dress_type, background):
+        if background in self.data["backgrounds"]:
+            return self.data["backgrounds"][background]
+        if dress_type in self.data["ornate_backgrounds"]:
+            return self.data["ornate_backgrounds"][dress_type]
+        return _fill(_compile(self.data["dynamic"]["background_fallback"], {"background": background}), {})
+
+    def _compile_skeleton(self, dress_type, background, pose):
+        dynamic = self.data["dynamic"]
+        motion = dynamic["motion"]["on" if pose in self.motion_poses else "off"]
+        skeleton = _compile(dynamic["shot"], {
+            "pose": self.poses.get(pose, dynamic["default_pose"]),
+            "motion": motion,
+        })
+        if dress_type not in dynamic["no_color_lock"]:
+            skeleton += _compile(dynamic["color_lock"], {})
+        skeleton += ("\n" + self.background_text(dress_type, background),)
+        return skeleton
+
+    def skeleton(self, dress_type, background, pose):
+        key = (dress_type, background, pose)
+        skeleton = self._skeletons.get(key)
+        if skeleton is None:
+            skeleton = self._compile_skeleton(dress_type, background, pose)
+            with self._skeleton_lock:
+                self._skeletons[key] = skeleton
+        return skeleton
+
+    def dynamic(self, dress_type, blouse_color, lehenga_color, dupatta_color, background, pose):
+        return _fill(self.skeleton(dress_type, background, pose), {
+            "blouse": blouse_color, "lehenga": lehenga_color, "dupatta": dupatta_color,
+        })
+
+    # --------------------------------------------------
+    # FULL PROMPT
+    # --------------------------------------------------
+    def template_hash(self, dress_type, background, pose, compact=True):
+        skeleton = self.skeleton(dress_type, background, pose)
+        shape = "".join(p if isinstance(p, str) else "{%s}" % p[0] for p in skeleton)
+        return _sha(self.version, self.static(dress_type, compact), shape)
+
+    def render(self, dress_type, blouse_color, lehenga_color, dupatta_color, background, pose, compact=True):
+        # {"static", "dynamic", "text", "template_hash", "prompt_hash", "version"}
+        key = (dress_type, blouse_color, lehenga_color, dupatta_color, background, pose, compact)
+
+        def build():
+            static = self.static(dress_type, compact)
+            dynamic = self.dynamic(dress_type, blouse_color, lehenga_color, dupatta_color, background, pose)
+            return {
+                "static": static,
+                "dynamic": dynamic,
+                "text": static + dynamic,
+                "template_hash": self.template_hash(dress_type, background, pose, compact),
+                "prompt_hash": _sha(self.version, static + dynamic),
+                "version": self.version,
+            }
+
+        return dict(self._renders.get_or_compute(key, build))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TemplateRegistry(load_templates())
+    return _registry
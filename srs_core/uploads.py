@@ -0,0 +1,113 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from google.genai import types
+
+from .cache import image_digest
+from .engine import png_bytes
+
+# ==================================================
+# FILES API UPLOAD REUSE
+# ==================================================
+# Each processed image is uploaded once through client.files.upload and
+# the returned handle is reused (Part.from_uri) until shortly before it
+# expires. The Files API keeps uploads for 48 h; EXPIRY_MARGIN makes sure
+# a handle is never sent when it could expire mid-request.
+DEFAULT_TTL = timedelta(hours=48)
+EXPIRY_MARGIN = timedelta(minutes=30)
+ACTIVE_POLL_SECONDS = 0.5
+ACTIVE_POLL_LIMIT = 20
+
+
+def inline_part(img):
+    return types.Part.from_bytes(data=png_bytes(img), mime_type="image/png")
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class UploadCache:
+    # files_api: client.files, or FakeFilesAPI for offline runs
+    def __init__(self, files_api, now=_utcnow):
+        self.files_api = files_api
+        self.now = now
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "uploads": 0, "inline_fallbacks": 0, "bytes_uploaded": 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _count(self, stat, amount=1):
+        # Generations run in threads; += on a shared dict is not atomic
+        with self._lock:
+            self.stats[stat] += amount
+
+    def _valid(self, entry):
+        return entry is not None and entry["expires_at"] - EXPIRY_MARGIN > self.now()
+
+    def _wait_active(self, file):
+        state = str(getattr(file, "state", "") or "")
+        polls = 0
+        while "PROCESSING" in state and polls < ACTIVE_POLL_LIMIT:
+            time.sleep(ACTIVE_POLL_SECONDS)
+            file = self.files_api.get(name=file.name)
+            state = str(getattr(file, "state", "") or "")
+            polls += 1
+        if "FAILED" in state:
+            raise RuntimeError(f"File upload failed: {file.name}")
+        return file
+
+    def _upload(self, img, digest):
+        data = png_bytes(img)
+        size = len(data)
+
+        file = self.files_api.upload(
+            file=BytesIO(data),
+            config=types.UploadFileConfig(mime_type="image/png", display_name=f"srs-{digest}")
+        )
+        file = self._wait_active(file)
+
+        expires_at = file.expiration_time or (self.now() + DEFAULT_TTL)
+        self._count("uploads")
+        self._count("bytes_uploaded", size)
+        return {"uri": file.uri, "mime_type": file.mime_type or "image/png", "name": file.name, "expires_at": expires_at}
+
+    def handle(self, img, digest=None):
+        # Cached (or freshly uploaded) entry for img: uri, mime_type, name, expires_at
+        key = digest or image_digest(img)
+        entry = self._entries.get(key)
+        if self._valid(entry):
+            self._count("hits")
+            return entry
+
+        # One upload per digest even when several generations start at once
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if self._valid(entry):
+                self._count("hits")
+                return entry
+            entry = self._upload(img, key)
+            self._entries[key] = entry
+            return entry
+
+    def part_for(self, img, digest=None):
+        # File-reference part; falls back to inline bytes if the upload fails
+        try:
+            entry = self.handle(img, digest)
+        except Exception:
+            self._count("inline_fallbacks")
+            return inline_part(img)
+        return types.Part.from_uri(file_uri=entry["uri"], mime_type=entry["mime_type"])
+
+    def forget(self, digest):
+        self._entries.pop(digest, None)
+
+    def purge_expired(self):
+        for key in [k for k, entry in self._entries.items() if not self._valid(entry)]:
+            self._entries.pop(key, None)
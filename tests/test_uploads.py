@@ -0,0 +1,80 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from PIL import Image
+
+from srs_core.fake_files import FakeFilesAPI
+from srs_core.uploads import EXPIRY_MARGIN, UploadCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+class SlowFilesAPI(FakeFilesAPI):
+    # Holds each upload open so concurrent callers overlap
+    def upload(self, *, file, config=None):
+        time.sleep(0.05)
+        return super().upload(file=file, config=config)
+
+
+def image(color=(180, 20, 40)):
+    return Image.new("RGB", (64, 64), color)
+
+
+def test_reuses_the_handle_for_the_same_image():
+    files = FakeFilesAPI()
+    cache = UploadCache(files)
+    first = cache.part_for(image())
+    second = cache.part_for(image())
+    assert files.upload_calls == 1
+    assert cache.stats["hits"] == 1
+    assert first.file_data.file_uri == second.file_data.file_uri
+    cache.part_for(image((20, 180, 40)))
+    assert files.upload_calls == 2
+
+
+def test_reuploads_inside_the_expiry_margin():
+    clock = Clock()
+    files = FakeFilesAPI(ttl=timedelta(hours=2), clock=clock)
+    cache = UploadCache(files, now=clock)
+    cache.handle(image())
+    clock.now += timedelta(hours=2) - EXPIRY_MARGIN - timedelta(seconds=1)
+    cache.handle(image())
+    assert files.upload_calls == 1
+    clock.now += timedelta(seconds=2)
+    cache.handle(image())
+    assert files.upload_calls == 2
+
+
+def test_concurrent_callers_share_one_upload():
+    files = SlowFilesAPI()
+    cache = UploadCache(files)
+    start = threading.Barrier(8)
+    uris = []
+
+    def worker():
+        start.wait()
+        uris.append(cache.handle(image())["uri"])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert files.upload_calls == 1
+    assert len(set(uris)) == 1
+    assert cache.stats["hits"] == 7
+
+
+def test_falls_back_to_inline_bytes_when_upload_fails():
+    cache = UploadCache(FakeFilesAPI(fail_uploads=True))
+    part = cache.part_for(image())
+    assert part.file_data is None
+    assert part.inline_data.mime_type == "image/png"
+    assert cache.stats["inline_fallbacks"] == 1